@@ -293,7 +293,9 @@ class StaticEmbeddingGenerator:
     
     def test_search(self, query: str = "investissement long terme") -> List[Dict]:
         """Test la recherche avec une requête exemple."""
-        if not self.chunks:
+        # Seuls les chunks déjà encodés sont comparables à la requête
+        indexed = [i for i, chunk in enumerate(self.chunks) if chunk.embedding is not None]
+        if not indexed:
             return []
         
         logger.info(f"Test de recherche pour: '{query}'")
@@ -301,20 +303,20 @@ class StaticEmbeddingGenerator:
         # Générer l'embedding de la requête
         query_embedding = self.embedding_model.encode([query], normalize_embeddings=True)[0]
         
-        # Calculer les similarités
-        similarities = []
-        for i, chunk in enumerate(self.chunks):
-            chunk_embedding = np.array(chunk.embedding)
-            similarity = np.dot(query_embedding, chunk_embedding)
-            similarities.append({
-                'id': i,
-                'similarity': float(similarity),
-                'text_preview': chunk.text[:150] + "...",
-                'page': chunk.page_number
-            })
-        
-        # Trier par similarité
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
+        # Calculer les similarités (un seul produit matrice-vecteur)
+        matrix = np.asarray([self.chunks[i].embedding for i in indexed], dtype=np.float32)
+        scores = matrix @ np.asarray(query_embedding, dtype=np.float32)
+        
+        # 5 meilleurs scores (argpartition puis tri des seuls candidats)
+        k = min(5, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        similarities = [{
+            'id': indexed[i],
+            'similarity': float(scores[i]),
+            'text_preview': self.chunks[indexed[i]].text[:150] + "...",
+            'page': self.chunks[indexed[i]].page_number
+        } for i in best]
         
         # Afficher les meilleurs résultats
         logger.info("Top 3 résultats:")
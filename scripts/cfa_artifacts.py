@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Publication versionnée des artefacts de cfa_data/ et rechargement à chaud.
+
+Chaque construction est écrite dans son propre répertoire :
+    netlify/functions/cfa_data_versions/<version>/   artefacts + cfa_artifacts.json
+puis publiée d'un coup par remplacement atomique (os.replace) du pointeur
+    netlify/functions/cfa_data_current.json          {"version", "path", ...}
+Un lecteur suit le pointeur : il voit l'ancienne version ou la nouvelle,
+jamais un mélange des deux.
+
+cfa_artifacts.json (manifeste de version) : version du schéma des artefacts,
+identifiant de version, et pour chaque fichier (chemin relatif, sous-répertoires
+compris, ex. shards/) son SHA-256 et sa taille.
+
+cfa_data/ reste le répertoire lu par les Netlify Functions : il reçoit une
+copie de la version publiée (seuls les fichiers dont le hash a changé sont
+recopiés, chacun par remplacement atomique, le manifeste en dernier).
+Les anciennes versions sont supprimées au-delà de keep_versions ;
+rollback() republie l'une des versions conservées. Seules comptent les
+versions complètes (manifeste écrit à la publication, fichiers présents) :
+le répertoire d'une construction échouée ou interrompue n'est ni compté,
+ni republié.
+
+Sans versions, une construction est écrite dans cfa_data_staging/ puis
+promue dans cfa_data/ (promote_staging) une fois validée : une construction
+rejetée (budget dépassé, erreur) ne touche pas aux fichiers déployés.
+
+Dans les deux cas, les artefacts générés (GENERATED_ARTIFACTS) que la nouvelle
+construction n'a pas écrits sont supprimés de cfa_data/ : un ancien
+cfa_hnsw.bin ou niveau compressé ne reste pas à côté d'un nouveau
+cfa_vectors.bin. Les autres fichiers (ex. la version enrichie FR) sont gardés.
+
+Côté consommateur (Python), ArtifactWatcher relit le pointeur au plus une
+fois par check_interval, et seulement si sa date de modification a changé.
+"""
+
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_SCHEMA_VERSION = 2
+ARTIFACT_MANIFEST_FILENAME = "cfa_artifacts.json"
+# Artefacts écrits par generate_cfa_embeddings.py (chemins relatifs à cfa_data/,
+# motifs fnmatch), variantes .gz / .br comprises
+GENERATED_ARTIFACTS = (
+    "cfa_knowledge_embeddings.json", "cfa_embedding_config.json", "cfa_search_index.json", "cfa_stats.json",
+    "cfa_postings.bin", "cfa_bm25.bin", "cfa_texts.bin", "cfa_hnsw.bin", "cfa_pca.npz", "cfa_pq_m*.npz",
+    "cfa_vectors.bin", "cfa_vectors_*.bin", "cfa_vectors_meta.jsonl",
+    "cfa_shard_*.json", "cfa_shards.json", "shards/*",
+)
+_VARIANT_SUFFIXES = (".gz", ".br")
+
+
+def versions_dir(publish_dir: Path) -> Path:
+    """Répertoire des versions, à côté de cfa_data/ (hors du bundle Netlify)."""
+    publish_dir = Path(publish_dir)
+    return publish_dir.parent / f"{publish_dir.name}_versions"
+
+
+def pointer_path(publish_dir: Path) -> Path:
+    """Pointeur vers la version publiée."""
+    publish_dir = Path(publish_dir)
+    return publish_dir.parent / f"{publish_dir.name}_current.json"
+
+
+def staging_dir(publish_dir: Path) -> Path:
+    """Répertoire de staging des constructions non versionnées, à côté de cfa_data/."""
+    publish_dir = Path(publish_dir)
+    return publish_dir.parent / f"{publish_dir.name}_staging"
+
+
+def new_staging_dir(publish_dir: Path) -> Path:
+    """Crée un répertoire de staging vide (restes d'une construction rejetée supprimés)."""
+    path = staging_dir(publish_dir)
+    if path.exists():
+        shutil.rmtree(path)
+    path.mkdir(parents=True)
+    return path
+
+
+def is_generated(name: str) -> bool:
+    """Chemin relatif (posix) d'un artefact écrit par la construction, ou de l'une de ses variantes."""
+    for suffix in _VARIANT_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in GENERATED_ARTIFACTS)
+
+
+def relative_files(directory: Path) -> Set[str]:
+    """Chemins relatifs (posix) des fichiers d'un répertoire, sous-répertoires compris."""
+    directory = Path(directory)
+    return {path.relative_to(directory).as_posix() for path in directory.rglob("*") if path.is_file()}
+
+
+def remove_stale_artifacts(publish_dir: Path, current: Iterable[str]) -> List[str]:
+    """
+    Supprime de cfa_data/ les artefacts générés absents de la construction publiée.
+
+    Args:
+        publish_dir: Répertoire cfa_data/
+        current: Chemins relatifs des fichiers de la nouvelle construction
+
+    Returns:
+        Chemins relatifs supprimés
+    """
+    publish_dir = Path(publish_dir)
+    current = set(current)
+    removed = sorted(name for name in relative_files(publish_dir)
+                     if is_generated(name) and name not in current)
+    for name in removed:
+        (publish_dir / name).unlink()
+    for directory in sorted({(publish_dir / name).parent for name in removed}, reverse=True):
+        if directory != publish_dir and not any(directory.iterdir()):
+            directory.rmdir()
+    if removed:
+        logger.info(f"Artefacts d'une construction précédente supprimés de {publish_dir}: {', '.join(removed)}")
+    return removed
+
+
+def promote_staging(staging: Path, publish_dir: Path) -> int:
+    """
+    Déplace les artefacts du staging dans cfa_data/ puis supprime le staging.
+
+    Chaque fichier est mis en place par os.replace ; un sous-répertoire
+    (ex. shards/) remplace entièrement le précédent. Les artefacts générés
+    absents du staging sont supprimés, les autres fichiers de cfa_data/
+    (ex. la version enrichie FR) ne sont pas touchés.
+
+    Returns:
+        Nombre d'entrées déplacées
+    """
+    staging, publish_dir = Path(staging), Path(publish_dir)
+    publish_dir.mkdir(parents=True, exist_ok=True)
+    built = relative_files(staging)
+    moved = 0
+    for path in sorted(staging.iterdir()):
+        target = publish_dir / path.name
+        if path.is_dir() and target.exists():
+            shutil.rmtree(target)
+        os.replace(path, target)
+        moved += 1
+    staging.rmdir()
+    remove_stale_artifacts(publish_dir, built)
+    logger.info(f"Construction publiée dans {publish_dir} ({moved} fichiers)")
+    return moved
+
+
+def _version_key(name: str) -> Tuple[str, int]:
+    """Ordre chronologique des versions : horodatage, puis suffixe numérique (-1, -2... -10)."""
+    stamp, _, suffix = name.partition("-")
+    return stamp, int(suffix) if suffix.isdigit() else 0
+
+
+def _version_dirs(publish_dir: Path) -> List[str]:
+    """Tous les répertoires de cfa_data_versions/ (complets ou non), du plus ancien au plus récent."""
+    root = versions_dir(publish_dir)
+    if not root.exists():
+        return []
+    return sorted((path.name for path in root.iterdir() if path.is_dir()), key=_version_key)
+
+
+def is_complete_version(version_dir: Path) -> bool:
+    """Version publiée au moins une fois : manifeste du schéma courant et tous ses fichiers présents."""
+    version_dir = Path(version_dir)
+    try:
+        manifest = read_manifest(version_dir)
+    except (OSError, ValueError):
+        return False
+    if manifest is None or manifest.get("schema_version") != ARTIFACT_SCHEMA_VERSION:
+        return False
+    return all((version_dir / name).is_file() for name in manifest.get("files", {}))
+
+
+def kept_versions(publish_dir: Path) -> List[str]:
+    """Versions complètes conservées dans cfa_data_versions/, de la plus ancienne à la plus récente."""
+    root = versions_dir(publish_dir)
+    return [name for name in _version_dirs(publish_dir) if is_complete_version(root / name)]
+
+
+def new_version_dir(publish_dir: Path) -> Path:
+    """Crée et renvoie le répertoire d'une nouvelle version (horodatée, unique, la plus récente)."""
+    root = versions_dir(publish_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    # Suffixe après ceux de la même seconde, même si les plus anciennes ont été supprimées
+    same_stamp = [_version_key(name)[1] for name in _version_dirs(publish_dir) if name.startswith(stamp)]
+    first = max(same_stamp) + 1 if same_stamp else 0
+    for suffix in range(first, first + 1000):
+        candidate = root / (stamp if suffix == 0 else f"{stamp}-{suffix}")
+        try:
+            candidate.mkdir()
+            return candidate
+        except FileExistsError:
+            continue
+    raise RuntimeError(f"Impossible de créer un répertoire de version dans {root}")
+
+
+def _sha256(path: Path, block_size: int = 1 << 20) -> str:
+    # Comme cfa_manifest.file_sha256, sans dépendre de PyPDF2 côté consommateurs
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_artifact_manifest(directory: Path, version: str) -> Dict[str, Any]:
+    """Manifeste (hash et taille de chaque fichier, chemins relatifs) d'un répertoire d'artefacts."""
+    directory = Path(directory)
+    files = {}
+    for path in sorted(directory.rglob("*")):
+        name = path.relative_to(directory).as_posix()
+        if path.is_file() and name != ARTIFACT_MANIFEST_FILENAME:
+            files[name] = {"sha256": _sha256(path), "size": path.stat().st_size}
+    return {
+        "schema_version": ARTIFACT_SCHEMA_VERSION,
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "files": files,
+    }
+
+
+def atomic_write_json(path: Path, data: Dict[str, Any]):
+    """Écrit un JSON dans un fichier temporaire puis le met en place par os.replace."""
+    path = Path(path)
+    temporary = path.with_name(f".{path.name}.tmp")
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def read_manifest(directory: Path) -> Optional[Dict[str, Any]]:
+    """Manifeste d'un répertoire d'artefacts (None s'il n'existe pas)."""
+    path = Path(directory) / ARTIFACT_MANIFEST_FILENAME
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_pointer(publish_dir: Path) -> Optional[Dict[str, Any]]:
+    """Pointeur de version publiée (None si aucune version n'a été publiée)."""
+    path = pointer_path(publish_dir)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def current_dir(publish_dir: Path) -> Path:
+    """Répertoire de la version publiée, ou cfa_data/ lui-même sans publication versionnée."""
+    pointer = read_pointer(publish_dir)
+    if pointer is None:
+        return Path(publish_dir)
+    return Path(publish_dir).parent / pointer["path"]
+
+
+def unchanged_files(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Set[str]:
+    """Fichiers de même contenu (même SHA-256) entre deux manifestes."""
+    if not old:
+        return set()
+    return {name for name, entry in new["files"].items()
+            if old["files"].get(name, {}).get("sha256") == entry["sha256"]}
+
+
+def _mirror(version_dir: Path, publish_dir: Path, manifest: Dict[str, Any]) -> int:
+    """Recopie dans cfa_data/ les fichiers modifiés ; renvoie leur nombre."""
+    publish_dir.mkdir(parents=True, exist_ok=True)
+    previous = read_manifest(publish_dir)
+    unchanged = {name for name in unchanged_files(previous, manifest) if (publish_dir / name).exists()}
+    copied = 0
+    for name in manifest["files"]:
+        if name in unchanged:
+            continue
+        target = publish_dir / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temporary = target.with_name(f".{target.name}.tmp")
+        shutil.copyfile(version_dir / name, temporary)
+        os.replace(temporary, target)
+        copied += 1
+    # Fichiers de la version précédente et artefacts générés disparus de la
+    # nouvelle (les autres fichiers de cfa_data/, ex. la version enrichie FR,
+    # ne sont pas touchés)
+    for name in (previous or {}).get("files", {}):
+        if name not in manifest["files"] and (publish_dir / name).exists():
+            (publish_dir / name).unlink()
+    remove_stale_artifacts(publish_dir, manifest["files"])
+    atomic_write_json(publish_dir / ARTIFACT_MANIFEST_FILENAME, manifest)
+    return copied
+
+
+def _prune(publish_dir: Path, keep_versions: int, current: str):
+    """
+    Supprime les versions complètes les plus anciennes au-delà de keep_versions
+    (un répertoire incomplet, ex. construction en cours, n'est ni compté ni supprimé).
+    """
+    versions = kept_versions(publish_dir)
+    for name in versions[:max(0, len(versions) - keep_versions)]:
+        if name == current:
+            continue
+        path = versions_dir(publish_dir) / name
+        try:
+            shutil.rmtree(path)
+        except OSError as e:
+            # Fichiers encore ouverts par un lecteur (Windows) : nettoyés à la prochaine publication
+            logger.warning(f"Version {path.name} non supprimée: {e}")
+
+
+def publish_version(version_dir: Path, publish_dir: Path, keep_versions: int = 3) -> Dict[str, Any]:
+    """
+    Publie une version construite : manifeste, copie vers cfa_data/, bascule du pointeur.
+
+    Returns:
+        Manifeste de la version publiée
+    """
+    version_dir, publish_dir = Path(version_dir), Path(publish_dir)
+    manifest = build_artifact_manifest(version_dir, version_dir.name)
+    atomic_write_json(version_dir / ARTIFACT_MANIFEST_FILENAME, manifest)
+    copied = _mirror(version_dir, publish_dir, manifest)
+    atomic_write_json(pointer_path(publish_dir), {
+        "schema_version": ARTIFACT_SCHEMA_VERSION,
+        "version": manifest["version"],
+        "path": os.path.relpath(version_dir, publish_dir.parent).replace(os.sep, "/"),
+        "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+    _prune(publish_dir, keep_versions, manifest["version"])
+    logger.info(f"Version {manifest['version']} publiée ({len(manifest['files'])} fichiers, "
+                f"{copied} recopiés dans {publish_dir})")
+    return manifest
+
+
+def rollback(publish_dir: Path, version: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Republie une version conservée dans cfa_data_versions/ (copie vers cfa_data/
+    et bascule du pointeur, comme publish_version). Aucune version n'est supprimée.
+
+    Args:
+        publish_dir: Répertoire cfa_data/
+        version: Version à republier (défaut : la plus récente avant la version publiée)
+
+    Returns:
+        Manifeste de la version republiée
+    """
+    publish_dir = Path(publish_dir)
+    root = versions_dir(publish_dir)
+    kept = kept_versions(publish_dir)
+    if version is None:
+        pointer = read_pointer(publish_dir)
+        older = [name for name in kept
+                 if pointer is None or _version_key(name) < _version_key(pointer["version"])]
+        if not older:
+            raise ValueError(f"Aucune version antérieure conservée dans {root}")
+        version = older[-1]
+    elif version not in kept:
+        raise ValueError(f"Version {version} absente de {root}")
+    logger.info(f"Retour à la version {version}")
+    return publish_version(root / version, publish_dir, keep_versions=len(kept))
+
+
+class ArtifactWatcher:
+    """Détection peu coûteuse de la publication d'une nouvelle version."""
+
+    def __init__(self, publish_dir: Path, check_interval: float = 2.0):
+        """
+        Args:
+            publish_dir: Répertoire cfa_data/ (le pointeur est à côté)
+            check_interval: Délai minimal entre deux vérifications (secondes)
+        """
+        self.publish_dir = Path(publish_dir)
+        self.check_interval = check_interval
+        self.pointer = read_pointer(self.publish_dir)
+        self._last_check = time.monotonic()
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            stat = pointer_path(self.publish_dir).stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.pointer["version"] if self.pointer else None
+
+    def current_dir(self) -> Path:
+        if self.pointer is None:
+            return self.publish_dir
+        return self.publish_dir.parent / self.pointer["path"]
+
+    def poll(self, force: bool = False) -> bool:
+        """
+        True si une nouvelle version a été publiée depuis le dernier appel.
+
+        Hors force, ne fait rien avant check_interval, puis un simple stat()
+        du pointeur ; le JSON n'est relu que si le fichier a changé.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        pointer = read_pointer(self.publish_dir)
+        if pointer is None or pointer.get("version") == self.version:
+            return False
+        self.pointer = pointer
+        return True
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Codes binaires (1 bit par composante) des embeddings et recherche par
+distance de Hamming.
+
+Chaque composante est réduite à son signe : un vecteur de 384 dimensions
+tient en 6 mots uint64 (48 octets, 32 fois moins qu'en float32). Pour des
+embeddings normalisés, la distance de Hamming entre codes suit l'angle
+entre vecteurs ; elle se calcule par XOR puis comptage de bits (popcount)
+sur les mots uint64, vectorisé par numpy.
+
+Le classement Hamming est grossier (au plus dim + 1 valeurs distinctes) :
+search_binary en tire une liste restreinte de candidats, re-classés par le
+produit scalaire exact sur les vecteurs float (memmap de cfa_vectors.bin).
+
+USAGE:
+    codes = binarize(vectors)
+    ids, scores = search_binary(codes, query, k=5, rerank_vectors=vectors)
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from cfa_quantization import top_k
+
+# Lignes traitées à la fois lors du calcul des distances
+SCORE_BLOCK_ROWS = 16384
+
+# Comptage de bits par octet, si numpy n'a pas bitwise_count (numpy < 2.0)
+_BYTE_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def words_per_vector(dim: int) -> int:
+    """Mots uint64 par code binaire."""
+    return (dim + 63) // 64
+
+
+def binarize(vectors: np.ndarray) -> np.ndarray:
+    """Codes (n, ceil(d / 64)) uint64 little-endian : bit j à 1 si la composante j est > 0."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    n, dim = vectors.shape
+    packed = np.packbits(vectors > 0, axis=1, bitorder='little')
+    padded = np.zeros((n, words_per_vector(dim) * 8), dtype=np.uint8)
+    padded[:, :packed.shape[1]] = packed
+    return padded.view('<u8')
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Nombre de bits à 1 de chaque ligne de mots uint64."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int32)
+    as_bytes = np.ascontiguousarray(words).view(np.uint8)
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.int32)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray,
+                      block_rows: int = SCORE_BLOCK_ROWS) -> np.ndarray:
+    """Distance de Hamming entre le code requête (mots uint64) et chaque code."""
+    query_code = np.asarray(query_code, dtype='<u8').reshape(-1)
+    distances = np.empty(len(codes), dtype=np.int32)
+    for start in range(0, len(codes), block_rows):
+        end = min(start + block_rows, len(codes))
+        distances[start:end] = popcount(np.bitwise_xor(codes[start:end], query_code))
+    return distances
+
+
+def search_binary(codes: np.ndarray, query: np.ndarray, k: int,
+                  rerank_vectors: Optional[np.ndarray] = None,
+                  rerank_candidates: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k plus proches voisins par distance de Hamming, re-classés en float si possible.
+
+    Args:
+        codes: Codes binaires (binarize ou VectorStore binaire)
+        query: Vecteur requête float32
+        k: Nombre de résultats
+        rerank_vectors: Vecteurs float ; si fournis, les rerank_candidates
+            codes les plus proches sont re-classés par produit scalaire exact
+        rerank_candidates: Taille de la liste restreinte (défaut: 10 * k)
+
+    Returns:
+        (indices, scores) du meilleur au moins bon ; sans re-classement, le
+        score est la similarité de signe dim - 2 * hamming
+    """
+    query = np.asarray(query, dtype=np.float32)
+    distances = hamming_distances(codes, binarize(query)[0])
+    if rerank_vectors is None:
+        similarity = (len(query) - 2 * distances).astype(np.float32)
+        ids = top_k(similarity, k)
+        return ids, similarity[ids]
+
+    # Lecture des seules lignes candidates (triées : accès séquentiels au memmap)
+    rows = np.sort(top_k(-distances.astype(np.float32), rerank_candidates or 10 * k))
+    exact = np.asarray(rerank_vectors[rows], dtype=np.float32) @ query
+    order = top_k(exact, k)
+    return rows[order], exact[order]
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Index BM25 sur le texte complet des chunks, avec top-k à terminaison anticipée.
+
+Contrairement à cfa_search_index.json (25 termes financiers prédéfinis, sans
+pondération), tout le vocabulaire des chunks est indexé : fréquence du terme
+dans chaque chunk, fréquence documentaire, longueur de chaque chunk.
+
+Tokenisation : minuscules, accents retirés, suites alphanumériques d'au moins
+2 caractères, mots vides anglais / français exclus (pas de racinisation).
+
+Score d'un chunk d pour une requête (termes uniques t) :
+    somme idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * |d| / avgdl))
+    idf(t) = ln(1 + (N - df + 0.5) / (df + 0.5))
+
+Format de cfa_bm25.bin (entiers little-endian) :
+    0   8 octets  magic b"CFABM2\\x00\\x01"
+    8   uint16    version du format
+    10  uint16    réservé
+    12  uint32    nombre de termes
+    16  uint32    nombre de chunks (N)
+    20  uint32    taille du bloc des termes (UTF-8 triés, séparés par \\n)
+    24  float32   avgdl
+    28  float32   k1
+    32  float32   b
+    36..63        réservé
+    64  termes, puis une entrée de 20 octets par terme (même ordre) :
+        uint32 df, uint64 position, uint32 longueur des identifiants,
+        float32 score maximal du terme ;
+        puis N longueurs de chunks uint32, puis les postings de chaque terme.
+
+Postings d'un terme, par blocs de 128 chunks :
+    table de saut (si plus d'un bloc) : par bloc, uint32 premier identifiant
+        et uint32 position de ses octets dans les identifiants ;
+    identifiants en varint, chaque bloc repartant de son premier identifiant
+        (absolu, puis écarts ; cfa_postings.encode_varint_deltas) ;
+    df fréquences uint8 (tf, plafonné à 255), lisibles sans décodage.
+
+Top-k (MaxScore, terme par terme) : les termes sont traités par score
+maximal décroissant (termes rares d'abord). Dès que la somme des scores
+maximaux des termes restants passe sous le k-ième score courant, aucun
+chunk encore non vu ne peut entrer dans le top-k : les termes restants
+(souvent les plus fréquents, aux listes les plus longues) ne sont plus
+évalués que pour les candidats : seuls les blocs qui en contiennent sont
+décodés (table de saut). Les candidats sont eux-mêmes élagués quand leur
+score plus ce reste ne peut plus atteindre le k-ième. Le résultat est
+identique à la recherche exhaustive.
+
+USAGE:
+    index = BM25Index.open(cfa_data_dir)
+    ids, scores = index.search("trust annuity succession", k=10)
+    python cfa_bm25.py "estate planning trust" --k 5
+"""
+
+import argparse
+import logging
+import math
+import re
+import struct
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from cfa_postings import decode_varint_deltas, decode_varints, encode_varint_deltas
+from cfa_quantization import top_k
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CFABM2\x00\x01"
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sHHIIIfff")
+_ENTRY = struct.Struct("<IQIf")
+BLOCK_SIZE = 128
+# Au-delà d'un candidat pour 8 postings, la liste est lue en entière
+CANDIDATE_SCAN_RATIO = 8
+
+BM25_FILENAME = "cfa_bm25.bin"
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could do does for from had has have he her his how i if in
+into is it its may more most must no not of on or our she should so such than that the their them
+then there these they this those to was we were what when where which while who will with would
+you your also other only over each both any all some same between through about after before
+le la les de des du et en un une pour avec dans sur au aux ma mon mes nos notre votre vos ce ces
+est sont par pas plus qui que ou je il elle nous vous ils se sa son ses leur leurs
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Termes indexés d'un texte (minuscules, sans accents ni mots vides)."""
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    return [token for token in _TOKEN.findall(folded) if len(token) >= 2 and token not in STOPWORDS]
+
+
+def idf(df: int, num_docs: int) -> float:
+    """idf BM25 (variante toujours positive)."""
+    return math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+
+
+class BM25IndexWriter:
+    """Construit cfa_bm25.bin chunk par chunk (identifiant = ordre d'ajout)."""
+
+    def __init__(self, output_dir: Path, k1: float = DEFAULT_K1, b: float = DEFAULT_B,
+                 filename: str = BM25_FILENAME):
+        """
+        Args:
+            output_dir: Répertoire cfa_data/
+            k1: Saturation de la fréquence du terme
+            b: Poids de la normalisation par la longueur du chunk
+            filename: Nom du fichier
+        """
+        self.path = Path(output_dir) / filename
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = array('I')
+        self._ids: Dict[str, array] = {}
+        self._tfs: Dict[str, array] = {}
+
+    def add(self, text: str):
+        """Indexe le texte du chunk suivant."""
+        doc = len(self.doc_lengths)
+        tokens = tokenize(text)
+        self.doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            if term not in self._ids:
+                self._ids[term], self._tfs[term] = array('I'), array('I')
+            self._ids[term].append(doc)
+            self._tfs[term].append(tf)
+
+    def finalize(self) -> Dict[str, Any]:
+        """Écrit l'index ; renvoie vocabulaire, nombre de chunks, avgdl, taille et chemin."""
+        num_docs = len(self.doc_lengths)
+        lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32).astype(np.float32)
+        avgdl = float(lengths.mean()) if num_docs else 0.0
+        norms = self.k1 * (1 - self.b + self.b * lengths / (avgdl or 1.0))
+        terms = sorted(self._ids)
+        terms_blob = "\n".join(terms).encode('utf-8')
+        position = HEADER_SIZE + len(terms_blob) + _ENTRY.size * len(terms) + 4 * num_docs
+
+        entries, blobs = [], []
+        for term in terms:
+            ids = np.frombuffer(self._ids[term], dtype=np.uint32).astype(np.int64)
+            tfs = np.frombuffer(self._tfs[term], dtype=np.uint32).astype(np.float32)
+            weights = idf(len(ids), num_docs) * tfs * (self.k1 + 1) / (tfs + norms[ids])
+            blocks = [encode_varint_deltas(ids[start:start + BLOCK_SIZE])
+                      for start in range(0, len(ids), BLOCK_SIZE)]
+            encoded_ids = b"".join(blocks)
+            skips = b""
+            if len(blocks) > 1:
+                offsets = np.cumsum([0] + [len(block) for block in blocks[:-1]])
+                skips = np.column_stack((ids[::BLOCK_SIZE], offsets)).astype('<u4').tobytes()
+            encoded_tfs = np.minimum(tfs, 255).astype(np.uint8).tobytes()
+            entries.append(_ENTRY.pack(len(ids), position, len(encoded_ids), float(weights.max())))
+            blobs.append(skips + encoded_ids + encoded_tfs)
+            position += len(blobs[-1])
+
+        with open(self.path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(terms), num_docs, len(terms_blob),
+                                 avgdl, self.k1, self.b).ljust(HEADER_SIZE, b"\x00"))
+            f.write(terms_blob)
+            f.write(b"".join(entries))
+            f.write(np.asarray(self.doc_lengths, dtype='<u4').tobytes())
+            f.write(b"".join(blobs))
+        self._ids, self._tfs = {}, {}
+        return {"terms": len(terms), "docs": num_docs, "avgdl": round(avgdl, 1),
+                "size_bytes": position, "file": str(self.path)}
+
+
+class BM25Index:
+    """Lecture de cfa_bm25.bin et recherche top-k (MaxScore ou exhaustive)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._data = np.fromfile(self.path, dtype=np.uint8)
+        raw = self._data[:HEADER_SIZE].tobytes()
+        if len(raw) < HEADER_SIZE:
+            raise ValueError(f"{self.path}: en-tête tronqué")
+        (magic, version, _, num_terms, self.num_docs, terms_size,
+         self.avgdl, self.k1, self.b) = _HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: pas un index BM25 CFA")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: version de format {version} non supportée")
+        terms_blob = self._data[HEADER_SIZE:HEADER_SIZE + terms_size].tobytes().decode('utf-8')
+        terms = terms_blob.split("\n") if num_terms else []
+        entries_offset = HEADER_SIZE + terms_size
+        entries = self._data[entries_offset:entries_offset + _ENTRY.size * num_terms].tobytes()
+        # terme -> (df, position, longueur des identifiants, score maximal)
+        self._entries = {term: _ENTRY.unpack_from(entries, i * _ENTRY.size) for i, term in enumerate(terms)}
+        lengths_offset = entries_offset + _ENTRY.size * num_terms
+        self.doc_lengths = self._data[lengths_offset:lengths_offset + 4 * self.num_docs].view('<u4')
+        self.norms = (self.k1 * (1 - self.b + self.b * self.doc_lengths / (self.avgdl or 1.0))).astype(np.float32)
+        self.last_stats: Dict[str, Any] = {}
+        self._decoded = 0
+
+    @classmethod
+    def open(cls, data_dir: Path) -> "BM25Index":
+        return cls(Path(data_dir) / BM25_FILENAME)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def doc_freq(self, term: str) -> int:
+        entry = self._entries.get(term)
+        return entry[0] if entry else 0
+
+    def max_score(self, term: str) -> float:
+        """Borne supérieure du score du terme pour un chunk (calculée à l'écriture)."""
+        entry = self._entries.get(term)
+        return entry[3] if entry else 0.0
+
+    def _layout(self, term: str):
+        """(premiers identifiants et positions des blocs ou None, identifiants encodés, tf)."""
+        df, position, ids_length, _ = self._entries[term]
+        num_blocks = (df + BLOCK_SIZE - 1) // BLOCK_SIZE
+        skips = None
+        if num_blocks > 1:
+            skips = self._data[position:position + 8 * num_blocks].view('<u4').reshape(num_blocks, 2)
+            position += 8 * num_blocks
+        return skips, self._data[position:position + ids_length], \
+            self._data[position + ids_length:position + ids_length + df]
+
+    def _decode_blocks(self, term: str, blocks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(identifiants, rangs dans la liste) des postings des blocs demandés (triés)."""
+        df = self._entries[term][0]
+        skips, encoded, _ = self._layout(term)
+        if skips is None:
+            return decode_varint_deltas(encoded), np.arange(df)
+        ends = np.append(skips[1:, 1], len(encoded)).astype(np.int64)
+        starts = skips[:, 1].astype(np.int64)[blocks]
+        lengths = ends[blocks] - starts
+        # Octets des seuls blocs demandés, mis bout à bout
+        gather = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        values = decode_varints(encoded[gather])
+        counts = np.minimum(BLOCK_SIZE, df - blocks * BLOCK_SIZE)
+        first = np.cumsum(counts) - counts
+        # Somme cumulée repartant de zéro à chaque bloc (premier identifiant absolu)
+        cumulative = np.cumsum(values)
+        ids = cumulative - np.repeat(cumulative[first] - values[first], counts)
+        ranks = np.repeat(blocks * BLOCK_SIZE - first, counts) + np.arange(len(values))
+        return ids, ranks
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(identifiants triés, fréquences) des chunks contenant le terme."""
+        if term not in self._entries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        df = self._entries[term][0]
+        ids, _ = self._decode_blocks(term, np.arange((df + BLOCK_SIZE - 1) // BLOCK_SIZE))
+        return ids, self._layout(term)[2].astype(np.int64)
+
+    def _candidate_postings(self, term: str, candidates: np.ndarray,
+                            is_candidate: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (candidats présents dans la liste du terme, leurs tf).
+
+        Peu de candidats : seuls leurs blocs sont décodés, puis recherche
+        dichotomique. Sinon : liste entière filtrée par le masque des candidats.
+        """
+        skips, _, tfs = self._layout(term)
+        if len(candidates) * CANDIDATE_SCAN_RATIO >= len(tfs):
+            ids, tfs = self.postings(term)
+            self._decoded += len(ids)
+            keep = is_candidate[ids]
+            return ids[keep], tfs[keep]
+        if skips is None:
+            blocks = np.zeros(1, dtype=np.int64)
+        else:
+            # candidates est trié : blocs croissants, doublons consécutifs
+            blocks = np.searchsorted(skips[:, 0], candidates, side='right') - 1
+            blocks = blocks[np.append(True, blocks[1:] != blocks[:-1]) & (blocks >= 0)]
+        ids, ranks = self._decode_blocks(term, blocks)
+        self._decoded += len(ids)
+        if not len(ids):
+            return ids, ids
+        positions = np.minimum(np.searchsorted(ids, candidates), len(ids) - 1)
+        hit = ids[positions] == candidates
+        return candidates[hit], tfs[ranks[positions[hit]]].astype(np.int64)
+
+    def _weights(self, term: str, ids: np.ndarray, tfs: np.ndarray) -> np.ndarray:
+        tfs = tfs.astype(np.float32)
+        return idf(self.doc_freq(term), self.num_docs) * tfs * (self.k1 + 1) / (tfs + self.norms[ids])
+
+    def query_terms(self, query: str) -> List[str]:
+        """Termes uniques de la requête présents dans l'index."""
+        return [term for term in dict.fromkeys(tokenize(query)) if term in self._entries]
+
+    def scores(self, query: str) -> np.ndarray:
+        """Scores BM25 de tous les chunks (évaluation exhaustive)."""
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in self.query_terms(query):
+            ids, tfs = self.postings(term)
+            scores[ids] += self._weights(term, ids, tfs)
+        return scores
+
+    def score_docs(self, query: str, doc_ids: np.ndarray) -> np.ndarray:
+        """Scores BM25 des seuls chunks doc_ids (dans leur ordre), sans parcourir tout le corpus."""
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        candidates = np.unique(doc_ids)
+        is_candidate = np.zeros(self.num_docs, dtype=bool)
+        is_candidate[candidates] = True
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in self.query_terms(query):
+            rows, tfs = self._candidate_postings(term, candidates, is_candidate)
+            scores[rows] += self._weights(term, rows, tfs)
+        return scores[doc_ids]
+
+    def search(self, query: str, k: int = 10, exhaustive: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (indices, scores) des k meilleurs chunks (score > 0), du meilleur au moins bon.
+
+        last_stats indique le nombre de postings lus et réellement évalués.
+        """
+        terms = self.query_terms(query)
+        total = sum(self.doc_freq(term) for term in terms)
+        if exhaustive:
+            scores = self.scores(query)
+            ids = top_k(scores, k)
+            ids = ids[scores[ids] > 0]
+            self.last_stats = {"terms": len(terms), "postings": total, "decoded": total, "scored": total}
+            return ids, scores[ids]
+
+        terms.sort(key=self.max_score, reverse=True)
+        # remaining[i] : somme des scores maximaux des termes après le i-ème
+        bounds = np.array([self.max_score(term) for term in terms], dtype=np.float64)
+        remaining = np.concatenate((np.cumsum(bounds[::-1])[::-1][1:], [0.0])) if terms else bounds
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        candidates = None
+        scored = 0
+        self._decoded = 0
+        for i, term in enumerate(terms):
+            if candidates is None:
+                ids, tfs = self.postings(term)
+                self._decoded += len(ids)
+                scores[ids] += self._weights(term, ids, tfs)
+                scored += len(ids)
+                # Le k-ième score (parcours du corpus) n'est cherché que s'il peut
+                # dépasser le reste : il ne dépasse pas la somme des bornes déjà traitées
+                if remaining[i] < bounds[:i + 1].sum():
+                    threshold = self._kth(scores[scores > 0], k)
+                    if remaining[i] < threshold:
+                        # Plus aucun chunk non vu ne peut entrer dans le top-k
+                        is_candidate = scores + remaining[i] >= threshold
+                        candidates = np.flatnonzero(is_candidate)
+            else:
+                rows, tfs = self._candidate_postings(term, candidates, is_candidate)
+                scores[rows] += self._weights(term, rows, tfs)
+                scored += len(rows)
+                threshold = self._kth(scores[candidates], k)
+                keep = scores[candidates] + remaining[i] >= threshold
+                is_candidate[candidates[~keep]] = False
+                candidates = candidates[keep]
+        self.last_stats = {"terms": len(terms), "postings": total, "decoded": self._decoded, "scored": scored}
+        if candidates is None:
+            ids = top_k(scores, k)
+        else:
+            ids = candidates[top_k(scores[candidates], k)]
+        ids = ids[scores[ids] > 0]
+        return ids, scores[ids]
+
+    @staticmethod
+    def _kth(scores: np.ndarray, k: int) -> float:
+        """k-ième meilleur score (0 s'il y a moins de k scores)."""
+        if len(scores) < k or k <= 0:
+            return 0.0
+        return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+
+def main():
+    default_dir = Path(__file__).resolve().parent.parent / "netlify" / "functions" / "cfa_data"
+    parser = argparse.ArgumentParser(description="Recherche BM25 sur cfa_bm25.bin")
+    parser.add_argument("query", help="Requête (termes anglais, comme les cours)")
+    parser.add_argument("--data-dir", type=Path, default=default_dir, help="Répertoire cfa_data/")
+    parser.add_argument("--k", type=int, default=10, help="Nombre de résultats")
+    parser.add_argument("--repeats", type=int, default=50, help="Répétitions pour la mesure de latence")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    index = BM25Index.open(args.data_dir)
+    print(f"Index: {len(index)} termes, {index.num_docs} chunks, avgdl {index.avgdl:.1f}")
+    for exhaustive in (True, False):
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            ids, scores = index.search(args.query, args.k, exhaustive=exhaustive)
+        latency = (time.perf_counter() - start) / args.repeats * 1000
+        stats = index.last_stats
+        print(f"{'exhaustive' if exhaustive else 'MaxScore':<10} {latency:7.3f} ms, "
+              f"{stats['decoded']}/{stats['postings']} postings décodés, {stats['scored']} évalués")
+    for rank, (chunk_id, score) in enumerate(zip(ids.tolist(), scores.tolist()), 1):
+        print(f"{rank:>3}. chunk {chunk_id:<6} score {score:.3f}")
+
+
+if __name__ == "__main__":
+    main()
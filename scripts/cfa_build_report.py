@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Variantes précompressées des artefacts de cfa_data/, rapport de construction
+et contrôle d'un budget de taille / temps de parsing.
+
+Variantes de chaque artefact de cfa_data/ :
+    <fichier>.gz   gzip niveau 9, horodatage nul (variantes reproductibles)
+    <fichier>.br   brotli qualité 11, si le paquet brotli est installé (sinon ignoré)
+Le rapport (cfa_data_build_report.json, à côté de cfa_data/, hors du bundle)
+donne pour chaque fichier la taille brute, la taille de chaque variante et le
+temps de parsing mesuré (json.loads pour les JSON, lecture complète pour
+les fichiers binaires et .npz), ainsi que les totaux du bundle. Les tailles des
+variantes sont toujours mesurées ; les fichiers .gz / .br ne sont écrits que
+sur demande (write_variants).
+
+Bundle : les fichiers embarqués dans la fonction Netlify (included_files
+"netlify/functions/cfa_data/*.json" dans netlify.toml). Les variantes .gz / .br,
+les fichiers binaires et cfa_vectors_meta.jsonl n'en font pas partie ; la
+taille gzip du bundle approche celle du zip de la fonction. Pour une
+construction pas encore publiée (staging ou version), le bundle mesuré est
+celui d'après publication : artefacts de la construction plus les JSON de
+cfa_data/ qui y resteront (ex. cfa_knowledge_embeddings_french_enriched.json,
+chargé en premier par la fonction), marqués "retained".
+
+Le budget (SizeBudget) est vérifié sur le rapport : tout dépassement lève
+BudgetExceededError (generate_cfa_embeddings.py) ou fait échouer la
+validation (deploy_ultra_optimized.py). Une limite à None n'est pas vérifiée.
+
+USAGE:
+    python cfa_build_report.py                          # rapport + budget par défaut
+    python cfa_build_report.py --budget-bundle-gzip-mb 40 --budget-parse-ms 500
+    python cfa_build_report.py --variants               # écrit aussi les .gz / .br
+"""
+
+import argparse
+import gzip
+import io
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from cfa_artifacts import ARTIFACT_MANIFEST_FILENAME, atomic_write_json, is_generated
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SUFFIXES = {"gzip": ".gz", "brotli": ".br"}
+BUNDLED_SUFFIXES = (".json",)
+BROTLI_QUALITY = 11
+PARSE_REPEATS = 3
+MB = 1024 * 1024
+
+
+@dataclass
+class SizeBudget:
+    """Limites vérifiées sur le rapport de construction (None = pas de limite)."""
+
+    # Taille brute d'un artefact (ancien seuil de deploy_ultra_optimized.py)
+    max_file_mb: Optional[float] = 100.0
+    # Taille brute des fichiers embarqués (limite décompressée des fonctions : 250 Mo)
+    max_bundle_mb: Optional[float] = 250.0
+    # Taille gzip des fichiers embarqués (limite du zip des fonctions : 50 Mo)
+    max_bundle_gzip_mb: Optional[float] = 50.0
+    # Temps de parsing d'un artefact (chargement à froid de la fonction)
+    max_parse_ms: Optional[float] = None
+
+
+class BudgetExceededError(RuntimeError):
+    """Le rapport de construction dépasse le budget."""
+
+    def __init__(self, violations: List[str]):
+        super().__init__("Budget des artefacts CFA dépassé: " + "; ".join(violations))
+        self.violations = violations
+
+
+def report_path(data_dir: Path) -> Path:
+    """Rapport de construction, à côté de cfa_data/ (hors du bundle Netlify)."""
+    data_dir = Path(data_dir)
+    return data_dir.parent / f"{data_dir.name}_build_report.json"
+
+
+def variant_formats() -> List[str]:
+    """Formats de compression disponibles (brotli seulement s'il est installé)."""
+    return ["gzip", "brotli"] if brotli is not None else ["gzip"]
+
+
+def is_variant(path: Path) -> bool:
+    return path.suffix in VARIANT_SUFFIXES.values()
+
+
+def artifact_files(data_dir: Path) -> List[Path]:
+    """
+    Artefacts de cfa_data/, sous-répertoires compris (hors variantes, fichiers
+    temporaires et manifeste de version).
+    """
+    data_dir = Path(data_dir)
+    return [path for path in sorted(data_dir.rglob("*"))
+            if path.is_file() and not path.name.startswith(".") and not is_variant(path)
+            and path.relative_to(data_dir).as_posix() != ARTIFACT_MANIFEST_FILENAME]
+
+
+def is_bundled(path: Path, data_dir: Path) -> bool:
+    """Embarqué dans la fonction : .json à la racine de cfa_data/ (le glob ne descend pas)."""
+    return path.parent == Path(data_dir) and path.suffix in BUNDLED_SUFFIXES
+
+
+def retained_files(data_dir: Path, publish_dir: Path) -> List[Path]:
+    """
+    JSON embarqués de cfa_data/ qui restent après publication de data_dir :
+    ni remplacés par la construction, ni artefacts générés qu'elle supprime.
+    """
+    data_dir, publish_dir = Path(data_dir), Path(publish_dir)
+    if not publish_dir.exists() or publish_dir.resolve() == data_dir.resolve():
+        return []
+    return [path for path in sorted(publish_dir.iterdir())
+            if path.is_file() and is_bundled(path, publish_dir) and not path.name.startswith(".")
+            and not is_generated(path.name) and not (data_dir / path.name).exists()]
+
+
+def compress(data: bytes, fmt: str) -> bytes:
+    if fmt == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if fmt == "brotli":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    raise ValueError(f"Format de compression inconnu: {fmt}")
+
+
+def measure_parse_ms(path: Path, data: bytes, repeats: int = PARSE_REPEATS) -> float:
+    """Meilleur temps (ms) de parsing du contenu, sur repeats essais."""
+    if path.suffix == ".json":
+        def parse():
+            json.loads(data)
+    elif path.suffix == ".jsonl":
+        def parse():
+            [json.loads(line) for line in data.splitlines()]
+    elif path.suffix == ".npz":
+        def parse():
+            with np.load(io.BytesIO(data)) as archive:
+                for name in archive.files:
+                    archive[name]
+    else:
+        def parse():
+            np.frombuffer(data, dtype=np.uint8).copy()
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parse()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 2)
+
+
+def remove_stale_variants(data_dir: Path):
+    """Supprime les variantes dont l'artefact d'origine a disparu."""
+    for path in Path(data_dir).rglob("*"):
+        if path.is_file() and is_variant(path) and not path.with_suffix("").exists():
+            path.unlink()
+
+
+def measure_file(path: Path, formats: List[str], write_variants: bool = False) -> Dict[str, Any]:
+    """Taille brute, taille de chaque variante (écrite si write_variants) et temps de parsing d'un fichier."""
+    data = path.read_bytes()
+    entry: Dict[str, Any] = {"raw_bytes": len(data)}
+    for fmt in formats:
+        compressed = compress(data, fmt)
+        entry[f"{fmt}_bytes"] = len(compressed)
+        if write_variants:
+            path.with_name(path.name + VARIANT_SUFFIXES[fmt]).write_bytes(compressed)
+    entry["parse_ms"] = measure_parse_ms(path, data)
+    return entry
+
+
+def build_report(data_dir: Path, write_variants: bool = False,
+                 publish_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Mesure chaque artefact (taille brute, taille gzip / brotli, temps de parsing)
+    et, si write_variants, écrit ses variantes .gz / .br à côté de lui.
+
+    Args:
+        data_dir: Répertoire mesuré (cfa_data/, staging ou version)
+        write_variants: Écrire les variantes .gz / .br
+        publish_dir: cfa_data/ où data_dir sera publié : ses JSON embarqués qui
+            resteront après publication (retained_files) comptent dans le bundle
+    """
+    data_dir = Path(data_dir)
+    formats = variant_formats()
+    if brotli is None:
+        logger.warning("Paquet brotli non installé: tailles et variantes .br absentes (pip install brotli)")
+    files = {}
+    for path in artifact_files(data_dir):
+        entry = measure_file(path, formats, write_variants)
+        entry["bundled"] = is_bundled(path, data_dir)
+        files[path.relative_to(data_dir).as_posix()] = entry
+    for path in retained_files(data_dir, publish_dir) if publish_dir else []:
+        files[path.name] = dict(measure_file(path, formats), bundled=True, retained=True)
+    if write_variants:
+        remove_stale_variants(data_dir)
+
+    bundled = [entry for entry in files.values() if entry["bundled"]]
+    totals = {"files": len(files), "bundled_files": len(bundled),
+              "retained_files": sum(1 for entry in files.values() if entry.get("retained")),
+              "raw_bytes": sum(entry["raw_bytes"] for entry in files.values()),
+              "bundle_raw_bytes": sum(entry["raw_bytes"] for entry in bundled),
+              "bundle_parse_ms": round(sum(entry["parse_ms"] for entry in bundled), 2)}
+    for fmt in formats:
+        totals[f"{fmt}_bytes"] = sum(entry[f"{fmt}_bytes"] for entry in files.values())
+        totals[f"bundle_{fmt}_bytes"] = sum(entry[f"{fmt}_bytes"] for entry in bundled)
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "data_dir": data_dir.name,
+        "formats": formats,
+        "files": files,
+        "totals": totals,
+    }
+
+
+def check_budget(report: Dict[str, Any], budget: SizeBudget) -> List[str]:
+    """Dépassements du budget (liste vide si le rapport le respecte)."""
+    violations = []
+    for name, entry in report["files"].items():
+        if budget.max_file_mb is not None and entry["raw_bytes"] > budget.max_file_mb * MB:
+            violations.append(f"{name}: {entry['raw_bytes'] / MB:.1f} Mo > {budget.max_file_mb} Mo")
+        if budget.max_parse_ms is not None and entry["parse_ms"] > budget.max_parse_ms:
+            violations.append(f"{name}: parsing {entry['parse_ms']:.0f} ms > {budget.max_parse_ms} ms")
+    totals = report["totals"]
+    if budget.max_bundle_mb is not None and totals["bundle_raw_bytes"] > budget.max_bundle_mb * MB:
+        violations.append(f"bundle: {totals['bundle_raw_bytes'] / MB:.1f} Mo > {budget.max_bundle_mb} Mo")
+    if budget.max_bundle_gzip_mb is not None and totals["bundle_gzip_bytes"] > budget.max_bundle_gzip_mb * MB:
+        violations.append(f"bundle gzip: {totals['bundle_gzip_bytes'] / MB:.1f} Mo > "
+                          f"{budget.max_bundle_gzip_mb} Mo")
+    return violations
+
+
+def run_build_report(data_dir: Path, budget: Optional[SizeBudget] = None, write_variants: bool = False,
+                     output_file: Optional[Path] = None, publish_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Rapport complet (mesures, budget, dépassements) écrit dans output_file
+    (défaut : report_path(data_dir)).
+
+    Raises:
+        BudgetExceededError: si le budget est dépassé (le rapport est écrit avant)
+    """
+    budget = budget or SizeBudget()
+    report = build_report(data_dir, write_variants=write_variants, publish_dir=publish_dir)
+    violations = check_budget(report, budget)
+    report["budget"] = asdict(budget)
+    report["violations"] = violations
+    output_file = Path(output_file) if output_file else report_path(data_dir)
+    atomic_write_json(output_file, report)
+    totals = report["totals"]
+    compressed = ", ".join(f"{fmt} {totals[f'bundle_{fmt}_bytes'] / MB:.1f} Mo" for fmt in report["formats"])
+    logger.info(f"Rapport de construction: {output_file} (bundle {totals['bundle_raw_bytes'] / MB:.1f} Mo, "
+                f"{compressed}, parsing {totals['bundle_parse_ms']:.0f} ms)")
+    if violations:
+        raise BudgetExceededError(violations)
+    return report
+
+
+def add_budget_arguments(parser: argparse.ArgumentParser):
+    """Options --budget-* communes aux scripts de construction et de déploiement."""
+    defaults = SizeBudget()
+    parser.add_argument("--budget-file-mb", type=float, default=defaults.max_file_mb,
+                        help="Taille brute maximale d'un artefact de cfa_data/ (Mo)")
+    parser.add_argument("--budget-bundle-mb", type=float, default=defaults.max_bundle_mb,
+                        help="Taille brute maximale des JSON embarqués dans la fonction (Mo)")
+    parser.add_argument("--budget-bundle-gzip-mb", type=float, default=defaults.max_bundle_gzip_mb,
+                        help="Taille gzip maximale des JSON embarqués dans la fonction (Mo)")
+    parser.add_argument("--budget-parse-ms", type=float, default=defaults.max_parse_ms,
+                        help="Temps de parsing maximal d'un artefact (ms, défaut: pas de limite)")
+
+
+def budget_from_args(args: argparse.Namespace) -> SizeBudget:
+    return SizeBudget(max_file_mb=args.budget_file_mb, max_bundle_mb=args.budget_bundle_mb,
+                      max_bundle_gzip_mb=args.budget_bundle_gzip_mb, max_parse_ms=args.budget_parse_ms)
+
+
+def print_report(report: Dict[str, Any]):
+    formats = report["formats"]
+    print(f"{'fichier':<48} {'brut Mo':>9} " + " ".join(f"{fmt + ' Mo':>10}" for fmt in formats)
+          + f" {'parsing ms':>11}")
+    for name, entry in report["files"].items():
+        marker = "+" if entry.get("retained") else "*" if entry["bundled"] else " "
+        print(f"{marker}{name:<47} {entry['raw_bytes'] / MB:>9.2f} "
+              + " ".join(f"{entry[fmt + '_bytes'] / MB:>10.2f}" for fmt in formats)
+              + f" {entry['parse_ms']:>11.1f}")
+    totals = report["totals"]
+    print(f"{'* bundle Netlify':<48} {totals['bundle_raw_bytes'] / MB:>9.2f} "
+          + " ".join(f"{totals['bundle_' + fmt + '_bytes'] / MB:>10.2f}" for fmt in formats)
+          + f" {totals['bundle_parse_ms']:>11.1f}")
+    if totals.get("retained_files"):
+        print("+ fichier de cfa_data/ conservé à la publication (compté dans le bundle)")
+    for violation in report.get("violations", []):
+        print(f"❌ {violation}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    default_dir = Path(__file__).resolve().parent.parent / "netlify" / "functions" / "cfa_data"
+    parser = argparse.ArgumentParser(description="Variantes compressées et budget des artefacts CFA")
+    parser.add_argument("--data-dir", type=Path, default=default_dir, help="Répertoire cfa_data/")
+    parser.add_argument("--variants", action="store_true",
+                        help="Écrire aussi les variantes .gz / .br (brotli qualité 11, lent)")
+    add_budget_arguments(parser)
+    args = parser.parse_args()
+    try:
+        report = run_build_report(args.data_dir, budget_from_args(args), write_variants=args.variants)
+    except BudgetExceededError as e:
+        with open(report_path(args.data_dir), 'r', encoding='utf-8') as f:
+            print_report(json.load(f))
+        logger.error(str(e))
+        raise SystemExit(1)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Détection des chunks quasi identiques (MinHash + LSH).
+
+Les packets de cours partagent des passages (encadrés, learning outcomes
+répétés...) : chaque copie devient un vecteur de plus à scorer à chaque
+requête. Chaque texte est réduit à une signature MinHash de ses shingles
+de mots ; l'indexation LSH par bandes ne compare un texte qu'aux textes
+partageant au moins une bande, puis la similarité de Jaccard estimée
+décide du regroupement.
+
+Le regroupement est glouton et déterministe : dans l'ordre des textes, un
+texte rejoint le premier représentant (canonique) assez similaire, sinon
+il devient lui-même canonique. Les textes ne sont jamais comparés qu'à des
+canoniques, ce qui évite les chaînes A~B~C regroupant des textes éloignés.
+
+USAGE:
+    canonical = near_duplicate_groups(texts, threshold=0.9)
+    # canonical[i] == i  -> texte conservé ; sinon index du texte qui le remplace
+"""
+
+import logging
+import re
+import zlib
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Premier de Mersenne 2^61 - 1 : a * x + b tient dans uint64 pour a, b, x < 2^32
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(text: str, size: int = 5) -> np.ndarray:
+    """Hashes (uint32) des séquences de size mots consécutifs, texte en minuscules."""
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams),
+                                 dtype=np.uint64, count=len(grams)))
+
+
+class MinHasher:
+    """Signatures MinHash à num_perm permutations (graine fixe : résultats reproductibles)."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """Minimum de chaque permutation sur les shingles du texte."""
+        hashes = shingles(text, self.shingle_size)
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+
+def estimated_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Similarité de Jaccard estimée : part des permutations de même minimum."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def near_duplicate_groups(texts: Sequence[str], threshold: float = 0.9,
+                          num_perm: int = 128, bands: int = 32) -> List[int]:
+    """
+    Index du texte canonique de chaque texte.
+
+    Args:
+        texts: Textes dans l'ordre de priorité (le premier d'un groupe est conservé)
+        threshold: Jaccard estimé minimal pour fusionner deux textes
+        num_perm: Taille des signatures MinHash
+        bands: Bandes LSH (num_perm / bands lignes par bande) ; 32 x 4 rend
+            très probable la comparaison des paires au-delà de ~0,5
+
+    Returns:
+        canonical[i] = i si le texte i est conservé, sinon l'index de son canonique
+    """
+    if num_perm % bands:
+        raise ValueError("num_perm doit être un multiple de bands")
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm=num_perm)
+    buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+    signatures: Dict[int, np.ndarray] = {}
+    canonical = list(range(len(texts)))
+
+    for i, text in enumerate(texts):
+        signature = hasher.signature(text)
+        keys = [signature[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+        candidates = sorted({j for band, key in enumerate(keys) for j in buckets[band].get(key, ())})
+        match = next((j for j in candidates
+                      if estimated_jaccard(signature, signatures[j]) >= threshold), None)
+        if match is not None:
+            canonical[i] = match
+            continue
+        signatures[i] = signature
+        for band, key in enumerate(keys):
+            buckets[band].setdefault(key, []).append(i)
+    return canonical
+
+
+def duplicate_report(canonical: Sequence[int], embedding_dim: int) -> Dict[str, Any]:
+    """Gains de la déduplication : vecteurs supprimés, octets et produits scalaires économisés."""
+    total = len(canonical)
+    removed = sum(1 for i, j in enumerate(canonical) if i != j)
+    return {
+        "chunks_before": total,
+        "chunks_after": total - removed,
+        "duplicates_removed": removed,
+        "merged_groups": len({j for i, j in enumerate(canonical) if i != j}),
+        "vector_bytes_saved": removed * embedding_dim * 4,
+        # Un produit scalaire par chunk et par requête : part du travail de recherche évitée
+        "search_work_saved": removed / total if total else 0.0,
+    }
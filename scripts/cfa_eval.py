@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Jeu de requêtes françaises de référence et mesure du rappel@k.
+
+Les requêtes sont celles utilisées pour valider le système
+(test_multilingual_solution.py, deploy_ultra_optimized.py), complétées
+par leur traduction anglaise (FrenchToEnglishTranslator), comme le fait la
+recherche en production avant l'encodage.
+
+Le rappel@k d'un index approché (int8, PQ, binaire, PCA...) se mesure
+contre la recherche exacte float32 sur ces requêtes :
+    rappel@k = |top-k approché ∩ top-k exact| / k, moyenné sur les requêtes.
+"""
+
+import json
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+import numpy as np
+
+from cfa_quantization import top_k_rows
+from french_to_english_translator import FrenchToEnglishTranslator
+
+FRENCH_QUERIES = [
+    "Constituer un portefeuille diversifié pour ma retraite en minimisant les risques",
+    "Stratégie d'investissement prudente avec allocation équilibrée",
+    "Optimiser mon patrimoine avec gestion des risques",
+    "Épargne retraite avec croissance long terme",
+    "Stratégie d'investissement prudente",
+    "Optimisation patrimoine croissance long terme",
+    "Transmission de patrimoine et planification successorale",
+    "Fiscalité des placements et optimisation fiscale",
+    "Profil de risque audacieux avec actions et obligations",
+    "Allocation d'actifs stratégique et tactique",
+]
+
+
+def evaluation_queries(translate: bool = True) -> List[str]:
+    """Requêtes françaises de référence, suivies de leur traduction anglaise."""
+    queries = list(FRENCH_QUERIES)
+    if translate:
+        translator = FrenchToEnglishTranslator()
+        queries += [translator.translate_query(query) for query in FRENCH_QUERIES]
+    return queries
+
+
+def load_query_vectors(data_dir: Path, vectors: np.ndarray, source: str = "french",
+                       sample_size: int = 100) -> np.ndarray:
+    """
+    Requêtes encodées pour les benchmarks (cfa_pq.py, cfa_pca.py).
+
+    Args:
+        data_dir: Répertoire cfa_data/ (cfa_embedding_config.json donne le modèle)
+        vectors: Vecteurs float du répertoire
+        source: "french" (requêtes de référence encodées, modèle requis)
+            ou "chunks" (sample_size chunks tirés au hasard, graine fixe)
+        sample_size: Nombre de chunks tirés en mode "chunks"
+    """
+    if source == "chunks":
+        rng = np.random.default_rng(0)
+        return vectors[rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)]
+
+    from sentence_transformers import SentenceTransformer
+
+    with open(Path(data_dir) / "cfa_embedding_config.json", 'r', encoding='utf-8') as f:
+        model_name = json.load(f)["model_name"]
+    model = SentenceTransformer(model_name)
+    return np.asarray(model.encode(evaluation_queries(), normalize_embeddings=True), dtype=np.float32)
+
+
+def exact_top_k(vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> List[np.ndarray]:
+    """Top-k exact (produit scalaire float32) de chaque requête."""
+    scores = np.asarray(query_vectors, dtype=np.float32) @ np.asarray(vectors, dtype=np.float32).T
+    return list(top_k_rows(scores, k))
+
+
+def recall_at_k(reference: Sequence[np.ndarray], candidates: Sequence[np.ndarray], k: int) -> float:
+    """Rappel@k moyen des résultats candidats par rapport aux résultats de référence."""
+    if not reference:
+        return 0.0
+    hits = [len(set(ref[:k].tolist()) & set(cand[:k].tolist())) / min(k, len(ref))
+            for ref, cand in zip(reference, candidates)]
+    return round(float(np.mean(hits)), 4)
+
+
+def evaluate_recall(vectors: np.ndarray, query_vectors: np.ndarray,
+                    search_fn: Callable[[np.ndarray, int], np.ndarray],
+                    ks: Sequence[int] = (5, 10)) -> dict:
+    """
+    Rappel@k d'une fonction de recherche approchée contre la recherche exacte.
+
+    Args:
+        vectors: Vecteurs float de référence
+        query_vectors: Requêtes encodées (une ligne par requête)
+        search_fn: (requête, k) -> indices, du meilleur au moins bon
+        ks: Valeurs de k évaluées
+    """
+    max_k = max(ks)
+    reference = exact_top_k(vectors, query_vectors, max_k)
+    candidates = [np.asarray(search_fn(query, max_k)) for query in query_vectors]
+    return {f"recall@{k}": recall_at_k(reference, candidates, k) for k in ks}
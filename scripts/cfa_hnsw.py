@@ -0,0 +1,653 @@
+#!/usr/bin/env python3
+"""
+Index de graphe HNSW (plus proches voisins approchés) sur les embeddings CFA.
+
+Au-delà de quelques centaines de milliers de chunks, le produit matrice-vecteur
+exact lit toute la matrice à chaque requête. HNSW (Malkov & Yashunin) relie
+chaque vecteur à ses voisins dans une hiérarchie de graphes : la couche 0
+contient tous les vecteurs, chaque couche supérieure une fraction ~1/M de la
+précédente. Une requête descend glouton les couches hautes puis explore la
+couche 0 avec une liste de ef candidats : quelques milliers de produits
+scalaires au lieu de N.
+
+Paramètres :
+    M                voisins choisis par vecteur (2M au plus en couche 0, M au-dessus)
+    ef_construction  candidats explorés pour choisir les voisins (qualité du graphe)
+    ef               candidats explorés à la recherche (compromis rappel / latence)
+Les voisins sont choisis par l'heuristique de HNSW : un candidat n'est gardé que
+s'il est plus proche du vecteur que de tout voisin déjà gardé.
+
+Construction hors ligne, couche par couche du haut vers le bas, par lots de
+vecteurs : chaque lot est recherché en une fois dans le graphe déjà construit
+(recherche en faisceau vectorisée), complété par les paires internes au lot,
+puis relié dans les deux sens (les listes pleines sont ré-élaguées).
+
+Artefact cfa_hnsw.bin (entiers little-endian), ouvert par np.memmap :
+    0   8 octets  magic b"CFAHNW\\x00\\x01"
+    8   uint16    version du format
+    10  uint16    nombre de couches
+    12  uint32    nombre de vecteurs
+    16  uint32    dimension
+    20  uint32    M
+    24  uint32    ef_construction
+    28  uint32    point d'entrée
+    32  uint64    identifiant de source de cfa_vectors.bin (voir cfa_vector_store)
+    40..63        réservé (zéros)
+    64  table des couches, 24 octets par couche :
+        uint32 nombre de nœuds, uint32 largeur des listes,
+        uint64 position des nœuds (0 en couche 0 : tous les vecteurs),
+        uint64 position des listes de voisins
+    puis, alignés sur 8 octets : identifiants des nœuds de chaque couche haute
+    (int32 triés) et listes de voisins (int32, complétées par -1).
+Les vecteurs ne sont pas dupliqués : l'index référence les lignes de
+cfa_vectors.bin, et n'est ouvert qu'avec le cfa_vectors.bin de la même
+construction (même identifiant de source).
+
+USAGE:
+    index = HNSWIndex.build(vectors, M=16, ef_construction=100)
+    index.save(cfa_data_dir / HNSW_FILENAME)
+    index = HNSWIndex.open(cfa_data_dir)          # vecteurs : cfa_vectors.bin
+    ids, scores = index.search(query, k=10, ef=64)
+
+    # Index des chunks de cfa_data/
+    python cfa_hnsw.py --data-dir ../netlify/functions/cfa_data --m 16
+    # Benchmark rappel@10 / latence contre la recherche exacte (vecteurs synthétiques)
+    python cfa_hnsw.py --benchmark --sizes 10000 100000 1000000 --ef 16 32 64 128
+"""
+
+import argparse
+import heapq
+import logging
+import math
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cfa_quantization import top_k
+from cfa_vector_store import VectorStore, check_same_source
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CFAHNW\x00\x01"
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sHHIIIIIQ")
+_LAYER = struct.Struct("<IIQQ")
+
+HNSW_FILENAME = "cfa_hnsw.bin"
+DEFAULT_M = 16
+DEFAULT_EF_CONSTRUCTION = 100
+DEFAULT_EF_SEARCH = 64
+# Vecteurs insérés à la fois pendant la construction
+BUILD_BATCH_SIZE = 256
+PROGRESS_MIN_NODES = 50_000
+
+
+def _align(f, boundary: int = 8):
+    padding = -f.tell() % boundary
+    if padding:
+        f.write(b"\x00" * padding)
+
+
+class _SortedKeySet:
+    """
+    Ensemble creux d'entiers int64 : un grand tableau trié et un petit tableau
+    trié où arrivent les nouvelles clés, fusionné dans le grand quand il en
+    dépasse le huitième (chaque ajout déplace le petit tableau, pas tout l'ensemble).
+    """
+
+    def __init__(self, keys: np.ndarray):
+        self._large = np.unique(np.asarray(keys, dtype=np.int64))
+        self._small = np.empty(0, dtype=np.int64)
+
+    @staticmethod
+    def _contains(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        if not len(sorted_keys):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        return sorted_keys[positions] == keys
+
+    def add(self, keys: np.ndarray) -> np.ndarray:
+        """Ajoute des clés distinctes ; renvoie le masque de celles qui n'y étaient pas encore."""
+        # Clés triées : recherches dichotomiques à accès mémoire croissants
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        seen = self._contains(self._large, sorted_keys) | self._contains(self._small, sorted_keys)
+        new = sorted_keys[~seen]
+        self._small = np.insert(self._small, np.searchsorted(self._small, new), new)
+        if len(self._small) * 8 > len(self._large):
+            self._large = np.insert(self._large, np.searchsorted(self._large, self._small), self._small)
+            self._small = np.empty(0, dtype=np.int64)
+        fresh = np.empty(len(keys), dtype=bool)
+        fresh[order] = ~seen
+        return fresh
+
+
+class HNSWIndex:
+    """Graphe HNSW sur une matrice de vecteurs normalisés (similarité = produit scalaire)."""
+
+    def __init__(self, vectors: np.ndarray, layers: List[Tuple[Optional[np.ndarray], np.ndarray]],
+                 entry_point: int, M: int = DEFAULT_M, ef_construction: int = DEFAULT_EF_CONSTRUCTION,
+                 ef_search: int = DEFAULT_EF_SEARCH, source_id: int = 0):
+        """
+        Args:
+            vectors: Vecteurs indexés (count, dim), lignes de cfa_vectors.bin
+            layers: (nœuds triés, listes de voisins) de chaque couche, couche 0 en
+                premier (nœuds None : tous les vecteurs)
+            entry_point: Vecteur de la couche la plus haute où commence la recherche
+            M: Voisins choisis par vecteur
+            ef_construction: Candidats explorés à la construction
+            ef_search: Candidats explorés par défaut à la recherche
+            source_id: Identifiant de source des vecteurs indexés (0 = inconnu)
+        """
+        self.vectors = vectors
+        self.layers = layers
+        self.entry_point = entry_point
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.source_id = source_id
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def num_layers(self) -> int:
+        return len(self.layers)
+
+    def _gather(self, ids: np.ndarray) -> np.ndarray:
+        return np.asarray(self.vectors[ids], dtype=np.float32)
+
+    def _rows(self, layer: int, ids: np.ndarray) -> np.ndarray:
+        """Lignes des listes de voisins de ids dans une couche."""
+        nodes = self.layers[layer][0]
+        return ids if nodes is None else np.searchsorted(nodes, ids)
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, M: int = DEFAULT_M, ef_construction: int = DEFAULT_EF_CONSTRUCTION,
+              batch_size: int = BUILD_BATCH_SIZE, seed: int = 0, source_id: int = 0) -> "HNSWIndex":
+        """
+        Construit le graphe de vecteurs normalisés.
+
+        Args:
+            vectors: Matrice (count, dim), chargée en float32 pour la construction
+            M: Voisins choisis par vecteur (2M au plus en couche 0)
+            ef_construction: Candidats explorés pour choisir les voisins
+            batch_size: Vecteurs insérés à la fois
+            seed: Graine du tirage des niveaux
+            source_id: Identifiant de source des vecteurs (VectorStore.source_id), enregistré dans l'en-tête
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        count = len(vectors)
+        if count == 0:
+            raise ValueError("Aucun vecteur à indexer")
+        ef_construction = max(ef_construction, M)
+        # Niveau de chaque vecteur : loi géométrique de raison 1/M
+        rng = np.random.default_rng(seed)
+        levels = np.floor(-np.log(1.0 - rng.random(count)) / math.log(max(M, 2))).astype(np.int64)
+        top_level = int(levels.max())
+        entry_point = int(np.flatnonzero(levels == top_level)[0])
+
+        layers: List[Tuple[Optional[np.ndarray], np.ndarray]] = [None] * (top_level + 1)
+        index = cls(vectors, layers, entry_point, M, ef_construction, source_id=source_id)
+        start = time.perf_counter()
+        for layer in range(top_level, -1, -1):
+            members = np.flatnonzero(levels >= layer)
+            width = 2 * M if layer == 0 else M
+            layers[layer] = (None if layer == 0 else members,
+                             np.full((len(members), width), -1, dtype=np.int32))
+            # Niveaux décroissants : les points d'entrée venus des couches hautes sont insérés d'abord
+            order = members[np.argsort(-levels[members], kind='stable')]
+            index._build_layer(layer, order, batch_size)
+            logger.info(f"Couche {layer}: {len(members)} nœuds ({time.perf_counter() - start:.1f} s)")
+        return index
+
+    def _build_layer(self, layer: int, order: np.ndarray, batch_size: int):
+        """Insère les nœuds d'une couche par lots (order[0] est le point d'entrée de la couche)."""
+        inserted = np.zeros(len(self.vectors), dtype=bool)
+        inserted[order[0]] = True
+        position = 1
+        # Progression journalisée tous les 10 % des grandes couches
+        report_every = max(len(order) // 10, PROGRESS_MIN_NODES)
+        next_report = report_every
+        while position < len(order):
+            # Lots croissants au départ : les premiers nœuds trouvent déjà un graphe
+            batch = order[position:position + min(batch_size, position)]
+            position += len(batch)
+            if position >= next_report:
+                logger.info(f"Couche {layer}: {position}/{len(order)} nœuds insérés")
+                next_report += report_every
+            queries = self.vectors[batch]
+            entries = self._descend(queries, layer + 1)
+            entries = np.where(inserted[entries], entries, order[0])
+            ids, sims = self._beam_search(layer, queries, entries, self.ef_construction)
+
+            # Paires internes au lot : ces nœuds ne sont pas encore dans le graphe
+            internal = queries @ queries.T
+            np.fill_diagonal(internal, -np.inf)
+            ids = np.concatenate([ids, np.broadcast_to(batch, (len(batch), len(batch)))], axis=1)
+            sims = np.concatenate([sims, internal], axis=1)
+            keep = np.argsort(-sims, axis=1, kind='stable')[:, :self.ef_construction]
+            ids = np.take_along_axis(ids, keep, axis=1)
+            sims = np.take_along_axis(sims, keep, axis=1)
+            ids[~np.isfinite(sims)] = -1
+
+            neighbors = self.layers[layer][1]
+            selected = self._select(ids, sims, self.M)
+            neighbors[self._rows(layer, batch), :self.M] = selected
+            inserted[batch] = True
+            sources = np.repeat(batch, self.M)
+            self._link_back(layer, selected.ravel(), sources)
+
+    def _descend(self, queries: np.ndarray, lowest_layer: int) -> np.ndarray:
+        """Nœud le plus proche de chaque requête, par descente gloutonne jusqu'à lowest_layer."""
+        entries = np.full(len(queries), self.entry_point, dtype=np.int64)
+        for layer in range(self.num_layers - 1, lowest_layer - 1, -1):
+            entries = self._beam_search(layer, queries, entries, 1)[0][:, 0]
+        return entries
+
+    def _beam_search(self, layer: int, queries: np.ndarray, entries: np.ndarray,
+                     ef: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Recherche en faisceau de largeur ef, vectorisée sur un lot de requêtes.
+
+        Chaque tour développe, pour chaque requête, le meilleur candidat non
+        encore développé de son faisceau ; la recherche s'arrête quand tout le
+        faisceau l'a été. Returns: (ids, similarités) (requêtes, ef), triés, -1 en bout.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        count = len(queries)
+        neighbors = self.layers[layer][1]
+        width = neighbors.shape[1]
+        ids = np.full((count, ef), -1, dtype=np.int64)
+        sims = np.full((count, ef), -np.inf, dtype=np.float32)
+        expanded = np.zeros((count, ef), dtype=bool)
+        ids[:, 0] = entries
+        sims[:, 0] = np.einsum('nd,nd->n', self._gather(entries), queries)
+        every_row = np.arange(count)
+        # Paires (requête, nœud) déjà évaluées, en clés requête * N + nœud : mémoire
+        # proportionnelle aux nœuds visités, pas au lot x nombre de vecteurs
+        size = len(self.vectors)
+        visited = _SortedKeySet(every_row * size + ids[:, 0])
+        while True:
+            pending = np.where(expanded, -np.inf, sims)
+            best = pending.argmax(axis=1)
+            active = np.flatnonzero(pending[every_row, best] > -np.inf)
+            if not len(active):
+                return ids, sims
+            expanded[active, best[active]] = True
+            candidates = neighbors[self._rows(layer, ids[active, best[active]])]
+            rows, columns = np.nonzero(candidates >= 0)
+            owners, nodes = active[rows], candidates[rows, columns].astype(np.int64)
+            # Chaque nœud n'est évalué qu'une fois par requête
+            fresh = visited.add(owners * size + nodes)
+            owners, nodes = owners[fresh], nodes[fresh]
+            candidate_sims = np.einsum('nd,nd->n', self._gather(nodes), queries[owners])
+            # Seuls les voisins meilleurs que le dernier du faisceau y entrent
+            better = candidate_sims > sims[owners, -1]
+            owners, nodes, candidate_sims = owners[better], nodes[better], candidate_sims[better]
+            if not len(owners):
+                continue
+            targets, starts, counts = np.unique(owners, return_index=True, return_counts=True)
+            group = np.repeat(np.arange(len(targets)), counts)
+            ranks = np.arange(len(owners)) - np.repeat(starts, counts)
+            added_ids = np.full((len(targets), width), -1, dtype=np.int64)
+            added_sims = np.full((len(targets), width), -np.inf, dtype=np.float32)
+            added_ids[group, ranks] = nodes
+            added_sims[group, ranks] = candidate_sims
+            merged_ids = np.concatenate([ids[targets], added_ids], axis=1)
+            merged_sims = np.concatenate([sims[targets], added_sims], axis=1)
+            merged_expanded = np.concatenate([expanded[targets], np.zeros(added_ids.shape, dtype=bool)], axis=1)
+            keep = np.argsort(-merged_sims, axis=1, kind='stable')[:, :ef]
+            ids[targets] = np.take_along_axis(merged_ids, keep, axis=1)
+            sims[targets] = np.take_along_axis(merged_sims, keep, axis=1)
+            expanded[targets] = np.take_along_axis(merged_expanded, keep, axis=1)
+
+    def _select(self, ids: np.ndarray, sims: np.ndarray, m: int) -> np.ndarray:
+        """
+        Heuristique de choix des voisins, sur un lot : parmi des candidats triés
+        (similarité à la base décroissante, -1 en bout), un candidat est gardé
+        s'il est plus proche de la base que de tout candidat déjà gardé.
+
+        Returns: (lot, m) identifiants gardés, -1 en bout
+        """
+        valid = ids >= 0
+        vectors = self._gather(np.where(valid, ids, 0))
+        pairwise = np.matmul(vectors, vectors.transpose(0, 2, 1))
+        selected = np.zeros(ids.shape, dtype=bool)
+        counts = np.zeros(len(ids), dtype=np.int64)
+        for i in range(ids.shape[1]):
+            candidate = valid[:, i] & (counts < m)
+            if not candidate.any():
+                break
+            dominated = (selected[:, :i] & (pairwise[:, i, :i] > sims[:, i, None])).any(axis=1)
+            keep = candidate & ~dominated
+            selected[:, i] = keep
+            counts += keep
+        order = np.argsort(~selected, axis=1, kind='stable')[:, :m]
+        chosen = np.take_along_axis(ids, order, axis=1)
+        chosen[~np.take_along_axis(selected, order, axis=1)] = -1
+        return chosen.astype(np.int32)
+
+    def _link_back(self, layer: int, targets: np.ndarray, sources: np.ndarray):
+        """Ajoute les liens inverses targets -> sources ; une liste pleine est ré-élaguée."""
+        neighbors = self.layers[layer][1]
+        width = neighbors.shape[1]
+        valid = targets >= 0
+        targets, sources = targets[valid].astype(np.int64), sources[valid].astype(np.int64)
+        target_rows = self._rows(layer, targets)
+        duplicate = (neighbors[target_rows] == sources[:, None]).any(axis=1)
+        targets, sources, target_rows = targets[~duplicate], sources[~duplicate], target_rows[~duplicate]
+        if not len(targets):
+            return
+        sims = np.einsum('nd,nd->n', self._gather(targets), self._gather(sources))
+        order = np.lexsort((-sims, targets))
+        targets, sources, target_rows = targets[order], sources[order], target_rows[order]
+        unique_targets, starts, new_counts = np.unique(targets, return_index=True, return_counts=True)
+        ranks = np.arange(len(targets)) - np.repeat(starts, new_counts)
+        # Au plus width nouveaux liens par nœud (les plus proches)
+        kept = ranks < width
+        group = np.repeat(np.arange(len(unique_targets)), new_counts)[kept]
+        ranks, sources = ranks[kept], sources[kept]
+        new_counts = np.minimum(new_counts, width)
+        rows = self._rows(layer, unique_targets)
+        current = neighbors[rows]
+        current_counts = (current >= 0).sum(axis=1)
+
+        fits = current_counts + new_counts <= width
+        in_place = fits[group]
+        neighbors[rows[group[in_place]], current_counts[group[in_place]] + ranks[in_place]] = sources[in_place]
+
+        overflow = np.flatnonzero(~fits)
+        if not len(overflow):
+            return
+        additions = np.full((len(unique_targets), width), -1, dtype=np.int64)
+        additions[group, ranks] = sources
+        for added in np.unique(new_counts[overflow]):
+            bucket = overflow[new_counts[overflow] == added]
+            candidates = np.concatenate([current[bucket].astype(np.int64), additions[bucket, :added]], axis=1)
+            candidate_sims = np.einsum('ncd,nd->nc', self._gather(np.maximum(candidates, 0)),
+                                       self._gather(unique_targets[bucket]))
+            candidate_sims[candidates < 0] = -np.inf
+            keep = np.argsort(-candidate_sims, axis=1, kind='stable')
+            neighbors[rows[bucket]] = self._select(np.take_along_axis(candidates, keep, axis=1),
+                                                   np.take_along_axis(candidate_sims, keep, axis=1), width)
+
+    # ------------------------------------------------------------------
+    # Recherche
+    # ------------------------------------------------------------------
+
+    def search(self, query: np.ndarray, k: int = 10, ef: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (indices, scores) des k plus proches voisins approchés, du meilleur au moins bon.
+
+        Args:
+            query: Vecteur requête normalisé
+            k: Nombre de résultats
+            ef: Candidats explorés en couche 0 (défaut ef_search, au moins k)
+        """
+        query = np.asarray(query, dtype=np.float32)
+        ef = max(ef or self.ef_search, k)
+        node = self.entry_point
+        best = float(self._gather(np.array([node]))[0] @ query)
+        for layer in range(self.num_layers - 1, 0, -1):
+            node, best = self._greedy(layer, query, node, best)
+
+        # Couche 0 : candidats (tas max) et résultats (tas min de taille ef) ;
+        # nœuds visités dans un ensemble, coût proportionnel aux nœuds explorés et non à N
+        neighbors = self.layers[0][1]
+        visited = {node}
+        candidates = [(-best, node)]
+        results = [(best, node)]
+        while candidates:
+            negative, node = heapq.heappop(candidates)
+            if -negative < results[0][0] and len(results) >= ef:
+                break
+            row = [neighbor for neighbor in neighbors[node].tolist() if neighbor >= 0 and neighbor not in visited]
+            if not row:
+                continue
+            visited.update(row)
+            row = np.asarray(row, dtype=np.int64)
+            worst = results[0][0]
+            for neighbor, sim in zip(row.tolist(), (self._gather(row) @ query).tolist()):
+                if len(results) < ef or sim > worst:
+                    heapq.heappush(candidates, (-sim, neighbor))
+                    heapq.heappush(results, (sim, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+                    worst = results[0][0]
+        scores = np.array([sim for sim, _ in results], dtype=np.float32)
+        ids = np.array([neighbor for _, neighbor in results], dtype=np.int64)
+        order = top_k(scores, k)
+        return ids[order], scores[order]
+
+    def _greedy(self, layer: int, query: np.ndarray, node: int, best: float) -> Tuple[int, float]:
+        """Descente gloutonne dans une couche haute : voisin le plus proche tant qu'il y en a un meilleur."""
+        nodes, neighbors = self.layers[layer]
+        while True:
+            row = neighbors[int(np.searchsorted(nodes, node))]
+            row = row[row >= 0]
+            if not len(row):
+                return node, best
+            sims = self._gather(row) @ query
+            j = int(sims.argmax())
+            if sims[j] <= best:
+                return node, best
+            node, best = int(row[j]), float(sims[j])
+
+    def search_many(self, queries: np.ndarray, k: int = 10, ef: Optional[int] = None,
+                    batch_size: int = 64) -> Tuple[np.ndarray, np.ndarray]:
+        """(indices, scores) de forme (requêtes, k) : recherche en faisceau vectorisée par lots."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        ef = max(ef or self.ef_search, k)
+        all_ids, all_scores = [], []
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            ids, sims = self._beam_search(0, batch, self._descend(batch, 1), ef)
+            all_ids.append(ids[:, :k])
+            all_scores.append(sims[:, :k])
+        return np.concatenate(all_ids), np.concatenate(all_scores)
+
+    # ------------------------------------------------------------------
+    # Artefact
+    # ------------------------------------------------------------------
+
+    def save(self, path: Path) -> int:
+        """Écrit cfa_hnsw.bin ; renvoie sa taille en octets."""
+        path = Path(path)
+        table = []
+        with open(path, 'wb') as f:
+            f.write(b"\x00" * (HEADER_SIZE + _LAYER.size * self.num_layers))
+            for nodes, neighbors in self.layers:
+                nodes_offset = 0
+                if nodes is not None:
+                    _align(f)
+                    nodes_offset = f.tell()
+                    f.write(np.ascontiguousarray(nodes, dtype='<i4').tobytes())
+                _align(f)
+                neighbors_offset = f.tell()
+                f.write(np.ascontiguousarray(neighbors, dtype='<i4').tobytes())
+                table.append(_LAYER.pack(len(neighbors), neighbors.shape[1], nodes_offset, neighbors_offset))
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.num_layers, len(self.vectors),
+                                 self.vectors.shape[1], self.M, self.ef_construction,
+                                 self.entry_point, self.source_id).ljust(HEADER_SIZE, b"\x00"))
+            f.write(b"".join(table))
+        return path.stat().st_size
+
+    @classmethod
+    def open(cls, path: Path, vectors: Optional[np.ndarray] = None,
+             ef_search: int = DEFAULT_EF_SEARCH, source_id: Optional[int] = None) -> "HNSWIndex":
+        """
+        Ouvre un index (fichier ou répertoire cfa_data/) : seuls l'en-tête et la
+        table des couches sont lus, les listes de voisins restent en np.memmap.
+
+        Args:
+            path: cfa_hnsw.bin ou répertoire qui le contient
+            vectors: Vecteurs indexés (défaut : cfa_vectors.bin du même répertoire)
+            ef_search: Candidats explorés par défaut à la recherche
+            source_id: Identifiant de source attendu (défaut : celui de cfa_vectors.bin
+                quand vectors n'est pas fourni, sinon pas de vérification)
+
+        Raises:
+            ValueError: index construit sur d'autres vecteurs (artefact périmé)
+        """
+        path = Path(path)
+        if path.is_dir():
+            path = path / HNSW_FILENAME
+        with open(path, 'rb') as f:
+            raw = f.read(HEADER_SIZE)
+            if len(raw) < HEADER_SIZE:
+                raise ValueError(f"{path}: en-tête tronqué")
+            (magic, version, num_layers, count, dim, M, ef_construction, entry_point,
+             index_source_id) = _HEADER.unpack_from(raw)
+            if magic != MAGIC:
+                raise ValueError(f"{path}: pas un index HNSW CFA")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path}: version de format {version} non supportée")
+            table = [_LAYER.unpack(f.read(_LAYER.size)) for _ in range(num_layers)]
+        if vectors is None:
+            store = VectorStore.open(path.parent)
+            vectors = store.vectors
+            source_id = store.source_id if source_id is None else source_id
+        if vectors.shape != (count, dim):
+            raise ValueError(f"{path}: index de {count} x {dim} pour des vecteurs {vectors.shape}")
+        if source_id is not None:
+            check_same_source(path, index_source_id, source_id)
+        layers = []
+        for layer_count, width, nodes_offset, neighbors_offset in table:
+            nodes = None
+            if nodes_offset:
+                nodes = np.memmap(path, dtype='<i4', mode='r', offset=nodes_offset, shape=(layer_count,))
+            neighbors = np.memmap(path, dtype='<i4', mode='r', offset=neighbors_offset,
+                                  shape=(layer_count, width))
+            layers.append((nodes, neighbors))
+        return cls(vectors, layers, entry_point, M, ef_construction, ef_search, index_source_id)
+
+
+def synthetic_vectors(count: int, num_queries: int = 200, dim: int = 384, num_clusters: Optional[int] = None,
+                      spread: float = 0.8, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vecteurs normalisés groupés autour de centres (comme des embeddings de
+    thèmes voisins) et requêtes tirées de la même loi, hors de l'index.
+
+    Returns: (vecteurs (count, dim), requêtes (num_queries, dim)), float32
+    """
+    rng = np.random.default_rng(seed)
+    num_clusters = num_clusters or max(10, count // 100)
+    centers = rng.standard_normal((num_clusters, dim), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    def draw(n: int) -> np.ndarray:
+        out = np.empty((n, dim), dtype=np.float32)
+        for start in range(0, n, 100_000):
+            block = out[start:start + 100_000]
+            block[:] = centers[rng.integers(num_clusters, size=len(block))]
+            block += rng.standard_normal(block.shape, dtype=np.float32) * (spread / math.sqrt(dim))
+            block /= np.linalg.norm(block, axis=1, keepdims=True)
+        return out
+
+    return draw(count), draw(num_queries)
+
+
+def benchmark(vectors: np.ndarray, queries: np.ndarray, ef_options: Sequence[int], M: int = DEFAULT_M,
+              ef_construction: int = DEFAULT_EF_CONSTRUCTION, k: int = 10,
+              work_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Construction, taille et ouverture de l'index, puis latence par requête
+    (p50) et rappel@k de HNSW pour chaque ef contre la recherche exacte.
+    """
+    import tempfile
+    from cfa_eval import recall_at_k
+    from cfa_quantization import top_k_rows
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    reference = []
+    for start in range(0, len(queries), 16):
+        reference.extend(top_k_rows(queries[start:start + 16] @ vectors.T, k))
+
+    def latency_ms(search) -> float:
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query)
+            timings.append(time.perf_counter() - start)
+        return float(np.percentile(timings, 50)) * 1000
+
+    start = time.perf_counter()
+    built = HNSWIndex.build(vectors, M=M, ef_construction=ef_construction)
+    build_s = time.perf_counter() - start
+    with tempfile.TemporaryDirectory(dir=work_dir) as directory:
+        path = Path(directory) / HNSW_FILENAME
+        size_bytes = built.save(path)
+        start = time.perf_counter()
+        index = HNSWIndex.open(path, vectors=vectors)
+        open_ms = (time.perf_counter() - start) * 1000
+        rows = [{"method": "exact", "latency_ms": latency_ms(lambda query: top_k(vectors @ query, k)),
+                 f"recall@{k}": 1.0}]
+        for ef in ef_options:
+            found = [index.search(query, k, ef)[0] for query in queries]
+            rows.append({"method": f"hnsw ef={ef}",
+                         "latency_ms": latency_ms(lambda query: index.search(query, k, ef)),
+                         f"recall@{k}": recall_at_k(reference, found, k)})
+        del index
+    return {"count": len(vectors), "dim": vectors.shape[1], "M": M, "ef_construction": ef_construction,
+            "build_s": round(build_s, 1), "index_bytes": size_bytes, "open_ms": round(open_ms, 2),
+            "layers": built.num_layers, "rows": rows}
+
+
+def print_benchmark(report: Dict[str, Any], k: int):
+    """Affiche le résultat du benchmark d'une taille de corpus."""
+    print(f"\n{report['count']} vecteurs x {report['dim']} (M={report['M']}, "
+          f"ef_construction={report['ef_construction']}) : construction {report['build_s']} s, "
+          f"index {report['index_bytes'] / 1e6:.1f} Mo, {report['layers']} couches, "
+          f"ouverture {report['open_ms']} ms")
+    print(f"{'méthode':<14}{'latence p50 (ms)':>18}{f'rappel@{k}':>11}")
+    for row in report["rows"]:
+        print(f"{row['method']:<14}{row['latency_ms']:>18.3f}{row[f'recall@{k}']:>11.3f}")
+
+
+def main():
+    """Index HNSW des chunks d'un répertoire cfa_data/, ou benchmark sur vecteurs synthétiques."""
+    parser = argparse.ArgumentParser(description="Index HNSW des embeddings CFA")
+    parser.add_argument("--data-dir", type=Path,
+                        default=Path(__file__).resolve().parent.parent / "netlify" / "functions" / "cfa_data")
+    parser.add_argument("--m", type=int, default=DEFAULT_M, help="Voisins choisis par vecteur")
+    parser.add_argument("--ef-construction", type=int, default=DEFAULT_EF_CONSTRUCTION,
+                        help="Candidats explorés pour choisir les voisins")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Comparer à la recherche exacte sur des vecteurs synthétiques")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Tailles de corpus du benchmark")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension des vecteurs du benchmark")
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128],
+                        help="Valeurs de ef comparées")
+    parser.add_argument("--queries", type=int, default=200, help="Requêtes du benchmark")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.benchmark:
+        for size in args.sizes:
+            vectors, queries = synthetic_vectors(size, args.queries, args.dim)
+            print_benchmark(benchmark(vectors, queries, args.ef, M=args.m,
+                                      ef_construction=args.ef_construction, k=args.k), args.k)
+        return
+
+    store = VectorStore.open(args.data_dir)
+    index = HNSWIndex.build(store.vectors, M=args.m, ef_construction=args.ef_construction,
+                            source_id=store.source_id)
+    size_bytes = index.save(args.data_dir / HNSW_FILENAME)
+    logger.info(f"{HNSW_FILENAME}: {len(index)} vecteurs, {index.num_layers} couches, "
+                f"{size_bytes / 1e6:.2f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Recherche hybride : vecteurs denses + BM25, fusion de deux listes de candidats.
+
+Chaque index fournit séparément ses meilleurs candidats, par un top-k peu
+coûteux (produit matrice-vecteur + argpartition côté dense, MaxScore côté
+BM25). Seule l'union des deux listes est ensuite évaluée par les deux
+signaux : produit scalaire exact avec cfa_vectors.bin, score BM25 des seuls
+chunks de l'union. Les deux scores sont alors fusionnés :
+    rrf     somme de 1 / (rrf_k + rang) sur les deux classements de l'union
+            (un chunk sans aucun terme de la requête n'a pas de rang BM25)
+    linear  w * dense + (1 - w) * bm25, chaque signal ramené à [0, 1] sur
+            l'union ; w appris par learn_weight sur des requêtes annotées
+
+Les requêtes françaises sont traduites (FrenchToEnglishTranslator, comme côté
+Netlify) : les cours, le vocabulaire BM25 et le modèle sont en anglais.
+
+USAGE:
+    retriever = HybridRetriever(cfa_data_dir, fusion="rrf")
+    for result in retriever.search("transmission de patrimoine", k=5):
+        print(result["score"], result["dense_score"], result["bm25_score"])
+    python cfa_hybrid.py "planification successorale" --fusion linear --weight 0.6
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from cfa_bm25 import BM25Index
+from cfa_quantization import top_k
+from cfa_retriever import CFARetriever, LatencyStats
+from french_to_english_translator import FrenchToEnglishTranslator
+
+logger = logging.getLogger(__name__)
+
+FUSIONS = ("rrf", "linear")
+RRF_K = 60
+
+
+def reciprocal_ranks(scores: np.ndarray, rrf_k: int = RRF_K, positive_only: bool = False) -> np.ndarray:
+    """1 / (rrf_k + rang) de chaque score (rang 1 = meilleur) ; 0 hors classement."""
+    ranks = np.empty(len(scores), dtype=np.float64)
+    ranks[np.argsort(-scores, kind='stable')] = np.arange(1, len(scores) + 1)
+    contributions = 1.0 / (rrf_k + ranks)
+    if positive_only:
+        contributions[scores <= 0] = 0.0
+    return contributions
+
+
+def min_max(scores: np.ndarray) -> np.ndarray:
+    """Scores ramenés à [0, 1] (0 partout si tous égaux)."""
+    low, high = float(scores.min()), float(scores.max())
+    if high <= low:
+        return np.zeros(len(scores), dtype=np.float64)
+    return (scores - low) / (high - low)
+
+
+class HybridRetriever:
+    """Candidats denses et BM25 pris séparément, seule leur union est évaluée puis fusionnée."""
+
+    def __init__(self, data_dir: Path, fusion: str = "rrf", candidates: int = 50, rrf_k: int = RRF_K,
+                 dense_weight: float = 0.5, translate: bool = True, **retriever_options):
+        """
+        Args:
+            data_dir: Répertoire cfa_data/ (cfa_vectors.bin et cfa_bm25.bin requis)
+            fusion: "rrf" (rangs réciproques) ou "linear" (mélange pondéré des scores)
+            candidates: Candidats pris dans chaque index
+            rrf_k: Constante de lissage des rangs (fusion rrf)
+            dense_weight: Poids du score dense (fusion linear), voir learn_weight
+            translate: Traduire les requêtes françaises avant recherche
+            retriever_options: Options de CFARetriever (tier, model...) pour les candidats denses
+        """
+        if fusion not in FUSIONS:
+            raise ValueError(f"Fusion inconnue: {fusion} (attendu: {', '.join(FUSIONS)})")
+        self.dense = CFARetriever(data_dir, **retriever_options)
+        self.lexical = BM25Index.open(data_dir)
+        # Score dense exact de l'union : matrice float (ou vecteurs de re-classement)
+        self.vectors = self.dense.matrix if self.dense.tier in ("float", "hnsw") else self.dense.rerank_vectors
+        if self.vectors is None:
+            raise ValueError("cfa_vectors.bin requis pour évaluer l'union des candidats")
+        self.fusion = fusion
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.dense_weight = dense_weight
+        self.translator = FrenchToEnglishTranslator() if translate else None
+        self.latency = LatencyStats()
+        self.last_timings: Dict[str, float] = {}
+
+    def query_text(self, query: str) -> str:
+        return self.translator.translate_query(query) if self.translator else query
+
+    def candidate_scores(self, query: str, timings: Optional[Dict[str, float]] = None):
+        """(union des candidats triée, scores denses exacts, scores BM25) d'une requête."""
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        text = self.query_text(query)
+        query_vector = self.dense.embed(text)[0]
+        step = time.perf_counter()
+        timings["embed_ms"] = (step - start) * 1000
+        dense_ids, _ = self.dense.search_ids(query_vector, self.candidates)
+        timings["dense_ms"] = (time.perf_counter() - step) * 1000
+        step = time.perf_counter()
+        lexical_ids, _ = self.lexical.search(text, self.candidates)
+        timings["lexical_ms"] = (time.perf_counter() - step) * 1000
+        step = time.perf_counter()
+        union = np.union1d(dense_ids, lexical_ids)
+        # Lignes triées : accès séquentiels au memmap
+        dense_scores = np.asarray(self.vectors[union], dtype=np.float32) @ query_vector
+        lexical_scores = self.lexical.score_docs(text, union)
+        timings["union_ms"] = (time.perf_counter() - step) * 1000
+        return union, dense_scores, lexical_scores
+
+    def fuse(self, dense_scores: np.ndarray, lexical_scores: np.ndarray,
+             weight: Optional[float] = None) -> np.ndarray:
+        """Score fusionné de chaque chunk de l'union."""
+        if self.fusion == "rrf" and weight is None:
+            return (reciprocal_ranks(dense_scores, self.rrf_k)
+                    + reciprocal_ranks(lexical_scores, self.rrf_k, positive_only=True))
+        weight = self.dense_weight if weight is None else weight
+        return weight * min_max(dense_scores) + (1 - weight) * min_max(lexical_scores)
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Métadonnées (texte compris) des k meilleurs chunks, avec score fusionné et scores de chaque index."""
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        union, dense_scores, lexical_scores = self.candidate_scores(query, timings)
+        step = time.perf_counter()
+        fused = self.fuse(dense_scores, lexical_scores)
+        order = top_k(fused, k)
+        results = self.dense.results(union[order], fused[order])
+        for result, position in zip(results, order.tolist()):
+            result["dense_score"] = float(dense_scores[position])
+            result["bm25_score"] = float(lexical_scores[position])
+        timings["fusion_ms"] = (time.perf_counter() - step) * 1000
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        timings["union_size"] = float(len(union))
+        self.last_timings = timings
+        self.latency.record(timings)
+        return results
+
+    def learn_weight(self, queries: Sequence[str], relevant: Sequence[Sequence[int]],
+                     steps: int = 21) -> Dict[str, Any]:
+        """
+        Poids dense de la fusion linéaire maximisant le MRR sur des requêtes annotées.
+
+        Les deux signaux de chaque requête sont calculés une fois, puis la
+        grille de poids est parcourue sur ces scores. Passe la fusion en
+        "linear" avec le poids appris.
+
+        Args:
+            queries: Requêtes
+            relevant: Identifiants des chunks pertinents de chaque requête
+            steps: Points de la grille de poids dans [0, 1]
+        """
+        evaluated = [(self.candidate_scores(query), set(ids)) for query, ids in zip(queries, relevant)]
+
+        def mrr(fused_of) -> float:
+            reciprocal = []
+            for (union, dense_scores, lexical_scores), wanted in evaluated:
+                ranking = union[np.argsort(-fused_of(dense_scores, lexical_scores), kind='stable')]
+                hits = np.flatnonzero(np.isin(ranking, list(wanted)))
+                reciprocal.append(1.0 / (hits[0] + 1) if len(hits) else 0.0)
+            return float(np.mean(reciprocal)) if reciprocal else 0.0
+
+        grid = np.linspace(0.0, 1.0, steps)
+        scores = [mrr(lambda dense, lexical, w=weight: self.fuse(dense, lexical, w)) for weight in grid]
+        best = int(np.argmax(scores))
+        rrf_mrr = mrr(lambda dense, lexical: reciprocal_ranks(dense, self.rrf_k)
+                      + reciprocal_ranks(lexical, self.rrf_k, positive_only=True))
+        self.fusion, self.dense_weight = "linear", float(grid[best])
+        report = {"weight": round(self.dense_weight, 3), "mrr": round(scores[best], 4),
+                  "dense_only_mrr": round(scores[-1], 4), "bm25_only_mrr": round(scores[0], 4),
+                  "rrf_mrr": round(rrf_mrr, 4), "queries": len(evaluated)}
+        logger.info(f"Poids dense appris: {report['weight']} (MRR {report['mrr']}, "
+                    f"RRF {report['rrf_mrr']}, dense seul {report['dense_only_mrr']}, "
+                    f"BM25 seul {report['bm25_only_mrr']})")
+        return report
+
+
+def main():
+    default_dir = Path(__file__).resolve().parent.parent / "netlify" / "functions" / "cfa_data"
+    parser = argparse.ArgumentParser(description="Recherche hybride dense + BM25 sur cfa_data/")
+    parser.add_argument("query", help="Requête (français ou anglais)")
+    parser.add_argument("--data-dir", type=Path, default=default_dir, help="Répertoire cfa_data/")
+    parser.add_argument("--fusion", choices=FUSIONS, default="rrf", help="Méthode de fusion")
+    parser.add_argument("--weight", type=float, default=0.5, help="Poids du score dense (fusion linear)")
+    parser.add_argument("--candidates", type=int, default=50, help="Candidats pris dans chaque index")
+    parser.add_argument("--k", type=int, default=5, help="Nombre de résultats")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    retriever = HybridRetriever(args.data_dir, fusion=args.fusion, candidates=args.candidates,
+                                dense_weight=args.weight)
+    for rank, result in enumerate(retriever.search(args.query, args.k), 1):
+        print(f"{rank:>3}. score {result['score']:.4f} (dense {result['dense_score']:.3f}, "
+              f"bm25 {result['bm25_score']:.2f}) p.{result.get('page_number', '?')} "
+              f"{result['text'][:90]!r}")
+    timings = retriever.last_timings
+    print(f"union {timings['union_size']:.0f} chunks ; " + ", ".join(
+        f"{step[:-3]} {value:.2f} ms" for step, value in timings.items() if step.endswith("_ms")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Manifeste de construction de la base CFA (ré-ingestion incrémentale).
+
+Le manifeste mémorise, pour chaque PDF source, le hash du fichier, le hash
+du contenu de chaque page (flux et ressources) et les hashes des chunks produits par page.
+Il est écrit à côté de cfa_data/ (cfa_data_manifest.json) et n'est donc pas
+embarqué dans le bundle des Netlify Functions.
+
+Lors d'une reconstruction incrémentale :
+    - fichier inchangé          -> aucun parsing, chunks repris tels quels
+    - page inchangée            -> chunks de la page repris, page non ré-extraite
+    - texte de chunk déjà connu -> embedding repris depuis cfa_knowledge_embeddings.json
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import PyPDF2
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+logger = logging.getLogger(__name__)
+
+# 2 : hash de page incluant les ressources résolues
+MANIFEST_SCHEMA_VERSION = 2
+
+
+def text_hash(text: str) -> str:
+    """Hash SHA-256 d'un texte (clé de réutilisation des chunks et embeddings)."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    """Hash SHA-256 d'un fichier, lu par blocs."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _update_object_digest(digest, obj, cache: Dict[tuple, bytes], resolving: set):
+    """
+    Ajoute au hash la forme résolue d'un objet PDF : dictionnaires (clés triées),
+    tableaux, flux (octets encodés, sans décodage) et objets indirects, chacun
+    hashé une seule fois par PDF (polices et images partagées entre pages).
+    """
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key not in cache:
+            if key in resolving:
+                # Référence circulaire : l'objet est identifié par son numéro
+                digest.update(f"R{key}".encode())
+                return
+            resolving.add(key)
+            sub_digest = hashlib.sha256()
+            _update_object_digest(sub_digest, obj.get_object(), cache, resolving)
+            resolving.discard(key)
+            cache[key] = sub_digest.digest()
+        digest.update(b"R" + cache[key])
+    elif isinstance(obj, DictionaryObject):
+        digest.update(b"<<")
+        for name in sorted(obj):
+            if name == "/Parent":
+                continue
+            digest.update(name.encode('utf-8'))
+            _update_object_digest(digest, obj.raw_get(name), cache, resolving)
+        digest.update(b">>")
+        if isinstance(obj, StreamObject):
+            digest.update(obj._data or b'')
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for item in obj:
+            _update_object_digest(digest, item, cache, resolving)
+        digest.update(b"]")
+    else:
+        digest.update(f"{type(obj).__name__}:{obj!r};".encode('utf-8'))
+
+
+def page_content_hashes(pdf_path: Path) -> Dict[int, str]:
+    """
+    Hash de chaque page (numérotée à partir de 1) : flux de contenu et
+    ressources résolues (polices, XObjects, états graphiques...).
+
+    Une page dont seule une police ou une image référencée change (même flux
+    de contenu) change donc de hash. Beaucoup moins coûteux que extract_text() :
+    aucun décodage, seulement la lecture des flux bruts, chaque ressource
+    partagée n'étant hashée qu'une fois par PDF.
+    """
+    hashes = {}
+    cache: Dict[tuple, bytes] = {}
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_num, page in enumerate(pdf_reader.pages, 1):
+            contents = page.get_contents()
+            digest = hashlib.sha256(contents.get_data() if contents is not None else b'')
+            resources = page.raw_get("/Resources") if "/Resources" in page else None
+            if resources is not None:
+                _update_object_digest(digest, resources, cache, set())
+            hashes[page_num] = digest.hexdigest()
+    return hashes
+
+
+class BuildManifest:
+    """Hashes fichier / page / chunk d'une construction de la base CFA."""
+
+    def __init__(self, pipeline: Dict[str, Any], files: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            pipeline: Paramètres qui influencent le découpage et les embeddings
+                (modèle, taille de chunk...). Un changement invalide la réutilisation.
+            files: Entrées par nom de PDF (voir set_file)
+        """
+        self.pipeline = pipeline
+        self.files: Dict[str, Any] = files or {}
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BuildManifest"]:
+        """Charge un manifeste existant (None si absent, illisible ou d'un autre schéma)."""
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Manifeste illisible, reconstruction complète: {e}")
+            return None
+        if data.get("schema_version") != MANIFEST_SCHEMA_VERSION:
+            logger.warning("Manifeste d'un autre schéma, reconstruction complète")
+            return None
+        return cls(data.get("pipeline", {}), data.get("files", {}))
+
+    def save(self, path: Path):
+        """Écrit le manifeste (JSON compact, clés triées pour des diffs stables)."""
+        data = {
+            "schema_version": MANIFEST_SCHEMA_VERSION,
+            "pipeline": self.pipeline,
+            "files": self.files,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+    def set_file(self, name: str, sha256: str, page_hashes: Dict[int, str],
+                 page_chunk_hashes: Dict[int, List[str]]):
+        """Enregistre un PDF : hash fichier, hash par page et hashes des chunks par page."""
+        self.files[name] = {
+            "sha256": sha256,
+            "pages": {
+                str(page_num): {
+                    "sha256": page_hash,
+                    "chunks": page_chunk_hashes.get(page_num, []),
+                }
+                for page_num, page_hash in page_hashes.items()
+            },
+        }
+
+    def file_sha256(self, name: str) -> Optional[str]:
+        """Hash enregistré pour un PDF (None si inconnu)."""
+        return self.files.get(name, {}).get("sha256")
+
+    def page_hashes(self, name: str) -> Dict[int, str]:
+        """Hashes de pages enregistrés pour un PDF."""
+        pages = self.files.get(name, {}).get("pages", {})
+        return {int(page_num): entry["sha256"] for page_num, entry in pages.items()}
+
+    def page_chunk_hashes(self, name: str, page_num: int) -> List[str]:
+        """Hashes des chunks produits par une page lors de la construction précédente."""
+        return self.files.get(name, {}).get("pages", {}).get(str(page_num), {}).get("chunks", [])
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Projection ACP (PCA) des embeddings CFA vers un petit nombre de dimensions.
+
+La projection est apprise hors ligne sur les embeddings des chunks :
+moyenne puis axes principaux (SVD de la matrice centrée). Les d premiers
+axes concentrent la variance ; les vecteurs projetés sur ces axes puis
+re-normalisés remplacent les 384 dimensions du modèle pour un balayage
+d fois plus court par requête, au lieu de tronquer l'embedding à ses
+premières composantes (qui ne portent pas plus d'information que les autres).
+
+Une requête est projetée de la même façon : (q - moyenne) @ axes[:d].T,
+puis normalisée.
+
+Artefacts dans cfa_data/ :
+    cfa_pca.npz              moyenne, axes principaux, part de variance par axe
+    cfa_vectors_pca{d}.bin   vecteurs projetés (format cfa_vector_store, float32)
+
+USAGE:
+    projection = PCAProjection.fit(vectors, max_dim=128)
+    reduced = projection.project(vectors, 50)
+    scores = reduced @ projection.project(query, 50)[0]
+
+    # Variance conservée et rappel@k par dimension cible
+    python cfa_pca.py --data-dir ../netlify/functions/cfa_data --dims 16 32 50 64 128
+"""
+
+import argparse
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from cfa_eval import evaluate_recall, load_query_vectors
+from cfa_quantization import top_k
+from cfa_vector_store import VectorStore, VectorStoreWriter
+
+logger = logging.getLogger(__name__)
+
+PCA_FILENAME = "cfa_pca.npz"
+
+
+def pca_vectors_filename(dim: int) -> str:
+    """Nom du fichier de vecteurs projetés en dim dimensions."""
+    return f"cfa_vectors_pca{dim}.bin"
+
+
+class PCAProjection:
+    """Moyenne et axes principaux des embeddings ; projection normalisée."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained_variance_ratio: np.ndarray):
+        """
+        Args:
+            mean: Moyenne des embeddings (d,)
+            components: Axes principaux en lignes, par variance décroissante (max_dim, d)
+            explained_variance_ratio: Part de la variance totale portée par chaque axe
+        """
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.explained_variance_ratio = np.asarray(explained_variance_ratio, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, max_dim: int) -> "PCAProjection":
+        """Apprend les max_dim premiers axes principaux des vecteurs."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        mean = vectors.mean(axis=0)
+        _, singular_values, axes = np.linalg.svd(vectors - mean, full_matrices=False)
+        variance = singular_values.astype(np.float64) ** 2
+        max_dim = min(max_dim, len(axes))
+        return cls(mean, axes[:max_dim], variance[:max_dim] / variance.sum())
+
+    @property
+    def max_dim(self) -> int:
+        return len(self.components)
+
+    def variance_retained(self, dim: int) -> float:
+        """Part de la variance conservée par les dim premiers axes."""
+        return float(self.explained_variance_ratio[:dim].sum())
+
+    def project(self, vectors: np.ndarray, dim: int) -> np.ndarray:
+        """Vecteurs (n, dim) projetés sur les dim premiers axes puis normalisés."""
+        if dim > self.max_dim:
+            raise ValueError(f"Projection apprise sur {self.max_dim} axes, {dim} demandés")
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        projected = (vectors - self.mean) @ self.components[:dim].T
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return projected / norms
+
+    def save(self, path: Path):
+        """Écrit la projection (npz non compressé, float32)."""
+        np.savez(path, mean=self.mean.astype('<f4'), components=self.components.astype('<f4'),
+                 explained_variance_ratio=self.explained_variance_ratio.astype('<f8'))
+
+    @classmethod
+    def load(cls, path: Path) -> "PCAProjection":
+        """Relit une projection écrite par save()."""
+        with np.load(path) as data:
+            return cls(data["mean"], data["components"], data["explained_variance_ratio"])
+
+
+def write_projected_vectors(output_dir: Path, vectors: np.ndarray, projection: PCAProjection,
+                            dim: int, source_id: int) -> Path:
+    """
+    Écrit cfa_vectors_pca{dim}.bin (lignes dans l'ordre de cfa_vectors.bin), avec
+    l'identifiant de source de cfa_vectors.bin (VectorStore.source_id).
+    """
+    writer = VectorStoreWriter(output_dir, dim, filename=pca_vectors_filename(dim), write_metadata=False,
+                               source_id=source_id)
+    try:
+        for row in projection.project(vectors, dim):
+            writer.add(row)
+        writer.finalize()
+    except BaseException:
+        writer.close()
+        raise
+    return writer.vectors_file
+
+
+def evaluate_dims(vectors: np.ndarray, queries: np.ndarray, projection: PCAProjection,
+                  dims: Sequence[int], ks: Sequence[int] = (5, 10)) -> List[Dict[str, Any]]:
+    """Variance conservée, taille par vecteur et rappel@k (contre la recherche exacte) par dimension."""
+    rows = []
+    for dim in dims:
+        reduced = projection.project(vectors, dim)
+        recall = evaluate_recall(vectors, queries,
+                                 lambda query, k: top_k(reduced @ projection.project(query, dim)[0], k),
+                                 ks=ks)
+        rows.append({"dim": dim, "variance_retained": round(projection.variance_retained(dim), 4),
+                     "bytes_per_vector": dim * 4, **recall})
+    return rows
+
+
+def main():
+    """Variance conservée et rappel@k de la projection ACP sur un répertoire cfa_data/."""
+    parser = argparse.ArgumentParser(description="Évaluation de la projection ACP des embeddings CFA")
+    parser.add_argument("--data-dir", type=Path,
+                        default=Path(__file__).resolve().parent.parent / "netlify" / "functions" / "cfa_data")
+    parser.add_argument("--dims", type=int, nargs="+", default=[16, 32, 50, 64, 128])
+    parser.add_argument("--queries", choices=("french", "chunks"), default="french",
+                        help="Requêtes FR de référence (modèle requis) ou 100 chunks tirés au hasard")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    vectors = np.asarray(VectorStore.open(args.data_dir).vectors, dtype=np.float32)
+    queries = load_query_vectors(args.data_dir, vectors, args.queries)
+
+    projection = PCAProjection.fit(vectors, max(args.dims))
+    print(f"{'dim':>5}{'variance':>10}{'octets/vect.':>14}{'rappel@5':>10}{'rappel@10':>11}")
+    for row in evaluate_dims(vectors, queries, projection, args.dims):
+        print(f"{row['dim']:>5}{row['variance_retained']:>10.3f}{row['bytes_per_vector']:>14}"
+              f"{row['recall@5']:>10.3f}{row['recall@10']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
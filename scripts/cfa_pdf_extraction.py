@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Extraction de texte des PDFs CFA, séquentielle ou répartie sur un pool de processus.
+
+Module volontairement léger (PyPDF2 uniquement). Le pool démarre ses
+processus par spawn, sur toutes les plateformes : pas de fork d'un processus
+ayant déjà chargé PyTorch. Un worker spawn ré-importe le module principal ;
+generate_cfa_embeddings.py n'importe donc sentence-transformers qu'au
+chargement du modèle, pas au niveau du module. Comme ceux de l'encodage
+(parallel_encoder), les workers ignorent Ctrl-C : le processus principal
+annule les plages en attente.
+
+Un seul PDFExtractionPool sert toute une construction (démarrage des
+processus payé une fois), et chaque worker garde le dernier PDF ouvert :
+un cours n'est parsé qu'une fois par worker, quel que soit le nombre de
+plages de pages qu'il en reçoit.
+
+USAGE:
+    from cfa_pdf_extraction import PDFExtractionPool, extract_pdfs_parallel
+    pages = extract_pdfs_parallel([Path("Course 1 ....pdf")], workers=8)
+    # -> {Path: [{'text': ..., 'page_number': ...}, ...]} trié par page
+
+    with PDFExtractionPool(workers=8) as pool:    # partagé entre plusieurs appels
+        pages = extract_pdfs_parallel(pdf_paths, pool=pool)
+        for page in iter_pdf_pages(other_pdf, pool=pool):
+            ...
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional, Sequence
+
+import PyPDF2
+
+from parallel_encoder import init_worker_process
+
+logger = logging.getLogger(__name__)
+
+# Pages en dessous de ce seuil (après nettoyage) ignorées : couvertures, pages blanches
+MIN_PAGE_LENGTH = 100
+
+
+def clean_academic_text(text: str) -> str:
+    """Nettoie le texte académique pour optimiser la qualité des embeddings."""
+    # Supprimer les caractères de mise en page
+    text = re.sub(r'\s+', ' ', text)
+
+    # Supprimer les numéros de page et headers/footers typiques
+    text = re.sub(r'Page \d+', '', text)
+    text = re.sub(r'Chapter \d+', '', text)
+    text = re.sub(r'CFA Institute', '', text)
+
+    # Nettoyer les références de formules mathématiques isolées
+    text = re.sub(r'\b[A-Z]\s*=\s*[A-Z]\s*[+\-\*/]\s*[A-Z]\b', '', text)
+
+    # Conserver la structure des phrases
+    text = re.sub(r'([.!?])\s*([A-Z])', r'\1 \2', text)
+
+    return text.strip()
+
+
+def count_pages(pdf_path: Path) -> int:
+    """Nombre de pages d'un PDF (lecture de la table des pages uniquement)."""
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+# Dernier PDF ouvert par un worker du pool : (chemin, lecteur) ; None hors pool
+_worker_reader: Optional[tuple] = None
+
+
+def _init_worker():
+    """Initialisation d'un processus du pool : Ctrl-C ignoré (comme l'encodage), cache du lecteur PDF."""
+    init_worker_process()
+    global _worker_reader
+    _worker_reader = ("", None)
+
+
+def _reader(pdf_path: str) -> PyPDF2.PdfReader:
+    """Lecteur du PDF : réutilisé d'une plage à l'autre dans un worker, ouvert à chaque appel sinon."""
+    global _worker_reader
+    if _worker_reader is None:
+        return PyPDF2.PdfReader(pdf_path)
+    if _worker_reader[0] != pdf_path:
+        # Un seul PDF gardé : mémoire bornée, les plages d'un cours sont soumises à la suite
+        _worker_reader = (pdf_path, PyPDF2.PdfReader(pdf_path))
+    return _worker_reader[1]
+
+
+def _extract_range(pdf_reader: PyPDF2.PdfReader, page_numbers: Sequence[int]) -> List[tuple]:
+    """(numéro, texte nettoyé) de chaque page demandée (numérotées à partir de 1)."""
+    pages = []
+    for page_num in page_numbers:
+        text = pdf_reader.pages[page_num - 1].extract_text() or ""
+        pages.append((page_num, clean_academic_text(text) if text.strip() else ""))
+    return pages
+
+
+def extract_pages(pdf_path: str, page_numbers: Sequence[int]) -> Dict[str, Any]:
+    """
+    Extrait et nettoie un lot de pages (numérotées à partir de 1).
+
+    Exécutée dans un processus du pool : ne renvoie que des types simples
+    (picklables) et le temps passé, pour les statistiques par worker.
+    """
+    start = time.perf_counter()
+    pages = _extract_range(_reader(pdf_path), page_numbers)
+    return {
+        "pid": os.getpid(),
+        "pdf_path": pdf_path,
+        "pages": pages,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+class PDFExtractionPool:
+    """Pool de processus d'extraction, partagé par tous les PDFs d'une construction."""
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Args:
+            workers: Nombre de processus (défaut: nombre de cœurs)
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> ProcessPoolExecutor:
+        """Démarre le pool au premier appel (spawn : pas de fork d'un processus ayant chargé torch)."""
+        if self._executor is None:
+            logger.info(f"Démarrage de {self.workers} workers d'extraction PDF")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker)
+        return self._executor
+
+    def close(self):
+        """Arrête les processus du pool s'il a été démarré."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> "PDFExtractionPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _page_ranges(page_numbers: Sequence[int], pages_per_task: int) -> List[List[int]]:
+    """Découpe une liste de pages en lots consécutifs de pages_per_task pages."""
+    page_numbers = list(page_numbers)
+    return [page_numbers[i:i + pages_per_task] for i in range(0, len(page_numbers), pages_per_task)]
+
+
+def _valid_pages(pages) -> List[Dict[str, Any]]:
+    """Convertit les (page, texte) extraits au format attendu, pages trop courtes exclues."""
+    return [{'text': text, 'page_number': page_num}
+            for page_num, text in sorted(pages)
+            if len(text) > MIN_PAGE_LENGTH]
+
+
+def extract_pdf_sequential(pdf_path: Path,
+                           page_numbers: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+    """Extraction mono-processus d'un PDF (toutes les pages par défaut)."""
+    pdf_reader = PyPDF2.PdfReader(str(pdf_path))
+    total_pages = len(pdf_reader.pages)
+    if page_numbers is None:
+        page_numbers = range(1, total_pages + 1)
+    logger.info(f"Traitement de {pdf_path.name}: {len(page_numbers)}/{total_pages} pages")
+    return _valid_pages(_extract_range(pdf_reader, page_numbers))
+
+
+def _add_worker_stats(worker_stats: Dict[int, Dict[str, float]], result: Dict[str, Any]):
+    """Cumule les pages extraites et le temps passé par le worker d'un résultat d'extract_pages."""
+    stats = worker_stats.setdefault(result["pid"], {"pages": 0, "elapsed": 0.0})
+    stats["pages"] += len(result["pages"])
+    stats["elapsed"] += result["elapsed"]
+
+
+def _log_worker_stats(worker_stats: Dict[int, Dict[str, float]], total_pages: int, elapsed: float):
+    """Débit (pages/s) de chaque worker puis débit global de l'extraction."""
+    for pid, stats in sorted(worker_stats.items()):
+        rate = stats["pages"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        logger.info(f"Worker {pid}: {stats['pages']} pages en {stats['elapsed']:.1f}s ({rate:.1f} pages/s)")
+    if elapsed:
+        logger.info(f"Extraction parallèle: {total_pages} pages, {len(worker_stats)} workers, "
+                    f"{elapsed:.1f}s ({total_pages / elapsed:.1f} pages/s au total)")
+
+
+def iter_pdf_pages(pdf_path: Path, workers: int = 1, pages_per_task: int = 8,
+                   pool: Optional[PDFExtractionPool] = None,
+                   page_numbers: Optional[Sequence[int]] = None,
+                   max_pending: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Itère sur les pages valides d'un PDF, dans l'ordre des pages.
+
+    Avec un pool (ou workers > 1 : pool créé pour ce PDF), les plages de pages
+    sont extraites en avance, mais au plus max_pending plages à la fois
+    (défaut : 2 par worker) : une nouvelle plage n'est soumise qu'une fois la
+    plus ancienne restituée, et la mémoire reste bornée quelle que soit la
+    taille du PDF. Le débit de chaque worker est journalisé à la fin.
+    page_numbers restreint l'extraction à ces pages (défaut: toutes).
+    """
+    total_pages = count_pages(pdf_path)
+    if page_numbers is None:
+        page_numbers = range(1, total_pages + 1)
+    logger.info(f"Traitement de {pdf_path.name}: {len(page_numbers)}/{total_pages} pages")
+    page_ranges = _page_ranges(sorted(page_numbers), pages_per_task)
+    if pool is None and workers <= 1:
+        pdf_reader = PyPDF2.PdfReader(str(pdf_path))
+        for page_range in page_ranges:
+            yield from _valid_pages(_extract_range(pdf_reader, page_range))
+        return
+
+    owned = pool is None
+    pool = pool or PDFExtractionPool(workers)
+    max_pending = max_pending or 2 * pool.workers
+    executor = pool.start()
+    remaining = iter(page_ranges)
+    pending = deque()
+    worker_stats: Dict[int, Dict[str, float]] = {}
+    start = time.perf_counter()
+    try:
+        for page_range in islice(remaining, max_pending):
+            pending.append(executor.submit(extract_pages, str(pdf_path), page_range))
+        while pending:
+            result = pending.popleft().result()
+            # La plage suivante part dès qu'une place se libère, avant la restitution
+            for page_range in islice(remaining, 1):
+                pending.append(executor.submit(extract_pages, str(pdf_path), page_range))
+            _add_worker_stats(worker_stats, result)
+            yield from _valid_pages(result["pages"])
+        _log_worker_stats(worker_stats, len(page_numbers), time.perf_counter() - start)
+    finally:
+        # Consommateur arrêté ou erreur : plages non démarrées annulées
+        for future in pending:
+            future.cancel()
+        if owned:
+            pool.close()
+
+
+def extract_pdfs_parallel(pdf_paths: List[Path],
+                          workers: Optional[int] = None,
+                          pages_per_task: Optional[int] = None,
+                          page_selection: Optional[Dict[Path, List[int]]] = None,
+                          pool: Optional[PDFExtractionPool] = None) -> Dict[Path, List[Dict[str, Any]]]:
+    """
+    Extrait plusieurs PDFs en répartissant des plages de pages sur un pool de processus.
+
+    Toutes les plages de tous les PDFs partagent le même pool, pour occuper
+    tous les cœurs même quand un cours est beaucoup plus long que les autres.
+    Le résultat est déterministe : pages triées par (fichier, numéro de page).
+
+    Args:
+        pdf_paths: PDFs à extraire (doivent exister)
+        workers: Nombre de processus (défaut: nombre de cœurs)
+        pages_per_task: Taille des plages envoyées aux workers
+            (défaut: ~4 tâches par worker pour équilibrer la charge)
+        page_selection: Pages à extraire par PDF (défaut: toutes)
+        pool: Pool partagé avec d'autres appels (défaut: pool créé pour cet appel)
+    """
+    owned = pool is None
+    pool = pool or PDFExtractionPool(workers)
+    workers = pool.workers
+    page_selection = page_selection or {}
+    pages_to_extract: Dict[Path, List[int]] = {}
+    for pdf_path in pdf_paths:
+        try:
+            count = count_pages(pdf_path)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'extraction PDF {pdf_path}: {e}")
+            continue
+        selected = page_selection.get(pdf_path)
+        pages_to_extract[pdf_path] = selected if selected is not None else list(range(1, count + 1))
+        logger.info(f"Traitement de {pdf_path.name}: {len(pages_to_extract[pdf_path])}/{count} pages")
+
+    total_pages = sum(len(pages) for pages in pages_to_extract.values())
+    if pages_per_task is None:
+        pages_per_task = max(1, -(-total_pages // (workers * 4)))
+
+    raw_pages: Dict[Path, list] = {pdf_path: [] for pdf_path in pages_to_extract}
+    worker_stats: Dict[int, Dict[str, float]] = {}
+    start = time.perf_counter()
+
+    executor = pool.start()
+    try:
+        futures = {}
+        for pdf_path, page_numbers in pages_to_extract.items():
+            for page_range in _page_ranges(page_numbers, pages_per_task):
+                future = executor.submit(extract_pages, str(pdf_path), page_range)
+                futures[future] = (pdf_path, page_range)
+
+        for future in as_completed(futures):
+            pdf_path, page_range = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Erreur lors de l'extraction PDF {pdf_path} "
+                             f"(pages {page_range[0]}-{page_range[-1]}): {e}")
+                continue
+            raw_pages[pdf_path].extend(result["pages"])
+            _add_worker_stats(worker_stats, result)
+    finally:
+        if owned:
+            pool.close()
+
+    _log_worker_stats(worker_stats, total_pages, time.perf_counter() - start)
+
+    return {pdf_path: _valid_pages(pages) for pdf_path, pages in raw_pages.items()}
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Index inversé compact (mot-clé -> chunks) et intersections sur la forme encodée.
+
+Chaque liste de chunks est triée puis encodée sous la plus petite de deux formes :
+    - écarts successifs en varint (7 bits par octet, bit de poids fort = suite),
+      pour les termes rares ;
+    - bitset de ceil(nombre de chunks / 8) octets (bit i = chunk i), pour les
+      termes fréquents (« investment » couvre la majeure partie du corpus).
+
+Format de cfa_postings.bin (entiers little-endian) :
+    0   8 octets  magic b"CFAPST\\x00\\x01"
+    8   uint16    version du format
+    10  uint16    réservé
+    12  uint32    nombre de termes
+    16  uint32    nombre de chunks (taille des bitsets, en bits)
+    20  uint32    taille du bloc des termes (UTF-8, séparés par \\n)
+    24..31        réservé
+    32  termes, puis une entrée de 17 octets par terme (même ordre) :
+        uint8 encodage (0 = varint, 1 = bitset), uint32 nombre de chunks,
+        uint64 position, uint32 longueur ; puis les listes encodées.
+
+ET : la liste la plus courte est décodée, puis filtrée par lecture directe
+des bits des autres termes (bitsets) ou par intersection triée (varint).
+OU : les bitsets sont combinés octet par octet, les listes varint ajoutées.
+Le décodage varint est vectorisé (numpy), sans boucle Python par octet.
+
+USAGE:
+    index = PostingsIndex.open(cfa_data_dir)
+    ids = index.intersect(["portfolio", "risk"])   # np.ndarray trié
+    ids = index.union(["tax", "estate"])
+"""
+
+import logging
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CFAPST\x00\x01"
+FORMAT_VERSION = 1
+HEADER_SIZE = 32
+_HEADER = struct.Struct("<8sHHIII")
+_ENTRY = struct.Struct("<BIQI")
+
+POSTINGS_FILENAME = "cfa_postings.bin"
+VARINT, BITSET = 0, 1
+
+
+def encode_varints(values: Iterable[int]) -> bytes:
+    """Entiers positifs en varint (7 bits par octet, bit de poids fort = suite)."""
+    out = bytearray()
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """Inverse de encode_varints, vectorisé (data : tableau uint8)."""
+    if len(data) == 0:
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # Rang de chaque octet dans son varint -> décalage de 7 bits par rang
+    ranks = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    values = (data & 0x7F).astype(np.int64) << (7 * ranks)
+    return np.add.reduceat(values, starts)
+
+
+def encode_varint_deltas(ids: np.ndarray) -> bytes:
+    """Écarts entre identifiants triés (le premier depuis 0), en varint."""
+    return encode_varints(np.diff(np.asarray(ids, dtype=np.int64), prepend=0).tolist())
+
+
+def decode_varint_deltas(data: np.ndarray) -> np.ndarray:
+    """Inverse de encode_varint_deltas, vectorisé (data : tableau uint8)."""
+    return np.cumsum(decode_varints(data))
+
+
+def encode_bitset(ids: np.ndarray, num_docs: int) -> bytes:
+    """Bitset little-endian (bit i de l'octet i // 8 = chunk i)."""
+    bits = np.zeros(num_docs, dtype=bool)
+    bits[ids] = True
+    return np.packbits(bits, bitorder='little').tobytes()
+
+
+def write_postings(path: Path, index: Dict[str, Iterable[int]]) -> Dict[str, int]:
+    """
+    Écrit l'index compact ; renvoie le nombre de termes encodés sous chaque forme
+    et la taille du fichier.
+    """
+    postings = {term: np.unique(np.asarray(list(ids), dtype=np.int64)) for term, ids in index.items()}
+    num_docs = max((int(ids[-1]) + 1 for ids in postings.values() if len(ids)), default=0)
+    bitset_size = (num_docs + 7) // 8
+    terms = list(postings)
+    terms_blob = "\n".join(terms).encode('utf-8')
+    data_offset = HEADER_SIZE + len(terms_blob) + _ENTRY.size * len(terms)
+
+    entries, blobs = [], []
+    position = data_offset
+    counts = {"varint_terms": 0, "bitset_terms": 0}
+    for term in terms:
+        ids = postings[term]
+        encoded, encoding = encode_varint_deltas(ids), VARINT
+        if len(encoded) > bitset_size:
+            encoded, encoding = encode_bitset(ids, num_docs), BITSET
+        counts["bitset_terms" if encoding == BITSET else "varint_terms"] += 1
+        entries.append(_ENTRY.pack(encoding, len(ids), position, len(encoded)))
+        blobs.append(encoded)
+        position += len(encoded)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(terms), num_docs,
+                             len(terms_blob)).ljust(HEADER_SIZE, b"\x00"))
+        f.write(terms_blob)
+        f.write(b"".join(entries))
+        f.write(b"".join(blobs))
+    return dict(counts, size_bytes=position)
+
+
+class PostingsIndex:
+    """Lecture de cfa_postings.bin : listes de chunks par terme, ET / OU."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._data = np.fromfile(self.path, dtype=np.uint8)
+        raw = self._data[:HEADER_SIZE].tobytes()
+        if len(raw) < HEADER_SIZE:
+            raise ValueError(f"{self.path}: en-tête tronqué")
+        magic, version, _, num_terms, self.num_docs, terms_size = _HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: pas un index de postings CFA")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: version de format {version} non supportée")
+        terms_blob = self._data[HEADER_SIZE:HEADER_SIZE + terms_size].tobytes().decode('utf-8')
+        terms = terms_blob.split("\n") if num_terms else []
+        entries_offset = HEADER_SIZE + terms_size
+        entries = self._data[entries_offset:entries_offset + _ENTRY.size * num_terms].tobytes()
+        # terme -> (encodage, nombre de chunks, position, longueur)
+        self._entries = {term: _ENTRY.unpack_from(entries, i * _ENTRY.size) for i, term in enumerate(terms)}
+
+    @classmethod
+    def open(cls, data_dir: Path) -> "PostingsIndex":
+        return cls(Path(data_dir) / POSTINGS_FILENAME)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def terms(self) -> List[str]:
+        return list(self._entries)
+
+    def doc_count(self, term: str) -> int:
+        """Nombre de chunks du terme (0 si absent), lu dans l'entrée sans décoder."""
+        entry = self._entries.get(term)
+        return entry[1] if entry else 0
+
+    def _encoded(self, term: str):
+        encoding, _, position, length = self._entries[term]
+        return encoding, self._data[position:position + length]
+
+    def postings(self, term: str) -> np.ndarray:
+        """Identifiants triés des chunks du terme (vide si absent)."""
+        if term not in self._entries:
+            return np.empty(0, dtype=np.int64)
+        encoding, data = self._encoded(term)
+        if encoding == BITSET:
+            return np.flatnonzero(np.unpackbits(data, bitorder='little')[:self.num_docs])
+        return decode_varint_deltas(data)
+
+    def intersect(self, terms: Sequence[str]) -> np.ndarray:
+        """Chunks contenant tous les termes."""
+        terms = list(dict.fromkeys(terms))
+        if not terms or any(term not in self._entries for term in terms):
+            return np.empty(0, dtype=np.int64)
+        terms.sort(key=self.doc_count)
+        bitsets = [term for term in terms if self._entries[term][0] == BITSET]
+        if len(bitsets) == len(terms):
+            # Que des bitsets : ET octet par octet, décodage du seul résultat
+            combined = self._encoded(terms[0])[1].copy()
+            for term in terms[1:]:
+                np.bitwise_and(combined, self._encoded(term)[1], out=combined)
+            return np.flatnonzero(np.unpackbits(combined, bitorder='little')[:self.num_docs])
+
+        candidates = self.postings(terms[0])
+        for term in terms[1:]:
+            if not len(candidates):
+                break
+            encoding, data = self._encoded(term)
+            if encoding == BITSET:
+                # Lecture directe du bit de chaque candidat dans le bitset encodé
+                candidates = candidates[(data[candidates >> 3] >> (candidates & 7)) & 1 == 1]
+            else:
+                candidates = np.intersect1d(candidates, decode_varint_deltas(data), assume_unique=True)
+        return candidates
+
+    def union(self, terms: Sequence[str]) -> np.ndarray:
+        """Chunks contenant au moins un des termes."""
+        combined = np.zeros((self.num_docs + 7) // 8, dtype=np.uint8)
+        extra = []
+        for term in dict.fromkeys(terms):
+            if term not in self._entries:
+                continue
+            encoding, data = self._encoded(term)
+            if encoding == BITSET:
+                np.bitwise_or(combined, data, out=combined)
+            else:
+                extra.append(decode_varint_deltas(data))
+        ids = np.flatnonzero(np.unpackbits(combined, bitorder='little')[:self.num_docs])
+        if extra:
+            ids = np.union1d(ids, np.concatenate(extra))
+        return ids
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Quantification produit (PQ) des embeddings CFA et recherche asymétrique (ADC).
+
+Le vecteur (dimension d) est coupé en m sous-vecteurs de d/m composantes ;
+chaque sous-espace a son propre dictionnaire de 256 centroïdes appris par
+k-means sur les embeddings des chunks. Un vecteur est alors stocké sur m
+octets (l'index du centroïde le plus proche dans chaque sous-espace) au lieu
+de 4 * d : 16 octets au lieu de 1 536 pour m = 16 en 384 dimensions.
+
+Recherche asymétrique : la requête reste en float. Pour chaque sous-espace
+on précalcule les produits scalaires requête/centroïdes (table m x 256) ;
+le score d'un chunk est la somme de m lectures dans cette table.
+
+Artefact : cfa_pq_m{m}.npz (centroïdes + codes, dans l'ordre de cfa_vectors.bin).
+
+USAGE:
+    pq = ProductQuantizer(num_subspaces=16).fit(vectors)
+    codes = pq.encode(vectors)
+    ids, scores = pq.search(codes, query, k=10)
+
+    # Benchmark mémoire / latence / rappel contre la matrice exacte
+    python cfa_pq.py --data-dir ../netlify/functions/cfa_data --subspaces 8 16 32 48
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cfa_eval import load_query_vectors
+from cfa_quantization import top_k
+from cfa_vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CENTROIDS = 256
+KMEANS_ITERATIONS = 25
+# Lignes décodées à la fois lors du calcul des scores ADC
+SCORE_BLOCK_ROWS = 16384
+
+
+def pq_filename(num_subspaces: int) -> str:
+    """Nom de l'artefact PQ pour m sous-espaces."""
+    return f"cfa_pq_m{num_subspaces}.npz"
+
+
+def kmeans(data: np.ndarray, num_centroids: int, iterations: int = KMEANS_ITERATIONS,
+           rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """K-means (distance euclidienne), initialisation k-means++ ; renvoie les centroïdes."""
+    rng = rng or np.random.default_rng(0)
+    n = len(data)
+    num_centroids = min(num_centroids, n)
+    squared_norms = np.einsum('ij,ij->i', data, data)
+
+    # Initialisation k-means++ : centroïdes éloignés les uns des autres
+    centroids = np.empty((num_centroids, data.shape[1]), dtype=np.float32)
+    centroids[0] = data[rng.integers(n)]
+    closest = squared_norms - 2 * data @ centroids[0] + centroids[0] @ centroids[0]
+    for i in range(1, num_centroids):
+        weights = np.maximum(closest, 0)
+        total = weights.sum()
+        index = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids[i] = data[index]
+        distances = squared_norms - 2 * data @ centroids[i] + centroids[i] @ centroids[i]
+        np.minimum(closest, distances, out=closest)
+
+    for _ in range(iterations):
+        distances = (squared_norms[:, np.newaxis] - 2 * data @ centroids.T
+                     + np.einsum('ij,ij->i', centroids, centroids)[np.newaxis, :])
+        assignment = distances.argmin(axis=1)
+        counts = np.bincount(assignment, minlength=num_centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        moved = counts > 0
+        new_centroids = centroids.copy()
+        new_centroids[moved] = sums[moved] / counts[moved, np.newaxis]
+        # Centroïde vide : ré-initialisé sur le point le plus mal représenté
+        for empty in np.flatnonzero(~moved):
+            new_centroids[empty] = data[distances.min(axis=1).argmax()]
+        if np.allclose(new_centroids, centroids):
+            break
+        centroids = new_centroids
+    return centroids
+
+
+class ProductQuantizer:
+    """Dictionnaires PQ (m sous-espaces x k centroïdes), encodage et recherche ADC."""
+
+    def __init__(self, num_subspaces: int = 16, num_centroids: int = DEFAULT_CENTROIDS):
+        """
+        Args:
+            num_subspaces: m, taille du code en octets (doit diviser la dimension)
+            num_centroids: Centroïdes par sous-espace (<= 256 : codes sur un octet)
+        """
+        if not 1 <= num_centroids <= 256:
+            raise ValueError("num_centroids doit être entre 1 et 256")
+        self.num_subspaces = num_subspaces
+        self.num_centroids = num_centroids
+        self.centroids: Optional[np.ndarray] = None  # (m, k, d/m)
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[0] * self.centroids.shape[2]
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, d) -> (m, n, d/m)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[1] % self.num_subspaces:
+            raise ValueError(f"La dimension {vectors.shape[1]} n'est pas divisible par {self.num_subspaces}")
+        sub_dim = vectors.shape[1] // self.num_subspaces
+        return vectors.reshape(len(vectors), self.num_subspaces, sub_dim).transpose(1, 0, 2)
+
+    def fit(self, vectors: np.ndarray, seed: int = 0) -> "ProductQuantizer":
+        """Apprend un dictionnaire par sous-espace (k-means)."""
+        rng = np.random.default_rng(seed)
+        start = time.perf_counter()
+        self.centroids = np.stack([kmeans(np.ascontiguousarray(sub), self.num_centroids, rng=rng)
+                                   for sub in self._split(vectors)])
+        logger.info(f"PQ m={self.num_subspaces}: dictionnaires appris sur {len(vectors)} vecteurs "
+                    f"en {time.perf_counter() - start:.1f}s")
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Codes uint8 (n, m) : centroïde le plus proche dans chaque sous-espace."""
+        codes = np.empty((len(vectors), self.num_subspaces), dtype=np.uint8)
+        for j, sub in enumerate(self._split(vectors)):
+            centroids = self.centroids[j]
+            distances = -2 * sub @ centroids.T + np.einsum('ij,ij->i', centroids, centroids)[np.newaxis, :]
+            codes[:, j] = distances.argmin(axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Vecteurs reconstruits (n, d) à partir des codes."""
+        parts = [self.centroids[j][codes[:, j]] for j in range(self.num_subspaces)]
+        return np.concatenate(parts, axis=1)
+
+    def lookup_table(self, query: np.ndarray) -> np.ndarray:
+        """Produits scalaires requête/centroïdes par sous-espace : table (m, k)."""
+        sub_queries = np.asarray(query, dtype=np.float32).reshape(self.num_subspaces, -1)
+        return np.einsum('mkd,md->mk', self.centroids, sub_queries)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray,
+               block_rows: int = SCORE_BLOCK_ROWS) -> np.ndarray:
+        """Produits scalaires approchés (ADC) de la requête avec chaque vecteur codé."""
+        table = self.lookup_table(query)
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block_rows):
+            # Bloc transposé : une lecture contiguë des codes de chaque sous-espace
+            block = np.ascontiguousarray(codes[start:start + block_rows].T)
+            block_scores = scores[start:start + block.shape[1]]
+            for j in range(self.num_subspaces):
+                block_scores += table[j].take(block[j])
+        return scores
+
+    def search(self, codes: np.ndarray, query: np.ndarray, k: int,
+               rerank_vectors: Optional[np.ndarray] = None,
+               rerank_candidates: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k plus proches voisins (produit scalaire) par ADC, re-classement float optionnel.
+
+        Returns:
+            (indices, scores) du meilleur au moins bon
+        """
+        scores = self.scores(codes, query)
+        if rerank_vectors is None:
+            ids = top_k(scores, k)
+            return ids, scores[ids]
+        rows = np.sort(top_k(scores, rerank_candidates or 10 * k))
+        exact = np.asarray(rerank_vectors[rows], dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+        order = top_k(exact, k)
+        return rows[order], exact[order]
+
+    def save(self, path: Path, codes: np.ndarray):
+        """Écrit centroïdes et codes (npz non compressé)."""
+        np.savez(path, centroids=self.centroids.astype('<f4'), codes=codes.astype(np.uint8))
+
+    @classmethod
+    def load(cls, path: Path) -> Tuple["ProductQuantizer", np.ndarray]:
+        """Relit un artefact PQ : (quantifieur, codes)."""
+        with np.load(path) as data:
+            centroids, codes = data["centroids"], data["codes"]
+        pq = cls(num_subspaces=centroids.shape[0], num_centroids=centroids.shape[1])
+        pq.centroids = centroids
+        return pq, codes
+
+
+def benchmark(vectors: np.ndarray, queries: np.ndarray, subspace_options: Sequence[int],
+              k: int = 10, repeats: int = 3) -> List[Dict[str, Any]]:
+    """
+    Mémoire, latence par requête et rappel@k de PQ (avec et sans re-classement)
+    contre la recherche exacte sur la matrice float32.
+    """
+    from cfa_eval import exact_top_k, recall_at_k
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    reference = exact_top_k(vectors, queries, k)
+
+    def latency_ms(search) -> float:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for query in queries:
+                search(query)
+            timings.append((time.perf_counter() - start) / len(queries))
+        return min(timings) * 1000
+
+    rows = [{
+        "method": "exact float32",
+        "bytes_per_vector": vectors.shape[1] * 4,
+        "total_bytes": vectors.nbytes,
+        "latency_ms": latency_ms(lambda query: top_k(vectors @ query, k)),
+        f"recall@{k}": 1.0,
+    }]
+    for m in subspace_options:
+        pq = ProductQuantizer(num_subspaces=m).fit(vectors)
+        codes = pq.encode(vectors)
+        approx = [pq.search(codes, query, k)[0] for query in queries]
+        reranked = [pq.search(codes, query, k, rerank_vectors=vectors)[0] for query in queries]
+        rows.append({
+            "method": f"PQ m={m}",
+            "bytes_per_vector": m,
+            "total_bytes": codes.nbytes + pq.centroids.nbytes,
+            "latency_ms": latency_ms(lambda query: pq.search(codes, query, k)),
+            f"recall@{k}": recall_at_k(reference, approx, k),
+            f"recall@{k}_rerank": recall_at_k(reference, reranked, k),
+        })
+    return rows
+
+
+def print_benchmark(rows: List[Dict[str, Any]], k: int):
+    """Affiche le tableau du benchmark."""
+    print(f"{'méthode':<16}{'octets/vect.':>13}{'total (Ko)':>12}{'latence (ms)':>14}"
+          f"{f'rappel@{k}':>11}{'re-classé':>11}")
+    for row in rows:
+        rerank = row.get(f"recall@{k}_rerank")
+        print(f"{row['method']:<16}{row['bytes_per_vector']:>13}{row['total_bytes'] / 1024:>12.1f}"
+              f"{row['latency_ms']:>14.3f}{row[f'recall@{k}']:>11.3f}"
+              f"{(f'{rerank:.3f}' if rerank is not None else '-'):>11}")
+
+
+def main():
+    """Benchmark PQ sur les vecteurs d'un répertoire cfa_data/."""
+    parser = argparse.ArgumentParser(description="Benchmark de la quantification produit des embeddings CFA")
+    parser.add_argument("--data-dir", type=Path,
+                        default=Path(__file__).resolve().parent.parent / "netlify" / "functions" / "cfa_data")
+    parser.add_argument("--subspaces", type=int, nargs="+", default=[8, 16, 32, 48],
+                        help="Tailles de code (octets par vecteur) à comparer")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", choices=("french", "chunks"), default="french",
+                        help="Requêtes FR de référence (modèle requis) ou 100 chunks tirés au hasard")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    store = VectorStore.open(args.data_dir)
+    vectors = np.asarray(store.vectors, dtype=np.float32)
+    queries = load_query_vectors(args.data_dir, vectors, args.queries)
+
+    print_benchmark(benchmark(vectors, queries, args.subspaces, k=args.k), args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Quantification scalaire int8 des embeddings, avec une échelle par vecteur.
+
+Chaque vecteur v est stocké en codes int8 c = round(v / s), avec
+s = max|v| / 127 : 4 fois moins de place qu'en float32, l'erreur relative
+par composante restant sous 1/254 du maximum du vecteur.
+
+Le score d'un chunk pour une requête q vaut (c . q) * s : il est calculé
+directement sur les codes, par blocs de lignes converties à la volée
+(mémoire de travail bornée, débit proche du float32). Les meilleurs
+candidats peuvent ensuite être re-classés avec les vecteurs float32.
+
+USAGE:
+    codes, scales = quantize_int8(vectors)
+    ids, scores = search_int8(codes, scales, query, k=5, rerank_vectors=vectors)
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Lignes converties en float32 à la fois lors du calcul des scores
+SCORE_BLOCK_ROWS = 4096
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Codes int8 (n, d) et échelles float32 (n,) tels que vectors ≈ codes * scales[:, None]."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Vecteurs float32 approchés à partir des codes et échelles."""
+    return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, np.newaxis]
+
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray,
+                block_rows: int = SCORE_BLOCK_ROWS) -> np.ndarray:
+    """
+    Produits scalaires approchés de query avec chaque vecteur quantifié.
+
+    query peut être une matrice de requêtes (n, d) : scores de forme (len(codes), n),
+    un produit matriciel par bloc.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    scores = np.empty((len(codes),) + query.shape[:-1], dtype=np.float32)
+    scale_shape = (-1,) + (1,) * (query.ndim - 1)
+    for start in range(0, len(codes), block_rows):
+        end = min(start + block_rows, len(codes))
+        scores[start:end] = ((codes[start:end].astype(np.float32) @ query.T)
+                             * scales[start:end].reshape(scale_shape))
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k meilleurs scores, du meilleur au moins bon (argpartition + tri de k)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """top_k de chaque ligne d'une matrice de scores (requêtes x chunks) : indices (requêtes, k)."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((len(scores), 0), dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def search_int8(codes: np.ndarray, scales: np.ndarray, query: np.ndarray, k: int,
+                rerank_vectors: Optional[np.ndarray] = None,
+                rerank_candidates: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k plus proches voisins (produit scalaire) sur les codes int8.
+
+    Args:
+        codes, scales: Vecteurs quantifiés (quantize_int8 ou VectorStore int8)
+        query: Vecteur requête float32 (normalisé comme les embeddings)
+        k: Nombre de résultats
+        rerank_vectors: Vecteurs float (ex. memmap de cfa_vectors.bin) ; si fournis,
+            les rerank_candidates meilleurs candidats int8 sont re-classés en float
+        rerank_candidates: Candidats re-classés (défaut: 4 * k)
+
+    Returns:
+        (indices, scores) du meilleur au moins bon
+    """
+    scores = int8_scores(codes, scales, query)
+    if rerank_vectors is None:
+        ids = top_k(scores, k)
+        return ids, scores[ids]
+
+    candidates = top_k(scores, rerank_candidates or 4 * k)
+    # Lecture des seules lignes candidates (triées : accès séquentiels au memmap)
+    rows = np.sort(candidates)
+    exact = np.asarray(rerank_vectors[rows], dtype=np.float32) @ np.asarray(query, dtype=np.float32)
+    order = top_k(exact, k)
+    return rows[order], exact[order]
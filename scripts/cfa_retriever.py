@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Recherche vectorielle Python sur les artefacts de cfa_data/.
+
+Les fichiers de vecteurs sont ouverts une fois (np.memmap) ; une requête est
+soit un texte, encodé par le modèle de cfa_embedding_config.json (chargé au
+premier texte), soit un vecteur déjà encodé et normalisé comme les embeddings
+des chunks. Le top-k est un seul produit matrice-vecteur suivi d'argpartition.
+
+search_many encode un lot de requêtes en un seul batch et les classe toutes
+par un seul produit matrice-matrice (BLAS) ; un profil de risque par requête
+oriente son vecteur vers les termes du profil (mêmes termes que
+calculateRiskProfileBoost côté Netlify).
+
+Chaque recherche est chronométrée par étape (encodage, scores, lecture des
+résultats) : CFARetriever.latency.summary() donne moyenne, p50, p95 et max.
+
+Niveaux de compression (tier) :
+    float   cfa_vectors.bin         produit scalaire exact
+    int8    cfa_vectors_int8.bin    scores sur les codes int8 (cfa_quantization)
+    binary  cfa_vectors_binary.bin  distance de Hamming (cfa_binary)
+    pca     cfa_vectors_pca{d}.bin  vecteurs projetés en d dimensions (cfa_pca),
+                                    la requête étant projetée par cfa_pca.npz
+    hnsw    cfa_hnsw.bin            graphe HNSW sur cfa_vectors.bin (cfa_hnsw) :
+                                    scores exacts des seuls nœuds explorés
+
+Pour int8, binary et pca, les meilleurs candidats sont re-classés avec
+cfa_vectors.bin s'il est présent (rerank=True).
+
+Si les textes sont dans cfa_texts.bin (generate_cfa_embeddings.py --text-store),
+seuls ceux des k résultats sont décompressés.
+
+HotReloadingRetriever suit la version publiée (cfa_artifacts.publish_version)
+et bascule sur la nouvelle sans redémarrage du processus. Seuls les processus
+Python qui l'utilisent en profitent : l'app Streamlit ne lit pas cfa_data/ et
+les Netlify Functions relisent les fichiers à chaque déploiement.
+
+USAGE (scripts ou notebook, avec scripts/ dans sys.path) :
+    retriever = CFARetriever(cfa_data_dir)
+    for result in retriever.search("allocation d'actifs pour la retraite", k=5):
+        print(result["score"], result["text"][:80])
+    retriever.search(query_vector, k=5)        # vecteur déjà encodé
+    per_query = retriever.search_many(objectives, profiles=["Prudent", "Audacieux"], k=5)
+    print(retriever.latency.summary())
+"""
+
+import json
+import logging
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from cfa_artifacts import ARTIFACT_SCHEMA_VERSION, ArtifactWatcher, read_manifest, unchanged_files
+from cfa_binary import search_binary
+from cfa_hnsw import DEFAULT_EF_SEARCH, HNSWIndex
+from cfa_pca import PCA_FILENAME, PCAProjection, pca_vectors_filename
+from cfa_quantization import int8_scores, search_int8, top_k, top_k_rows
+from cfa_text_store import TEXTS_FILENAME, TextStore
+from cfa_vector_store import (BINARY_VECTORS_FILENAME, INT8_VECTORS_FILENAME, METADATA_FILENAME,
+                              VECTORS_FILENAME, VectorStore, check_same_source)
+
+logger = logging.getLogger(__name__)
+
+TIER_FILENAMES = {
+    "float": VECTORS_FILENAME,
+    "int8": INT8_VECTORS_FILENAME,
+    "binary": BINARY_VECTORS_FILENAME,
+}
+CONFIG_FILENAME = "cfa_embedding_config.json"
+
+# Termes des profils de risque (calculateRiskProfileBoost, ultra-optimized-cfa-search.js)
+PROFILE_TERMS = {
+    "Prudent": "conservative prudent stable preservation security low risk",
+    "Équilibré": "balanced moderate diversified mixed equilibrium",
+    "Audacieux": "aggressive growth dynamic opportunity higher return",
+}
+# Part du vecteur de profil dans le vecteur requête orienté
+PROFILE_WEIGHT = 0.2
+
+
+def configured_model_name(data_dir: Path) -> str:
+    """Modèle qui a encodé les chunks (cfa_embedding_config.json)."""
+    with open(Path(data_dir) / CONFIG_FILENAME, 'r', encoding='utf-8') as f:
+        return json.load(f)["model_name"]
+
+
+class LatencyStats:
+    """Durées (ms) des derniers appels, par étape."""
+
+    def __init__(self, history: int = 1000):
+        self.calls: deque = deque(maxlen=history)
+
+    def record(self, timings: Dict[str, float]):
+        self.calls.append(timings)
+
+    def reset(self):
+        self.calls.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Par étape : nombre d'appels, moyenne, p50, p95 et max (ms)."""
+        summary = {}
+        for step in dict.fromkeys(step for timings in self.calls for step in timings):
+            values = np.array([timings[step] for timings in self.calls if step in timings])
+            summary[step] = {"calls": len(values), "mean_ms": round(float(values.mean()), 3),
+                             "p50_ms": round(float(np.percentile(values, 50)), 3),
+                             "p95_ms": round(float(np.percentile(values, 95)), 3),
+                             "max_ms": round(float(values.max()), 3)}
+        return summary
+
+
+class CFARetriever:
+    """Top-k des chunks CFA pour un vecteur requête, sur un niveau de compression donné."""
+
+    def __init__(self, data_dir: Path, tier: str = "float", rerank: bool = True,
+                 rerank_candidates: Optional[int] = None, pca_dim: int = 50,
+                 model_name: Optional[str] = None, model=None, preload: bool = False,
+                 hnsw_ef: int = DEFAULT_EF_SEARCH):
+        """
+        Args:
+            data_dir: Répertoire cfa_data/
+            tier: "float", "int8", "binary", "pca" ou "hnsw"
+            rerank: Re-classer les candidats int8 / binaires / ACP avec cfa_vectors.bin
+            rerank_candidates: Taille de la liste re-classée (défaut propre au niveau)
+            pca_dim: Dimension des vecteurs projetés (tier "pca")
+            model_name: Modèle d'encodage des requêtes texte (défaut : celui de
+                cfa_embedding_config.json, qui a encodé les chunks)
+            model: Modèle SentenceTransformer déjà chargé (partagé entre retrievers,
+                par exemple entre versions par HotReloadingRetriever)
+            preload: Charger la matrice float en mémoire à l'ouverture (sinon pages
+                lues à la demande) ; toujours fait pour une matrice float16
+            hnsw_ef: Candidats explorés par requête (tier "hnsw", compromis rappel / latence)
+        """
+        if tier not in TIER_FILENAMES and tier not in ("pca", "hnsw"):
+            raise ValueError(f"Niveau inconnu: {tier} (attendu: {', '.join(TIER_FILENAMES)}, pca, hnsw)")
+        self.data_dir = Path(data_dir)
+        self.tier = tier
+        self.projection: Optional[PCAProjection] = None
+        if tier == "pca":
+            self.projection = PCAProjection.load(self.data_dir / PCA_FILENAME)
+            self.store = VectorStore.open(self.data_dir, pca_vectors_filename(pca_dim))
+        else:
+            self.store = VectorStore.open(self.data_dir, TIER_FILENAMES.get(tier, VECTORS_FILENAME))
+        self.rerank_vectors = None
+        if tier not in ("float", "hnsw") and (self.data_dir / VECTORS_FILENAME).exists():
+            # Niveau compressé resté d'une construction précédente : refusé
+            float_store = VectorStore.open(self.data_dir)
+            check_same_source(self.store.vectors_file, self.store.source_id, float_store.source_id)
+            if rerank:
+                self.rerank_vectors = float_store.vectors
+        self.rerank_candidates = rerank_candidates
+        self._texts: Optional[TextStore] = None
+        # Matrice float32 contiguë : une conversion à l'ouverture plutôt qu'à chaque requête
+        self.matrix = self.store.vectors
+        if tier in ("float", "hnsw") and (preload or self.store.vectors.dtype != np.float32):
+            self.matrix = np.ascontiguousarray(self.store.vectors, dtype=np.float32)
+        self.index: Optional[HNSWIndex] = None
+        if tier == "hnsw":
+            self.index = HNSWIndex.open(self.data_dir, vectors=self.matrix, ef_search=hnsw_ef,
+                                        source_id=self.store.source_id)
+        self.model_name = model_name
+        self.model = model
+        self.latency = LatencyStats()
+        self.last_timings: Dict[str, float] = {}
+        self._profile_vectors: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def load_model(self):
+        """Modèle d'encodage des requêtes, chargé au premier appel."""
+        if self.model is None:
+            self.model_name = self.model_name or configured_model_name(self.data_dir)
+            from sentence_transformers import SentenceTransformer
+            logger.info(f"Chargement du modèle de requêtes: {self.model_name}")
+            self.model = SentenceTransformer(self.model_name)
+        return self.model
+
+    def embed(self, queries: Union[str, Sequence[str]]) -> np.ndarray:
+        """Embeddings normalisés (float32, une ligne par requête) de textes, en un seul batch."""
+        if isinstance(queries, str):
+            queries = [queries]
+        embeddings = self.load_model().encode(list(queries), convert_to_tensor=False,
+                                              normalize_embeddings=True)
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(queries), -1)
+
+    def search_ids(self, query_vector: np.ndarray, k: int = 5):
+        """(indices, scores) des k meilleurs chunks, du meilleur au moins bon."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        if self.tier == "hnsw":
+            return self.index.search(query, k)
+        if self.tier == "int8":
+            return search_int8(self.store.vectors, self.store.scales, query, k,
+                               rerank_vectors=self.rerank_vectors,
+                               rerank_candidates=self.rerank_candidates)
+        if self.tier == "binary":
+            return search_binary(self.store.vectors, query, k,
+                                 rerank_vectors=self.rerank_vectors,
+                                 rerank_candidates=self.rerank_candidates)
+        if self.tier == "pca":
+            reduced_query = self.projection.project(query, self.store.dim)[0]
+            scores = np.asarray(self.store.vectors @ reduced_query, dtype=np.float32)
+            if self.rerank_vectors is not None:
+                rows = np.sort(top_k(scores, self.rerank_candidates or 10 * k))
+                exact = np.asarray(self.rerank_vectors[rows], dtype=np.float32) @ query
+                order = top_k(exact, k)
+                return rows[order], exact[order]
+        else:
+            scores = np.asarray(self.matrix @ query, dtype=np.float32)
+        ids = top_k(scores, k)
+        return ids, scores[ids]
+
+    def search_ids_many(self, query_vectors: np.ndarray, k: int = 5):
+        """
+        (indices, scores) de forme (requêtes, k), du meilleur au moins bon pour
+        chaque requête : un seul produit matrice-matrice pour tout le lot.
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        if self.tier == "hnsw":
+            return self.index.search_many(queries, k)
+        if self.tier == "binary":
+            # Distance de Hamming : pas de forme matricielle, une recherche par requête
+            pairs = [self.search_ids(query, k) for query in queries]
+            return np.stack([ids for ids, _ in pairs]), np.stack([scores for _, scores in pairs])
+        if self.tier == "int8":
+            scores = int8_scores(self.store.vectors, self.store.scales, queries).T
+            default_candidates = 4 * k
+        elif self.tier == "pca":
+            reduced = self.projection.project(queries, self.store.dim)
+            scores = np.asarray(reduced @ self.store.vectors.T, dtype=np.float32)
+            default_candidates = 10 * k
+        else:
+            scores = np.asarray(queries @ self.matrix.T, dtype=np.float32)
+        if self.tier != "float" and self.rerank_vectors is not None:
+            # Candidats de chaque requête triés (accès séquentiels au memmap), re-classés en float
+            rows = np.sort(top_k_rows(scores, self.rerank_candidates or default_candidates), axis=1)
+            vectors = np.asarray(self.rerank_vectors[rows.ravel()], dtype=np.float32)
+            exact = np.einsum('ncd,nd->nc', vectors.reshape(rows.shape + (-1,)), queries)
+            order = top_k_rows(exact, k)
+            return np.take_along_axis(rows, order, axis=1), np.take_along_axis(exact, order, axis=1)
+        ids = top_k_rows(scores, k)
+        return ids, np.take_along_axis(scores, ids, axis=1)
+
+    def get_text(self, chunk_id: int) -> str:
+        """Texte d'un chunk : cfa_texts.bin (ouvert au premier appel) ou métadonnées."""
+        if self._texts is None and (self.data_dir / TEXTS_FILENAME).exists():
+            self._texts = TextStore.open(self.data_dir)
+        if self._texts is not None:
+            return self._texts.get_text(chunk_id)
+        return self.store.metadata[chunk_id]["text"]
+
+    def results(self, ids: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        """Métadonnées (texte compris) des chunks ids, avec leur score."""
+        metadata = self.store.metadata
+        results = []
+        for i, score in zip(ids.tolist(), scores.tolist()):
+            result = dict(metadata[i], score=float(score))
+            if "text" not in result:
+                result["text"] = self.get_text(i)
+            results.append(result)
+        return results
+
+    def search(self, query: Union[str, np.ndarray], k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Métadonnées (texte compris) des k meilleurs chunks, avec leur score.
+
+        Args:
+            query: Texte (encodé par le modèle) ou vecteur déjà encodé et normalisé
+            k: Nombre de résultats
+        """
+        timings = {}
+        start = time.perf_counter()
+        if isinstance(query, str):
+            query = self.embed(query)[0]
+            timings["embed_ms"] = (time.perf_counter() - start) * 1000
+        step = time.perf_counter()
+        ids, scores = self.search_ids(query, k)
+        timings["search_ms"] = (time.perf_counter() - step) * 1000
+        step = time.perf_counter()
+        results = self.results(ids, scores)
+        timings["fetch_ms"] = (time.perf_counter() - step) * 1000
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        self.last_timings = timings
+        self.latency.record(timings)
+        return results
+
+    def orient(self, query_vectors: np.ndarray, profiles: Sequence[Optional[str]]) -> np.ndarray:
+        """Requêtes orientées vers leur profil de risque : normalise((1 - w) q + w p)."""
+        missing = [profile for profile in dict.fromkeys(profiles)
+                   if profile is not None and profile not in self._profile_vectors]
+        for profile in missing:
+            if profile not in PROFILE_TERMS:
+                raise ValueError(f"Profil inconnu: {profile} (attendu: {', '.join(PROFILE_TERMS)})")
+        if missing:
+            for profile, vector in zip(missing, self.embed([PROFILE_TERMS[p] for p in missing])):
+                self._profile_vectors[profile] = vector
+        oriented = np.array(query_vectors, dtype=np.float32)
+        for i, profile in enumerate(profiles):
+            if profile is not None:
+                oriented[i] = (1 - PROFILE_WEIGHT) * oriented[i] + PROFILE_WEIGHT * self._profile_vectors[profile]
+        norms = np.linalg.norm(oriented, axis=1, keepdims=True)
+        return oriented / np.where(norms > 0, norms, 1)
+
+    def search_many(self, queries: Union[Sequence[str], np.ndarray],
+                    profiles: Union[None, str, Sequence[Optional[str]]] = None,
+                    k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Résultats de search pour un lot de requêtes, une liste par requête.
+
+        Args:
+            queries: Textes (encodés en un seul batch) ou matrice de vecteurs (n, d)
+            profiles: Profil de risque ("Prudent", "Équilibré", "Audacieux") commun à
+                toutes les requêtes, ou un par requête (None = pas d'orientation)
+            k: Nombre de résultats par requête
+        """
+        timings = {}
+        start = time.perf_counter()
+        if isinstance(queries, np.ndarray):
+            query_vectors = np.atleast_2d(queries)
+        else:
+            query_vectors = self.embed(queries)
+            timings["embed_ms"] = (time.perf_counter() - start) * 1000
+        if profiles is not None:
+            if isinstance(profiles, str):
+                profiles = [profiles] * len(query_vectors)
+            if len(profiles) != len(query_vectors):
+                raise ValueError(f"{len(profiles)} profils pour {len(query_vectors)} requêtes")
+            query_vectors = self.orient(query_vectors, profiles)
+        step = time.perf_counter()
+        ids, scores = self.search_ids_many(query_vectors, k)
+        timings["search_ms"] = (time.perf_counter() - step) * 1000
+        step = time.perf_counter()
+        results = [self.results(row_ids, row_scores) for row_ids, row_scores in zip(ids, scores)]
+        timings["fetch_ms"] = (time.perf_counter() - step) * 1000
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        self.last_timings = timings
+        self.latency.record(timings)
+        return results
+
+
+class HotReloadingRetriever:
+    """
+    CFARetriever qui suit la version publiée de cfa_data/ (processus de longue durée).
+
+    À chaque recherche, le pointeur de version est vérifié (au plus toutes les
+    check_interval secondes, par un stat()). Si une nouvelle version est
+    publiée, un nouveau CFARetriever est ouvert sur son répertoire puis
+    substitué à l'ancien ; les métadonnées déjà lues sont reprises si leur
+    fichier est inchangé (même SHA-256 dans cfa_artifacts.json).
+    """
+
+    def __init__(self, publish_dir: Path, check_interval: float = 2.0, **retriever_options):
+        """
+        Args:
+            publish_dir: Répertoire cfa_data/ publié par generate_cfa_embeddings.py --versioned
+            check_interval: Délai minimal entre deux vérifications du pointeur (secondes)
+            retriever_options: Options de CFARetriever (tier, rerank...)
+        """
+        self.watcher = ArtifactWatcher(publish_dir, check_interval)
+        self.retriever_options = retriever_options
+        self.retriever = CFARetriever(self.watcher.current_dir(), **retriever_options)
+        self.manifest = read_manifest(self.watcher.current_dir())
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.watcher.version
+
+    def maybe_reload(self, force: bool = False) -> bool:
+        """Bascule sur la version publiée si elle a changé ; True en cas de rechargement."""
+        if not self.watcher.poll(force=force):
+            return False
+        new_dir = self.watcher.current_dir()
+        manifest = read_manifest(new_dir)
+        if manifest is None or manifest.get("schema_version") != ARTIFACT_SCHEMA_VERSION:
+            logger.warning(f"Version {self.watcher.version} ignorée: schéma d'artefacts non supporté")
+            return False
+        # Le modèle de requêtes (coûteux à charger) est repris s'il n'a pas changé
+        options = dict(self.retriever_options)
+        if (self.retriever.model is not None and self.retriever.model_name
+                == (options.get("model_name") or configured_model_name(new_dir))):
+            options["model"] = self.retriever.model
+        retriever = CFARetriever(new_dir, **options)
+        if METADATA_FILENAME in unchanged_files(self.manifest, manifest):
+            retriever.store.reuse_metadata(self.retriever.store)
+        # Une seule affectation : les recherches en cours finissent sur l'ancienne version
+        self.retriever, self.manifest = retriever, manifest
+        logger.info(f"Artefacts CFA rechargés: version {self.watcher.version}")
+        return True
+
+    def search(self, query: Union[str, np.ndarray], k: int = 5) -> List[Dict[str, Any]]:
+        self.maybe_reload()
+        return self.retriever.search(query, k)
+
+    def search_many(self, queries: Union[Sequence[str], np.ndarray],
+                    profiles: Union[None, str, Sequence[Optional[str]]] = None,
+                    k: int = 5) -> List[List[Dict[str, Any]]]:
+        self.maybe_reload()
+        return self.retriever.search_many(queries, profiles, k)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Découpage des chunks CFA en fragments (shards) par cours et/ou catégorie.
+
+Chaque shard est un fichier JSON de cfa_data/shards/ au format de
+cfa_knowledge_embeddings.json (liste de chunks avec embedding), ne
+contenant que les chunks d'une même clé : (source_file, topic_category)
+par défaut. Le répertoire shards/cfa_shards.json décrit chaque shard :
+valeurs de la clé, fichier, nombre de chunks et centroïde (moyenne
+normalisée des embeddings), pour choisir les shards utiles sans les ouvrir.
+
+Les shards sont dans un sous-répertoire pour rester hors du bundle Netlify
+("netlify/functions/cfa_data/*.json" ne descend pas dans shards/) : ils
+dupliquent cfa_knowledge_embeddings.json et ne servent qu'aux scripts Python.
+
+Un consommateur n'ouvre ainsi que les shards dont il a besoin (catégories
+demandées, ou shards dont le centroïde est le plus proche de la requête) :
+temps de parsing et mémoire suivent ce qui est utilisé, pas la taille du corpus.
+
+USAGE:
+    loader = ShardedCFALoader(cfa_data_dir)
+    chunks = loader.load_chunks(loader.select(categories=["Tax Planning"]))
+    results = loader.search(query_vector, k=5, max_shards=4)
+"""
+
+import json
+import logging
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARDS_SUBDIR = "shards"
+SHARDS_DIRECTORY_FILENAME = "cfa_shards.json"
+SHARD_FILE_PREFIX = "cfa_shard_"
+SHARD_FIELDS = ("source_file", "topic_category")
+# Valeur de clé des chunks sans catégorie (même libellé que cfa_stats.json)
+MISSING_VALUE = "Uncategorized"
+
+
+def shards_dir(data_dir: Path) -> Path:
+    """Sous-répertoire des shards d'un répertoire cfa_data/."""
+    return Path(data_dir) / SHARDS_SUBDIR
+
+
+def remove_legacy_shards(data_dir: Path):
+    """Supprime les shards écrits à la racine de cfa_data/ par les versions précédentes (embarqués sinon)."""
+    data_dir = Path(data_dir)
+    for old_file in [*data_dir.glob(f"{SHARD_FILE_PREFIX}*.json"), data_dir / SHARDS_DIRECTORY_FILENAME]:
+        if old_file.exists():
+            old_file.unlink()
+
+
+def shard_key(chunk_data: Dict[str, Any], fields: Sequence[str]) -> Tuple[str, ...]:
+    """Valeurs des champs de découpage pour un chunk."""
+    return tuple(str(chunk_data.get(field) or MISSING_VALUE) for field in fields)
+
+
+def shard_filename(key: Tuple[str, ...]) -> str:
+    """Nom de fichier lisible et unique pour une clé de shard."""
+    slug = "__".join(re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-')[:40] for value in key)
+    checksum = zlib.crc32("\x1f".join(key).encode('utf-8'))
+    return f"{SHARD_FILE_PREFIX}{slug}_{checksum:08x}.json"
+
+
+class ShardSetWriter:
+    """
+    Écrit les shards chunk par chunk, puis le répertoire cfa_shards.json.
+
+    Un fichier par clé reste ouvert pendant l'écriture ; seuls les sommes
+    d'embeddings (centroïdes) et les compteurs sont gardés en mémoire.
+    """
+
+    def __init__(self, output_dir: Path, dim: int, fields: Sequence[str] = SHARD_FIELDS):
+        """
+        Args:
+            output_dir: Répertoire cfa_data/ (les shards vont dans son sous-répertoire shards/)
+            dim: Dimension des embeddings
+            fields: Champs des chunks formant la clé de shard (parmi SHARD_FIELDS)
+        """
+        unknown = set(fields) - set(SHARD_FIELDS)
+        if not fields or unknown:
+            raise ValueError(f"Champs de découpage invalides: {list(fields)} (attendu: {SHARD_FIELDS})")
+        self.output_dir = shards_dir(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.fields = tuple(fields)
+        self.directory_file = self.output_dir / SHARDS_DIRECTORY_FILENAME
+        self._files: Dict[Tuple[str, ...], Any] = {}
+        self._counts: Dict[Tuple[str, ...], int] = {}
+        self._sums: Dict[Tuple[str, ...], np.ndarray] = {}
+        self._chunk_indices: Dict[Tuple[str, ...], List[int]] = {}
+
+    def add(self, chunk_data: Dict[str, Any]):
+        """Ajoute un chunk sérialisé (avec son embedding) au shard de sa clé."""
+        key = shard_key(chunk_data, self.fields)
+        shard_file = self._files.get(key)
+        if shard_file is None:
+            shard_file = open(self.output_dir / shard_filename(key), 'w', encoding='utf-8')
+            shard_file.write('[')
+            self._files[key] = shard_file
+            self._counts[key] = 0
+            self._sums[key] = np.zeros(self.dim, dtype=np.float64)
+            self._chunk_indices[key] = []
+        else:
+            shard_file.write(',')
+        json.dump(chunk_data, shard_file, ensure_ascii=False, separators=(',', ':'))
+        if chunk_data.get('embedding'):
+            self._sums[key] += np.asarray(chunk_data['embedding'], dtype=np.float64)
+        self._counts[key] += 1
+        self._chunk_indices[key].append(chunk_data.get('chunk_index'))
+
+    def finalize(self) -> Dict[str, str]:
+        """Ferme les shards, supprime ceux d'une construction précédente et écrit le répertoire."""
+        shards = []
+        for key in sorted(self._files):
+            self._files[key].write(']')
+            self._files[key].close()
+            centroid = self._sums[key] / self._counts[key]
+            norm = np.linalg.norm(centroid)
+            if norm > 0:
+                centroid /= norm
+            shards.append({
+                **dict(zip(self.fields, key)),
+                "file": shard_filename(key),
+                "count": self._counts[key],
+                "chunk_indices": self._chunk_indices[key],
+                "centroid": [round(float(value), 5) for value in centroid],
+            })
+        self._files = {}
+
+        current = {shard["file"] for shard in shards}
+        for old_file in self.output_dir.glob(f"{SHARD_FILE_PREFIX}*.json"):
+            if old_file.name not in current:
+                old_file.unlink()
+        remove_legacy_shards(self.output_dir.parent)
+
+        with open(self.directory_file, 'w', encoding='utf-8') as f:
+            json.dump({"fields": list(self.fields), "dim": self.dim, "shards": shards},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        logger.info(f"Shards sauvegardés: {len(shards)} fichiers ({' x '.join(self.fields)}), "
+                    f"répertoire {self.directory_file}")
+        return {"shards_file": str(self.directory_file)}
+
+    def close(self):
+        """Ferme les shards sans finaliser (en cas d'erreur)."""
+        for shard_file in self._files.values():
+            if not shard_file.closed:
+                shard_file.close()
+        self._files = {}
+
+
+class ShardedCFALoader:
+    """Lecture sélective des shards d'un répertoire cfa_data/ (chargés à la demande, une fois)."""
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = shards_dir(data_dir)
+        with open(self.data_dir / SHARDS_DIRECTORY_FILENAME, 'r', encoding='utf-8') as f:
+            directory = json.load(f)
+        self.fields: List[str] = directory["fields"]
+        self.shards: List[Dict[str, Any]] = directory["shards"]
+        self.centroids = np.asarray([shard["centroid"] for shard in self.shards],
+                                    dtype=np.float32).reshape(len(self.shards), directory["dim"])
+        self._positions = {shard["file"]: i for i, shard in enumerate(self.shards)}
+        self._loaded: Dict[str, List[Dict[str, Any]]] = {}
+        self._matrices: Dict[str, np.ndarray] = {}
+
+    def select(self, source_files: Optional[Iterable[str]] = None,
+               categories: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Entrées du répertoire correspondant aux cours et catégories demandés (None = tous)."""
+        filters = {"source_file": source_files, "topic_category": categories}
+        selected = self.shards
+        for field, values in filters.items():
+            if values is None:
+                continue
+            if field not in self.fields:
+                raise ValueError(f"Shards non découpés par {field} (champs: {self.fields})")
+            wanted = set(values)
+            selected = [shard for shard in selected if shard[field] in wanted]
+        return selected
+
+    def nearest(self, query_vector: np.ndarray, max_shards: int,
+                shards: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Les max_shards shards (parmi shards, défaut tous) dont le centroïde est le plus proche."""
+        shards = self.shards if shards is None else shards
+        positions = [self._positions[shard["file"]] for shard in shards]
+        similarity = self.centroids[positions] @ np.asarray(query_vector, dtype=np.float32)
+        order = np.argsort(-similarity, kind='stable')[:max_shards]
+        return [shards[i] for i in order]
+
+    def load_shard(self, shard: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Chunks d'un shard (fichier lu au premier accès seulement)."""
+        chunks = self._loaded.get(shard["file"])
+        if chunks is None:
+            with open(self.data_dir / shard["file"], 'r', encoding='utf-8') as f:
+                chunks = json.load(f)
+            self._loaded[shard["file"]] = chunks
+        return chunks
+
+    def load_chunks(self, shards: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Chunks des shards donnés, concaténés."""
+        chunks = []
+        for shard in shards:
+            chunks.extend(self.load_shard(shard))
+        return chunks
+
+    def shard_matrix(self, shard: Dict[str, Any]) -> np.ndarray:
+        """Embeddings d'un shard en matrice float32 (construite une fois)."""
+        matrix = self._matrices.get(shard["file"])
+        if matrix is None:
+            chunks = self.load_shard(shard)
+            matrix = np.asarray([chunk["embedding"] for chunk in chunks],
+                                dtype=np.float32).reshape(len(chunks), self.centroids.shape[1])
+            self._matrices[shard["file"]] = matrix
+        return matrix
+
+    @property
+    def loaded_files(self) -> List[str]:
+        return list(self._loaded)
+
+    def search(self, query_vector: np.ndarray, k: int = 5,
+               source_files: Optional[Iterable[str]] = None,
+               categories: Optional[Iterable[str]] = None,
+               max_shards: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        k meilleurs chunks (produit scalaire) parmi les shards filtrés, limités
+        aux max_shards shards les plus proches de la requête si demandé.
+        """
+        shards = self.select(source_files, categories)
+        if max_shards is not None:
+            shards = self.nearest(query_vector, max_shards, shards)
+        chunks = self.load_chunks(shards)
+        if not chunks:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = np.concatenate([self.shard_matrix(shard) @ query for shard in shards])
+        order = np.argsort(-scores, kind='stable')[:k]
+        return [dict(chunks[i], score=float(scores[i])) for i in order]
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Stockage compressé des textes des chunks, à accès direct par identifiant.
+
+Chaque texte est compressé séparément (décompresser un chunk ne demande
+que ses propres octets), avec un dictionnaire appris sur le corpus : les
+expressions récurrentes des cours (« portfolio », « asset allocation »,
+« the client's »...) sont référencées dans le dictionnaire au lieu d'être
+répétées dans chaque chunk, ce qui rend rentable la compression de textes
+courts (~800 caractères).
+
+Codecs :
+    zstd   si le paquet zstandard est installé (dictionnaire zstd entraîné)
+    zlib   sinon (deflate brut, dictionnaire prédéfini de 32 Ko construit à
+           partir des n-grammes de mots les plus fréquents)
+
+Le dictionnaire est appris sur les premiers textes (train_bytes) ; les
+suivants sont compressés au fil de l'eau.
+
+Format de cfa_texts.bin (entiers little-endian) :
+    0   8 octets  magic b"CFATXT\\x00\\x01"
+    8   uint16    version du format
+    10  uint16    codec (0 = aucun, 1 = zlib, 2 = zstd)
+    12  uint32    nombre de textes
+    16  uint64    position du dictionnaire
+    24  uint32    taille du dictionnaire
+    28  uint32    réservé
+    32  uint64    position de la table des positions
+    40..63        réservé
+    64  textes compressés, dictionnaire, puis table de (nombre + 1) positions
+        uint64 : le texte i occupe [positions[i], positions[i + 1]).
+
+USAGE:
+    store = TextStore.open(cfa_data_dir)
+    text = store.get_text(chunk_id)
+"""
+
+import logging
+import struct
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CFATXT\x00\x01"
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sHHIQIIQ")
+
+TEXTS_FILENAME = "cfa_texts.bin"
+CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD = 0, 1, 2
+CODEC_NAMES = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# Taille maximale d'un dictionnaire deflate (fenêtre de 32 Ko)
+DICTIONARY_SIZE = 32 * 1024
+TRAIN_BYTES = 1 << 20
+
+
+def default_codec() -> str:
+    """zstd si disponible, sinon zlib."""
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def train_zlib_dictionary(samples: List[bytes], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    Dictionnaire deflate : n-grammes de 1 à 3 mots les plus rentables
+    (occurrences x longueur), les plus rentables en fin de dictionnaire
+    (distances de référence les plus courtes).
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        words = sample.split()
+        for n in (1, 2, 3):
+            counts.update(b" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    candidates = sorted(((count - 1) * (len(gram) + 1), gram) for gram, count in counts.items()
+                        if count >= 3 and len(gram) >= 4)
+    chosen, total = [], 0
+    for _, gram in reversed(candidates):
+        if total + len(gram) + 1 > size:
+            break
+        chosen.append(gram)
+        total += len(gram) + 1
+    return b" ".join(reversed(chosen))
+
+
+class TextStoreWriter:
+    """Écrit cfa_texts.bin texte par texte (dictionnaire appris sur les premiers)."""
+
+    def __init__(self, output_dir: Path, codec: Optional[str] = None, train_bytes: int = TRAIN_BYTES,
+                 filename: str = TEXTS_FILENAME):
+        """
+        Args:
+            output_dir: Répertoire cfa_data/
+            codec: "zstd", "zlib" ou "none" (défaut: zstd si installé, sinon zlib)
+            train_bytes: Volume de texte mis en attente pour apprendre le dictionnaire
+            filename: Nom du fichier
+        """
+        codec = codec or default_codec()
+        if codec not in CODEC_NAMES:
+            raise ValueError(f"Codec inconnu: {codec}")
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("Codec zstd indisponible: pip install zstandard")
+        self.path = Path(output_dir) / filename
+        self.codec = CODEC_NAMES[codec]
+        self.train_bytes = train_bytes
+        self.dictionary = b""
+        self.raw_bytes = 0
+        self._compress = None
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._offsets: List[int] = [HEADER_SIZE]
+        self._file = open(self.path, 'wb')
+        self._file.write(b"\x00" * HEADER_SIZE)
+
+    def _train(self):
+        """Apprend le dictionnaire sur les textes en attente puis les écrit."""
+        if self.codec == CODEC_ZSTD:
+            try:
+                trained = zstandard.train_dictionary(DICTIONARY_SIZE, self._pending)
+                self.dictionary = trained.as_bytes()
+                compressor = zstandard.ZstdCompressor(level=19, dict_data=trained)
+                self._compress = compressor.compress
+            except zstandard.ZstdError as e:
+                # Trop peu de textes pour entraîner zstd : repli sur zlib
+                logger.warning(f"Dictionnaire zstd non entraîné ({e}), repli sur zlib")
+                self.codec = CODEC_ZLIB
+        if self.codec == CODEC_ZLIB:
+            self.dictionary = train_zlib_dictionary(self._pending)
+            dictionary = self.dictionary
+
+            def compress(data: bytes) -> bytes:
+                compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=dictionary)
+                return compressor.compress(data) + compressor.flush()
+            self._compress = compress
+        elif self.codec == CODEC_NONE:
+            self._compress = bytes
+        pending, self._pending = self._pending, []
+        for data in pending:
+            self._write(data)
+
+    def _write(self, data: bytes):
+        self._file.write(self._compress(data))
+        self._offsets.append(self._file.tell())
+
+    def add(self, text: str):
+        """Ajoute le texte suivant (identifiant = nombre de textes déjà ajoutés)."""
+        data = text.encode('utf-8')
+        self.raw_bytes += len(data)
+        if self._compress is not None:
+            self._write(data)
+            return
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= self.train_bytes:
+            self._train()
+
+    def finalize(self) -> str:
+        """Écrit dictionnaire, table des positions et en-tête ; renvoie le chemin du fichier."""
+        if self._compress is None:
+            self._train()
+        count = len(self._offsets) - 1
+        dictionary_offset = self._file.tell()
+        self._file.write(self.dictionary)
+        offsets_offset = self._file.tell()
+        self._file.write(np.asarray(self._offsets, dtype='<u8').tobytes())
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.codec, count, dictionary_offset,
+                                      len(self.dictionary), 0, offsets_offset).ljust(HEADER_SIZE, b"\x00"))
+        self._file.close()
+        compressed = self._offsets[-1] - HEADER_SIZE
+        logger.info(f"Textes compressés: {self.path} ({count} textes, {self.raw_bytes / 1e6:.2f} Mo -> "
+                    f"{compressed / 1e6:.2f} Mo + dictionnaire {len(self.dictionary) / 1024:.0f} Ko)")
+        return str(self.path)
+
+    def close(self):
+        """Ferme le fichier sans finaliser (en cas d'erreur)."""
+        if not self._file.closed:
+            self._file.close()
+
+
+class TextStore:
+    """Lecture de cfa_texts.bin : un texte décompressé à la demande, par identifiant."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            raw = f.read(HEADER_SIZE)
+        if len(raw) < HEADER_SIZE:
+            raise ValueError(f"{self.path}: en-tête tronqué")
+        (magic, version, self.codec, count, dictionary_offset, dictionary_size,
+         _, offsets_offset) = _HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: pas un fichier de textes CFA")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: version de format {version} non supportée")
+        if self.codec == CODEC_ZSTD and zstandard is None:
+            raise ValueError(f"{self.path}: compressé en zstd, paquet zstandard requis")
+        # Textes et positions projetés en mémoire : rien n'est lu avant get_text
+        self._data = np.memmap(self.path, dtype=np.uint8, mode='r')
+        self.offsets = np.memmap(self.path, dtype='<u8', mode='r', offset=offsets_offset, shape=(count + 1,))
+        self.dictionary = self._data[dictionary_offset:dictionary_offset + dictionary_size].tobytes()
+        self._zstd = None
+        if self.codec == CODEC_ZSTD:
+            self._zstd = zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(self.dictionary))
+
+    @classmethod
+    def open(cls, data_dir: Path) -> "TextStore":
+        return cls(Path(data_dir) / TEXTS_FILENAME)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get_text(self, chunk_id: int) -> str:
+        """Texte du chunk chunk_id (seuls ses octets compressés sont lus)."""
+        if not 0 <= chunk_id < len(self):
+            raise IndexError(f"Chunk {chunk_id} hors limites (0..{len(self) - 1})")
+        data = self._data[int(self.offsets[chunk_id]):int(self.offsets[chunk_id + 1])].tobytes()
+        if self.codec == CODEC_ZLIB:
+            decompressor = zlib.decompressobj(-15, zdict=self.dictionary)
+            data = decompressor.decompress(data) + decompressor.flush()
+        elif self.codec == CODEC_ZSTD:
+            data = self._zstd.decompress(data)
+        return data.decode('utf-8')
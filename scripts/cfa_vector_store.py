@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Stockage binaire des embeddings CFA, ouvrable par np.memmap.
+
+Fichiers à côté des JSON de cfa_data/ (lus côté Python seulement, hors du
+bundle Netlify : voir netlify.toml) :
+    cfa_vectors.bin        matrice contiguë (chunks x dimension), little-endian
+    cfa_vectors_meta.jsonl métadonnées des chunks (tout sauf l'embedding),
+                           une ligne JSON par ligne de la matrice
+    cfa_vectors_int8.bin   (optionnel) mêmes lignes quantifiées en int8
+    cfa_vectors_binary.bin (optionnel) mêmes lignes réduites au signe (1 bit)
+
+Format de cfa_vectors.bin (tous les entiers en little-endian) :
+    0   8 octets  magic b"CFAVEC\\x00\\x01"
+    8   uint16    version du format
+    10  uint16    type des composantes (1 = float32, 2 = float16, 3 = int8,
+                  4 = binaire : bits de signe regroupés en mots uint64)
+    12  uint32    nombre de vecteurs
+    16  uint32    dimension
+    20  uint32    position des données (HEADER_SIZE)
+    24  uint64    position des échelles float32 par ligne (int8 seulement, sinon 0)
+    32  uint64    identifiant de source : empreinte (BLAKE2b, 8 octets) des
+                  embeddings float32 écrits, identique pour tous les fichiers
+                  d'une même construction (0 = inconnu)
+    40..63        réservé (zéros)
+    64  données   ligne par ligne, puis échelles éventuelles
+
+En int8, la ligne i vaut approximativement codes[i] * scales[i]
+(voir cfa_quantization.quantize_int8). En binaire, une ligne occupe
+ceil(dimension / 64) mots uint64 (48 octets en 384 dimensions), le bit j
+valant 1 si la composante j est positive (voir cfa_binary.binarize).
+
+Les niveaux compressés (int8, binaire, ACP) et cfa_hnsw.bin ne sont utilisables
+qu'avec le cfa_vectors.bin de la même construction : check_same_source()
+compare les identifiants de source au lieu de la seule forme (count, dim).
+
+Ouvrir le fichier ne lit que l'en-tête : les vecteurs sont chargés à la
+demande par le système (pages mémoire), quelle que soit la taille du corpus.
+
+USAGE:
+    store = VectorStore.open(cfa_data_dir)
+    scores = store.vectors @ query          # np.memmap (count, dim)
+    chunk = store.metadata[int(scores.argmax())]
+"""
+
+import hashlib
+import json
+import logging
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from cfa_binary import binarize, words_per_vector
+from cfa_quantization import quantize_int8
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CFAVEC\x00\x01"
+FORMAT_VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sHHIIIQQ")
+
+VECTORS_FILENAME = "cfa_vectors.bin"
+INT8_VECTORS_FILENAME = "cfa_vectors_int8.bin"
+BINARY_VECTORS_FILENAME = "cfa_vectors_binary.bin"
+METADATA_FILENAME = "cfa_vectors_meta.jsonl"
+
+# Code de type stocké dans l'en-tête -> dtype numpy little-endian
+DTYPE_CODES = {1: np.dtype('<f4'), 2: np.dtype('<f2'), 3: np.dtype('i1'), 4: np.dtype('<u8')}
+DTYPE_NAMES = {"float32": 1, "float16": 2, "int8": 3, "binary": 4}
+INT8_CODE = DTYPE_NAMES["int8"]
+BINARY_CODE = DTYPE_NAMES["binary"]
+
+
+def row_width(dtype_code: int, dim: int) -> int:
+    """Nombre d'éléments stockés par ligne (mots uint64 en binaire, composantes sinon)."""
+    return words_per_vector(dim) if dtype_code == BINARY_CODE else dim
+
+
+def pack_header(dtype_code: int, count: int, dim: int, scales_offset: int = 0, source_id: int = 0) -> bytes:
+    """En-tête de HEADER_SIZE octets."""
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, dtype_code, count, dim, HEADER_SIZE,
+                        scales_offset, source_id).ljust(HEADER_SIZE, b"\x00")
+
+
+def read_header(path: Path) -> Dict[str, Any]:
+    """Lit et valide l'en-tête d'un fichier de vecteurs."""
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(f"{path}: en-tête tronqué")
+    magic, version, dtype_code, count, dim, data_offset, scales_offset, source_id = _HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: pas un fichier de vecteurs CFA")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path}: version de format {version} non supportée")
+    if dtype_code not in DTYPE_CODES:
+        raise ValueError(f"{path}: type de composantes inconnu ({dtype_code})")
+    if dtype_code == INT8_CODE and count and not scales_offset:
+        raise ValueError(f"{path}: échelles int8 absentes")
+    return {"version": version, "dtype_code": dtype_code, "count": count,
+            "dim": dim, "data_offset": data_offset, "scales_offset": scales_offset, "source_id": source_id}
+
+
+def check_same_source(path: Path, source_id: int, expected: int):
+    """Refuse un artefact dérivé (niveau compressé, index) construit sur d'autres vecteurs."""
+    if source_id != expected:
+        raise ValueError(f"{path}: construit sur d'autres vecteurs que cfa_vectors.bin "
+                         f"(source {source_id:016x} au lieu de {expected:016x}), artefact périmé")
+
+
+class VectorStoreWriter:
+    """
+    Écrit cfa_vectors.bin et cfa_vectors_meta.jsonl chunk par chunk.
+
+    Le nombre de vecteurs n'est connu qu'à la fin : l'en-tête est réécrit
+    par finalize(). Un fichier non finalisé annonce 0 vecteur. En int8, les
+    échelles (4 octets par ligne) restent en mémoire jusqu'à finalize().
+    """
+
+    def __init__(self, output_dir: Path, dim: int, dtype: str = "float32",
+                 filename: str = VECTORS_FILENAME, write_metadata: bool = True,
+                 source_id: Optional[int] = None):
+        """
+        Args:
+            output_dir: Répertoire cfa_data/
+            dim: Dimension des embeddings
+            dtype: "float32", "float16" (moitié moins de place, ~3 décimales)
+                "int8" (quart de la place, une échelle par vecteur)
+                ou "binary" (signe de chaque composante, 1 bit)
+            filename: Nom du fichier de vecteurs
+            write_metadata: Écrire aussi cfa_vectors_meta.jsonl
+            source_id: Identifiant de source imposé (vecteurs dérivés, ex. projection
+                ACP : celui de cfa_vectors.bin) ; défaut : empreinte des embeddings ajoutés
+        """
+        if dtype not in DTYPE_NAMES:
+            raise ValueError(f"Type de vecteurs inconnu: {dtype}")
+        self.vectors_file = Path(output_dir) / filename
+        self.metadata_file = Path(output_dir) / METADATA_FILENAME if write_metadata else None
+        self.dim = dim
+        self.dtype_code = DTYPE_NAMES[dtype]
+        self.count = 0
+        self.source_id = source_id
+        self._digest = hashlib.blake2b(digest_size=8) if source_id is None else None
+        self._scales: List[float] = []
+        self._vectors = open(self.vectors_file, 'wb')
+        self._vectors.write(pack_header(self.dtype_code, 0, dim))
+        self._metadata = None
+        if self.metadata_file is not None:
+            self._metadata = open(self.metadata_file, 'w', encoding='utf-8')
+
+    def add(self, embedding: Sequence[float], metadata: Optional[Dict[str, Any]] = None):
+        """Ajoute une ligne à la matrice (et ses métadonnées si le fichier est écrit)."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            raise ValueError(f"Dimension {vector.shape} au lieu de ({self.dim},)")
+        if self._digest is not None:
+            self._digest.update(vector.astype('<f4', copy=False).tobytes())
+        if self.dtype_code == INT8_CODE:
+            codes, scales = quantize_int8(vector[np.newaxis, :])
+            self._vectors.write(codes.tobytes())
+            self._scales.append(float(scales[0]))
+        elif self.dtype_code == BINARY_CODE:
+            self._vectors.write(binarize(vector[np.newaxis, :]).tobytes())
+        else:
+            self._vectors.write(vector.astype(DTYPE_CODES[self.dtype_code]).tobytes())
+        if self._metadata is not None:
+            json.dump(metadata, self._metadata, ensure_ascii=False, separators=(',', ':'))
+            self._metadata.write('\n')
+        self.count += 1
+
+    def finalize(self) -> Dict[str, str]:
+        """Écrit les échelles éventuelles, réécrit l'en-tête et ferme les fichiers."""
+        scales_offset = 0
+        if self.dtype_code == INT8_CODE:
+            scales_offset = self._vectors.tell()
+            self._vectors.write(np.asarray(self._scales, dtype='<f4').tobytes())
+        if self._digest is not None:
+            self.source_id = int.from_bytes(self._digest.digest(), 'little')
+        self._vectors.seek(0)
+        self._vectors.write(pack_header(self.dtype_code, self.count, self.dim, scales_offset, self.source_id))
+        self._vectors.close()
+        files = {"vectors_file": str(self.vectors_file)}
+        if self._metadata is not None:
+            self._metadata.close()
+            files["metadata_file"] = str(self.metadata_file)
+        size_mb = self.vectors_file.stat().st_size / 1e6
+        logger.info(f"Vecteurs binaires sauvegardés: {self.vectors_file} "
+                    f"({self.count} x {self.dim}, {size_mb:.2f} Mo)")
+        return files
+
+    def close(self):
+        """Ferme les fichiers sans finaliser (en cas d'erreur)."""
+        for f in (self._vectors, self._metadata):
+            if f is not None and not f.closed:
+                f.close()
+
+
+class VectorStore:
+    """
+    Matrice d'embeddings projetée en mémoire (np.memmap) et métadonnées associées.
+
+    En binaire, vectors a la forme (count, ceil(dim / 64)) en uint64.
+    """
+
+    def __init__(self, vectors_file: Path, metadata_file: Optional[Path] = None):
+        self.vectors_file = Path(vectors_file)
+        self.metadata_file = Path(metadata_file) if metadata_file else None
+        self.header = read_header(self.vectors_file)
+        dtype = DTYPE_CODES[self.header["dtype_code"]]
+        width = row_width(self.header["dtype_code"], self.header["dim"])
+        expected = self.header["data_offset"] + self.header["count"] * width * dtype.itemsize
+        if self.header["scales_offset"]:
+            expected = self.header["scales_offset"] + self.header["count"] * 4
+        if self.vectors_file.stat().st_size < expected:
+            raise ValueError(f"{self.vectors_file}: fichier tronqué")
+        self.scales: Optional[np.ndarray] = None
+        if self.header["count"]:
+            self.vectors = np.memmap(self.vectors_file, dtype=dtype, mode='r',
+                                     offset=self.header["data_offset"],
+                                     shape=(self.header["count"], width))
+            if self.header["scales_offset"]:
+                self.scales = np.memmap(self.vectors_file, dtype='<f4', mode='r',
+                                        offset=self.header["scales_offset"],
+                                        shape=(self.header["count"],))
+        else:
+            self.vectors = np.zeros((0, width), dtype=dtype)
+            if self.header["dtype_code"] == INT8_CODE:
+                self.scales = np.zeros(0, dtype='<f4')
+        self._metadata: Optional[List[Dict[str, Any]]] = None
+
+    @classmethod
+    def open(cls, data_dir: Path, filename: str = VECTORS_FILENAME) -> "VectorStore":
+        """Ouvre un fichier de vecteurs (et cfa_vectors_meta.jsonl) d'un répertoire cfa_data/."""
+        data_dir = Path(data_dir)
+        return cls(data_dir / filename, data_dir / METADATA_FILENAME)
+
+    @property
+    def is_int8(self) -> bool:
+        return self.header["dtype_code"] == INT8_CODE
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    @property
+    def is_binary(self) -> bool:
+        return self.header["dtype_code"] == BINARY_CODE
+
+    @property
+    def dim(self) -> int:
+        return self.header["dim"]
+
+    @property
+    def source_id(self) -> int:
+        return self.header["source_id"]
+
+    def reuse_metadata(self, other: "VectorStore"):
+        """Reprend les métadonnées déjà lues par un autre store (fichier de métadonnées identique)."""
+        if self._metadata is None:
+            self._metadata = other._metadata
+
+    @property
+    def metadata(self) -> List[Dict[str, Any]]:
+        """Métadonnées des chunks, lues au premier accès."""
+        if self._metadata is None:
+            if self.metadata_file is None or not self.metadata_file.exists():
+                raise FileNotFoundError(f"Métadonnées absentes: {self.metadata_file}")
+            with open(self.metadata_file, 'r', encoding='utf-8') as f:
+                self._metadata = [json.loads(line) for line in f]
+        return self._metadata
@@ -0,0 +1,16 @@
+"""
+Configuration pytest des scripts CFA : tests unitaires dans scripts/tests/.
+
+    python -m pytest -q scripts
+
+Les modules sont importés comme par les scripts (répertoire scripts/ dans le
+chemin). test_cfa_rag.py et test_multilingual_solution.py sont des scripts
+de démonstration (modèle et artefacts réels), pas des tests pytest.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+collect_ignore = ["test_cfa_rag.py", "test_multilingual_solution.py"]
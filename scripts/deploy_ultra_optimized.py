@@ -7,9 +7,13 @@ Automatise le déploiement complet avec toutes les optimisations
 import os
 import json
 import shutil
+import argparse
 from pathlib import Path
 
-def deploy_ultra_optimized_system():
+from cfa_build_report import (BudgetExceededError, SizeBudget, add_budget_arguments, budget_from_args,
+                              report_path, run_build_report)
+
+def deploy_ultra_optimized_system(budget: SizeBudget = None):
     """Déploie le système ultra-optimisé complet."""
     
     print("🚀 DÉPLOIEMENT SYSTÈME RAG CFA ULTRA-OPTIMISÉ")
@@ -134,14 +138,20 @@ def deploy_ultra_optimized_system():
         print(f"   ❌ Erreur validation fonction principale: {e}")
         validation_passed = False
     
-    # Vérifier la taille des fichiers
-    for name, path in critical_files.items():
-        if path.exists():
-            size_mb = path.stat().st_size / (1024 * 1024)
-            if size_mb > 100:  # Plus de 100MB
-                print(f"   ⚠️ {name}: {size_mb:.1f}MB (volumineux)")
-            else:
-                print(f"   ✅ {name}: {size_mb:.1f}MB")
+    # Vérifier le budget de taille et de parsing des artefacts CFA (rapport de construction)
+    try:
+        report = run_build_report(cfa_data_dir, budget, write_variants=False)
+        totals = report["totals"]
+        print(f"   ✅ Bundle CFA: {totals['bundle_raw_bytes'] / (1024 * 1024):.1f}MB "
+              f"(gzip {totals['bundle_gzip_bytes'] / (1024 * 1024):.1f}MB, "
+              f"parsing {totals['bundle_parse_ms']:.0f}ms)")
+        deployment_steps.append("✅ Budget des artefacts CFA respecté")
+    except BudgetExceededError as e:
+        for violation in e.violations:
+            print(f"   ❌ {violation}")
+        print(f"   → Détails: {report_path(cfa_data_dir)}")
+        validation_passed = False
+        deployment_steps.append("❌ Budget des artefacts CFA dépassé")
     
     # Étape 5: Instructions de déploiement
     print(f"\n📋 Étape 5: Instructions de déploiement")
@@ -191,5 +201,7 @@ def deploy_ultra_optimized_system():
     return validation_passed
 
 if __name__ == "__main__":
-    success = deploy_ultra_optimized_system()
+    parser = argparse.ArgumentParser(description="Déploiement du système RAG CFA ultra-optimisé")
+    add_budget_arguments(parser)
+    success = deploy_ultra_optimized_system(budget_from_args(parser.parse_args()))
     exit(0 if success else 1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Encodage par batchs homogènes en longueur, taille de batch calibrée automatiquement.
+
+Sur CPU, un batch coûte environ (taille du batch) x (longueur du plus long
+texte) : mélanger chunks courts et longs fait calculer surtout du padding.
+Les textes sont donc triés par nombre de tokens, découpés en batchs de
+longueurs voisines, puis les vecteurs sont replacés dans l'ordre d'origine.
+"""
+
+import logging
+import time
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tailles testées lors de la calibration
+CALIBRATION_BATCH_SIZES = (8, 16, 32, 64)
+# Textes encodés par taille candidate (le dernier passage est conservé)
+CALIBRATION_SAMPLE = 64
+# Textes nécessaires pour calibrer (en deçà : DEFAULT_BATCH_SIZE)
+CALIBRATION_MIN_TEXTS = 4 * max(CALIBRATION_BATCH_SIZES)
+DEFAULT_BATCH_SIZE = 32
+
+
+def token_lengths(model, texts: Sequence[str]) -> np.ndarray:
+    """Nombre de tokens (tokens spéciaux inclus, tronqué à max_seq_length) de chaque texte."""
+    encoded = model.tokenizer(list(texts), add_special_tokens=True, truncation=True,
+                              max_length=model.max_seq_length)
+    return np.array([len(ids) for ids in encoded['input_ids']], dtype=np.int64)
+
+
+def padding_ratio(lengths: np.ndarray, batch_size: int) -> float:
+    """Part des positions de padding si les textes (dans cet ordre) sont encodés par batch_size."""
+    padded = 0
+    for i in range(0, len(lengths), batch_size):
+        batch = lengths[i:i + batch_size]
+        padded += int(batch.max()) * len(batch)
+    return 1.0 - float(lengths.sum()) / padded if padded else 0.0
+
+
+def _encode(model, texts: List[str], batch_size: int) -> np.ndarray:
+    return model.encode(texts, batch_size=batch_size, convert_to_tensor=False,
+                        normalize_embeddings=True)
+
+
+def calibrate_batch_size(model, sorted_texts: List[str],
+                         candidates: Sequence[int] = CALIBRATION_BATCH_SIZES,
+                         sample_size: int = CALIBRATION_SAMPLE) -> Tuple[int, List[int], np.ndarray]:
+    """
+    Mesure le débit de chaque taille candidate sur un échantillon de longueur médiane.
+
+    Returns:
+        (meilleure taille, positions de l'échantillon dans sorted_texts, vecteurs de
+        l'échantillon) : l'échantillon déjà encodé n'est pas recalculé ensuite.
+    """
+    middle = max(0, len(sorted_texts) // 2 - sample_size // 2)
+    positions = list(range(middle, min(middle + sample_size, len(sorted_texts))))
+    sample = [sorted_texts[i] for i in positions]
+
+    _encode(model, sample[:min(candidates)], min(candidates))  # Échauffement
+    best_size, best_rate, vectors = candidates[0], 0.0, None
+    for candidate in candidates:
+        start = time.perf_counter()
+        vectors = _encode(model, sample, candidate)
+        elapsed = time.perf_counter() - start
+        rate = len(sample) / elapsed if elapsed else float('inf')
+        logger.info(f"Calibration batch {candidate}: {rate:.1f} chunks/s")
+        if rate > best_rate:
+            best_size, best_rate = candidate, rate
+    logger.info(f"Taille de batch retenue: {best_size}")
+    return best_size, positions, np.asarray(vectors)
+
+
+def encode_length_bucketed(model, texts: Sequence[str],
+                           batch_size: Optional[int] = None,
+                           baseline_batch_size: int = 8) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    """
+    Encode les textes par batchs triés par longueur, résultats dans l'ordre d'origine.
+
+    Args:
+        model: SentenceTransformer
+        texts: Textes à encoder
+        batch_size: Taille imposée (défaut: calibrée si assez de textes)
+        baseline_batch_size: Taille du mode historique, pour comparer le padding
+
+    Returns:
+        (vecteurs dans l'ordre de texts, statistiques: batch_size, calibrated, chunks/s, padding)
+    """
+    texts = list(texts)
+    if not texts:
+        return [], {}
+    start = time.perf_counter()
+    lengths = token_lengths(model, texts)
+    order = np.argsort(lengths, kind='stable')
+    sorted_texts = [texts[i] for i in order]
+    sorted_lengths = lengths[order]
+
+    results: List[Optional[np.ndarray]] = [None] * len(texts)
+    calibrated = False
+    if batch_size is None:
+        if len(texts) >= CALIBRATION_MIN_TEXTS:
+            batch_size, positions, vectors = calibrate_batch_size(model, sorted_texts)
+            calibrated = True
+            for position, vector in zip(positions, vectors):
+                results[order[position]] = vector
+        else:
+            batch_size = DEFAULT_BATCH_SIZE
+
+    # Positions restantes (hors échantillon de calibration), toujours triées par longueur
+    remaining = [position for position in range(len(texts)) if results[order[position]] is None]
+    for i in range(0, len(remaining), batch_size):
+        positions = remaining[i:i + batch_size]
+        vectors = _encode(model, [sorted_texts[p] for p in positions], batch_size)
+        for position, vector in zip(positions, vectors):
+            results[order[position]] = vector
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "batch_size": batch_size,
+        "calibrated": calibrated,
+        "chunks_per_second": len(texts) / elapsed if elapsed else 0.0,
+        "padding_ratio": padding_ratio(sorted_lengths, batch_size),
+        "baseline_padding_ratio": padding_ratio(lengths, baseline_batch_size),
+    }
+    logger.info(f"Encodage par longueur: {len(texts)} chunks, batch {batch_size}, "
+                f"{stats['chunks_per_second']:.1f} chunks/s, padding {stats['padding_ratio']:.1%} "
+                f"(ordre du corpus, batch {baseline_batch_size}: {stats['baseline_padding_ratio']:.1%})")
+    return results, stats
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Cache persistant d'embeddings (fichier SQLite unique).
+
+Clé : (nom du modèle, hash SHA-256 du texte normalisé). Utilisé par
+generate_cfa_embeddings.py : une nouvelle génération (ex. après un réglage du
+découpage) n'encode que les textes jamais vus par ce modèle.
+
+La taille totale des vecteurs est calculée une fois à l'ouverture puis suivie
+à chaque écriture : l'éviction ne parcourt la table que lorsqu'il faut
+effectivement supprimer des entrées.
+
+USAGE:
+    cache = EmbeddingCache(Path("embedding_cache.sqlite"), max_bytes=512 * 1024 * 1024)
+    vectors = cache.encode(model_name, texts, lambda missing: model.encode(missing))
+    logger.info(cache.stats())
+    cache.close()
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+from typing import Callable, List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def normalized_text_hash(text: str) -> str:
+    """Hash du texte normalisé (NFC, espaces fusionnés) : les variantes d'espacement partagent leur vecteur."""
+    normalized = re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Cache (modèle, texte) -> vecteur float32 avec éviction LRU par taille."""
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            path: Fichier SQLite (créé si absent)
+            max_bytes: Taille maximale des vecteurs stockés ; au-delà, les
+                entrées les moins récemment utilisées sont supprimées
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        # Taille des vecteurs stockés, tenue à jour par put_many() et evict()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Vecteurs en cache pour chaque texte (None si absent)."""
+        hashes = [normalized_text_hash(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        # Requêtes par paquets : limite de variables SQLite
+        for i in range(0, len(unique_hashes), 500):
+            part = unique_hashes[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model_name, *part])
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model_name, text_hash) for text_hash in found])
+            self._conn.commit()
+
+        results = [found.get(text_hash) for text_hash in hashes]
+        hit_count = sum(vector is not None for vector in results)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        """Enregistre des vecteurs puis applique l'éviction si la taille maximale est dépassée."""
+        now = time.time()
+        rows: Dict[str, tuple] = {}
+        for text, vector in zip(texts, vectors):
+            vector = np.asarray(vector, dtype=np.float32)
+            text_hash = normalized_text_hash(text)
+            rows[text_hash] = (model_name, text_hash, vector.shape[0], vector.tobytes(), now)
+        # Entrées remplacées : leur taille sort du total
+        replaced = 0
+        hashes = list(rows)
+        for i in range(0, len(hashes), 500):
+            part = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            replaced += self._conn.execute(
+                f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings "
+                f"WHERE model = ? AND text_hash IN ({placeholders})", [model_name, *part]).fetchone()[0]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+            rows.values())
+        self._conn.commit()
+        self._size += sum(len(row[3]) for row in rows.values()) - replaced
+        self.evict()
+
+    def encode(self, model_name: str, texts: Sequence[str],
+               encode_fn: Callable[[List[str]], Sequence[np.ndarray]]) -> List[np.ndarray]:
+        """
+        Vecteurs de tous les textes, en n'appelant encode_fn que pour les absents du cache.
+
+        Args:
+            model_name: Modèle ayant produit (ou produisant) les vecteurs
+            texts: Textes à encoder, dans l'ordre voulu
+            encode_fn: Encodeur appelé une fois avec la liste des textes manquants
+        """
+        cached = self.get_many(model_name, texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            new_vectors = encode_fn([texts[i] for i in missing])
+            self.put_many(model_name, [texts[i] for i in missing], new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                cached[i] = np.asarray(vector, dtype=np.float32)
+        return cached
+
+    def size_bytes(self) -> int:
+        """Taille totale des vecteurs stockés."""
+        return self._size
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous max_bytes."""
+        excess = self._size - self.max_bytes
+        if excess <= 0:
+            return
+        removed = 0
+        to_delete = []
+        # Parcours par last_used croissant (index), arrêté dès que l'excédent est couvert
+        rows = self._conn.execute("SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used ASC")
+        for rowid, size in rows:
+            if removed >= excess:
+                break
+            to_delete.append((rowid,))
+            removed += size
+        rows.close()
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", to_delete)
+        self._conn.commit()
+        self._size -= removed
+        self.evicted += len(to_delete)
+        logger.info(f"Cache d'embeddings: {len(to_delete)} entrées évincées ({removed / 1e6:.1f} Mo)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs de la session (hits/misses) et occupation du cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evicted": self.evicted,
+            "entries": self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0],
+            "size_bytes": self.size_bytes(),
+        }
+
+    def close(self):
+        """Applique l'éviction (max_bytes a pu être réduit) puis ferme la base."""
+        self.evict()
+        self._conn.close()
@@ -8,6 +8,8 @@ import json
 import os
 from pathlib import Path
 
+from term_matcher import TermMatcher
+
 class CFAFrenchEnricher:
     """Enrichit les chunks CFA avec des traductions françaises."""
     
@@ -74,6 +76,9 @@ class CFAFrenchEnricher:
             'capital preservation': 'préservation du capital',
             'income generation': 'génération de revenus'
         }
+        
+        # Toutes les expressions cherchées en un seul parcours du chunk
+        self.phrase_matcher = TermMatcher(phrase.lower() for phrase in self.phrase_mappings)
     
     def enrich_chunk_text(self, english_text):
         """
@@ -91,8 +96,9 @@ class CFAFrenchEnricher:
         french_terms = []
         
         # Chercher les expressions complexes d'abord
+        found_phrases = self.phrase_matcher.count_terms(english_text.lower())
         for en_phrase, fr_phrase in self.phrase_mappings.items():
-            if en_phrase.lower() in english_text.lower():
+            if en_phrase.lower() in found_phrases:
                 french_terms.append(fr_phrase)
         
         # Chercher les termes individuels
@@ -105,7 +111,8 @@ class CFAFrenchEnricher:
         
         # Ajouter les termes français au chunk
         if french_terms:
-            unique_french_terms = list(set(french_terms))
+            # Ordre de première apparition (stable d'une exécution à l'autre)
+            unique_french_terms = list(dict.fromkeys(french_terms))
             french_addition = f" [Termes FR: {', '.join(unique_french_terms)}]"
             enriched_text += french_addition
         
@@ -6,7 +6,9 @@ Adapté pour RAMAdvisor - Génère des embeddings statiques pour Netlify Functio
 USAGE:
     python generate_cfa_embeddings.py
 
-    Traite par défaut les 5 PDFs "Course 1..5" de docs/knowledge/.
+    Traite par défaut les 5 PDFs "Course 1..5" de docs/knowledge/, en flux à
+    mémoire bornée. --dedup compare tous les chunks entre eux : il passe par
+    le pipeline en mémoire (forcé aussi par --no-streaming).
     Après génération, relancer scripts/enrich_cfa_with_french.py pour produire
     la version enrichie français utilisée par ultra-optimized-cfa-search.js.
 
@@ -14,6 +16,9 @@ SORTIE:
     - cfa_knowledge_embeddings.json : Embeddings + métadonnées des cours CFA
     - cfa_embedding_config.json : Configuration du modèle
     - cfa_search_index.json : Index de recherche rapide
+    - cfa_postings.bin : Même index, listes compactes (cfa_postings.py)
+    - cfa_bm25.bin : Index BM25 sur tout le vocabulaire des chunks (cfa_bm25.py)
+    - cfa_hnsw.bin : Graphe HNSW des vecteurs (--hnsw-m, cfa_hnsw.py)
 
 OBJECTIF:
     Intégrer la connaissance professionnelle de gestion privée du CFA
@@ -30,16 +35,46 @@ if hasattr(sys.stdout, "reconfigure"):
     sys.stdout.reconfigure(encoding="utf-8", errors="replace")
     sys.stderr.reconfigure(encoding="utf-8", errors="replace")
 
+import argparse
+import bisect
 import json
+import queue
 import re
+import shutil
+import threading
+import time
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Sequence
 import logging
 from dataclasses import dataclass, asdict
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import PyPDF2
+
+from embedding_batching import CALIBRATION_MIN_TEXTS, encode_length_bucketed, token_lengths
+from embedding_cache import EmbeddingCache
+from cfa_manifest import BuildManifest, file_sha256, page_content_hashes, text_hash
+from parallel_encoder import ParallelEncoder
+from token_chunker import TokenChunker
+from cfa_dedup import duplicate_report, near_duplicate_groups
+from term_matcher import TermMatcher
+from cfa_vector_store import (BINARY_VECTORS_FILENAME, INT8_VECTORS_FILENAME, VECTORS_FILENAME,
+                              VectorStore, VectorStoreWriter)
+from cfa_quantization import search_int8
+from cfa_binary import search_binary
+from cfa_pq import ProductQuantizer, pq_filename
+from cfa_hnsw import HNSW_FILENAME, HNSWIndex
+from cfa_shards import SHARD_FIELDS, ShardSetWriter, remove_legacy_shards
+from cfa_postings import POSTINGS_FILENAME, write_postings
+from cfa_text_store import TextStoreWriter
+from cfa_artifacts import new_staging_dir, new_version_dir, promote_staging, publish_version
+from cfa_bm25 import BM25IndexWriter
+from cfa_build_report import (BudgetExceededError, SizeBudget, add_budget_arguments, budget_from_args,
+                              report_path, run_build_report)
+from cfa_pca import PCA_FILENAME, PCAProjection, evaluate_dims, write_projected_vectors
+from cfa_eval import evaluate_recall, evaluation_queries
+from cfa_pdf_extraction import (MIN_PAGE_LENGTH, PDFExtractionPool, clean_academic_text,
+                                extract_pdf_sequential, extract_pdfs_parallel, iter_pdf_pages)
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -54,6 +89,8 @@ class CFAKnowledgeChunk:
     chunk_index: int = 0
     topic_category: Optional[str] = None  # Ex: "Asset Allocation", "Risk Management"
     relevance_keywords: List[str] = None
+    page_span: Optional[List[int]] = None  # [première page, dernière page] couvertes par le chunk
+    sources: Optional[List[Dict[str, Any]]] = None  # Occurrences fusionnées par la déduplication
     embedding: Optional[List[float]] = None
     
     def __post_init__(self):
@@ -69,13 +106,217 @@ DEFAULT_COURSE_PDFS = [
     "Course 5 Practical Skills in Private Wealth Management Reading Packet.pdf",
 ]
 
+# Versions compressées de la matrice (--quantize) -> fichier dans cfa_data/
+QUANTIZED_FILENAMES = {"int8": INT8_VECTORS_FILENAME, "binary": BINARY_VECTORS_FILENAME}
+
+class CFADataWriter:
+    """
+    Écrit les fichiers de cfa_data/ chunk par chunk.
+
+    Seuls l'index de mots-clés (des entiers) et quelques compteurs restent en
+    mémoire : les chunks sont sérialisés au fil de l'eau dans
+    cfa_knowledge_embeddings.json, au même format que json.dump d'une liste,
+    et les vecteurs dans la matrice binaire cfa_vectors.bin (cfa_vector_store).
+    """
+
+    def __init__(self, output_dir: Path, config_data: Dict[str, Any],
+                 vector_dtype: Optional[str] = "float32", quantize: Sequence[str] = (),
+                 shard_by: Sequence[str] = (), text_store: bool = False):
+        """
+        Args:
+            output_dir: Répertoire cfa_data/
+            config_data: Contenu de cfa_embedding_config.json (total_chunks complété à la fin)
+            vector_dtype: Type de cfa_vectors.bin ("float32", "float16") ou None pour ne pas l'écrire
+            quantize: Versions compressées à écrire en plus : "int8" (cfa_vectors_int8.bin,
+                codes int8 + échelle par vecteur), "binary" (cfa_vectors_binary.bin, 1 bit)
+            shard_by: Champs de découpage en shards ("source_file", "topic_category") ;
+                vide = pas de shards
+            text_store: Écrire les textes dans cfa_texts.bin (compressés un à un) ;
+                cfa_vectors_meta.jsonl ne contient alors plus les textes
+        """
+        self.output_dir = output_dir
+        self.config_data = config_data
+        self.embeddings_file = output_dir / "cfa_knowledge_embeddings.json"
+        self.search_index: Dict[str, List[int]] = {}
+        self.categories_distribution: Dict[str, int] = {}
+        self.total_chunks = 0
+        self.total_length = 0
+        self.extra_stats: Dict[str, Any] = {}
+        self.vector_dtype = vector_dtype
+        self.quantize = tuple(quantize)
+        self._vector_writer: Optional[VectorStoreWriter] = None
+        self._quantized_writers: Dict[str, VectorStoreWriter] = {}
+        self.shard_by = tuple(shard_by)
+        self._shard_writer: Optional[ShardSetWriter] = None
+        self.text_store = text_store
+        self._text_writer: Optional[TextStoreWriter] = None
+        self._bm25_writer: Optional[BM25IndexWriter] = None
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.embeddings_file, 'w', encoding='utf-8')
+        self._file.write('[')
+        if self.vector_dtype:
+            self._vector_writer = VectorStoreWriter(self.output_dir, self.config_data["embedding_dim"],
+                                                    dtype=self.vector_dtype)
+        for tier in self.quantize:
+            # Métadonnées écrites une seule fois, par le premier fichier de vecteurs
+            write_metadata = self._vector_writer is None and not self._quantized_writers
+            self._quantized_writers[tier] = VectorStoreWriter(
+                self.output_dir, self.config_data["embedding_dim"], dtype=tier,
+                filename=QUANTIZED_FILENAMES[tier], write_metadata=write_metadata)
+        if self.shard_by:
+            self._shard_writer = ShardSetWriter(self.output_dir, self.config_data["embedding_dim"],
+                                                fields=self.shard_by)
+        if self.text_store:
+            self._text_writer = TextStoreWriter(self.output_dir)
+        self._bm25_writer = BM25IndexWriter(self.output_dir)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for writer in (self._vector_writer, *self._quantized_writers.values()):
+            if writer is not None:
+                writer.close()
+        self._vector_writer = None
+        self._quantized_writers = {}
+        if self._shard_writer is not None:
+            self._shard_writer.close()
+            self._shard_writer = None
+        if self._text_writer is not None:
+            self._text_writer.close()
+            self._text_writer = None
+        self._bm25_writer = None
+
+    def add(self, chunk: CFAKnowledgeChunk):
+        """Sérialise un chunk et met à jour l'index et les statistiques."""
+        if self.total_chunks:
+            self._file.write(',')
+        # JSON compact : indispensable pour rester sous les limites Netlify
+        chunk_data = asdict(chunk)
+        if chunk_data['sources'] is None:
+            del chunk_data['sources']  # Présent uniquement sur les chunks fusionnés (--dedup)
+        json.dump(chunk_data, self._file, ensure_ascii=False, separators=(',', ':'))
+        if self._shard_writer is not None:
+            self._shard_writer.add(chunk_data)
+        embedding = chunk_data.pop('embedding')
+        self._bm25_writer.add(chunk.text)
+        if self._text_writer is not None:
+            self._text_writer.add(chunk_data.pop('text'))
+        if self._vector_writer is not None:
+            self._vector_writer.add(embedding, chunk_data)
+        for writer in self._quantized_writers.values():
+            writer.add(embedding, chunk_data)
+
+        for keyword in chunk.relevance_keywords:
+            self.search_index.setdefault(keyword, []).append(chunk.chunk_index)
+        cat = chunk.topic_category or "Uncategorized"
+        self.categories_distribution[cat] = self.categories_distribution.get(cat, 0) + 1
+        self.total_chunks += 1
+        self.total_length += len(chunk.text)
+
+    def finalize(self) -> Dict[str, str]:
+        """Termine le fichier d'embeddings et écrit configuration, index et statistiques."""
+        self._file.write(']')
+        self._file.close()
+        self._file = None
+        logger.info(f"Embeddings sauvegardés: {self.embeddings_file} ({self.total_chunks} chunks)")
+        vector_files = {}
+        if self._vector_writer is not None:
+            vector_files.update(self._vector_writer.finalize())
+            self._vector_writer = None
+        for tier, writer in self._quantized_writers.items():
+            tier_files = writer.finalize()
+            vector_files[f"{tier}_vectors_file"] = tier_files.pop("vectors_file")
+            vector_files.update(tier_files)
+        self._quantized_writers = {}
+        if self._shard_writer is not None:
+            vector_files.update(self._shard_writer.finalize())
+            self._shard_writer = None
+        if self._text_writer is not None:
+            vector_files["texts_file"] = self._text_writer.finalize()
+            self._text_writer = None
+
+        # 2. Configuration du modèle
+        config_data = dict(self.config_data, total_chunks=self.total_chunks)
+        config_file = self.output_dir / "cfa_embedding_config.json"
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(config_data, f, indent=2)
+        logger.info(f"Configuration sauvegardée: {config_file}")
+
+        # 3. Index de recherche rapide (mots-clés) : JSON compact pour Netlify,
+        # listes encodées (varint / bitset) pour les consommateurs Python
+        index_file = self.output_dir / "cfa_search_index.json"
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump(self.search_index, f, separators=(',', ':'))
+        postings_file = self.output_dir / POSTINGS_FILENAME
+        postings_report = write_postings(postings_file, self.search_index)
+        logger.info(f"Index de recherche sauvegardé: {index_file} "
+                    f"({index_file.stat().st_size / 1024:.0f} Ko), {postings_file} "
+                    f"({postings_report['size_bytes'] / 1024:.0f} Ko, "
+                    f"{postings_report['bitset_terms']} termes en bitset)")
+        # Index BM25 sur tout le vocabulaire des chunks
+        bm25_report = self._bm25_writer.finalize()
+        self._bm25_writer = None
+        logger.info(f"Index BM25 sauvegardé: {bm25_report['file']} ({bm25_report['terms']} termes, "
+                    f"{bm25_report['size_bytes'] / 1024:.0f} Ko)")
+
+        # 4. Statistiques
+        stats = {
+            "total_chunks": self.total_chunks,
+            "categories_distribution": self.categories_distribution,
+            "average_chunk_length": self.total_length / self.total_chunks,
+            "total_keywords": len(self.search_index),
+            "bm25_vocabulary": bm25_report["terms"],
+            **self.extra_stats
+        }
+        stats_file = self.output_dir / "cfa_stats.json"
+        with open(stats_file, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2)
+        logger.info(f"Statistiques sauvegardées: {stats_file}")
+
+        return {
+            "embeddings_file": str(self.embeddings_file),
+            "config_file": str(config_file),
+            "index_file": str(index_file),
+            "postings_file": str(postings_file),
+            "bm25_file": bm25_report["file"],
+            "stats_file": str(stats_file),
+            **vector_files
+        }
+
 class CFAEmbeddingGenerator:
     """Générateur d'embeddings spécialisé pour la connaissance CFA."""
 
     def __init__(self,
                  pdf_paths: Optional[List[str]] = None,
                  output_dir: str = None,
-                 model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+                 model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 extraction_workers: int = 1,
+                 incremental: bool = False,
+                 use_cache: bool = True,
+                 cache_max_mb: int = 512,
+                 batching: str = "fixed",
+                 encode_workers: int = 1,
+                 chunking: str = "chars",
+                 chunk_overlap_tokens: int = 32,
+                 cross_page: bool = False,
+                 dedup: bool = False,
+                 dedup_threshold: float = 0.9,
+                 vector_dtype: Optional[str] = "float32",
+                 quantize: Sequence[str] = (),
+                 pq_subspaces: Optional[int] = None,
+                 hnsw_m: Optional[int] = None,
+                 pca_dims: Sequence[int] = (),
+                 shard_by: Sequence[str] = (),
+                 text_store: bool = False,
+                 versioned: bool = False,
+                 keep_versions: int = 3,
+                 build_report: bool = True,
+                 compressed_variants: bool = False,
+                 size_budget: Optional[SizeBudget] = None):
         """
         Initialise le générateur d'embeddings CFA.
 
@@ -83,6 +324,52 @@ class CFAEmbeddingGenerator:
             pdf_paths: Liste de chemins vers les PDFs des cours (défaut: Courses 1 à 5)
             output_dir: Répertoire de sortie pour Netlify Functions
             model_name: Modèle Sentence Transformers optimisé
+            extraction_workers: Processus pour l'extraction PDF
+                (1 = séquentiel, 0 = tous les cœurs)
+            incremental: Ne ré-extraire que les pages modifiées et ne ré-encoder
+                que les nouveaux chunks (d'après cfa_data_manifest.json)
+            use_cache: Réutiliser le cache d'embeddings persistant
+                (embedding_cache.sqlite, à côté de cfa_data/)
+            cache_max_mb: Taille maximale du cache avant éviction LRU
+            batching: "fixed" (batchs de 8 dans l'ordre du corpus) ou "bucketed"
+                (batchs triés par longueur en tokens, taille calibrée)
+            encode_workers: Processus d'encodage, chacun avec sa copie du modèle
+                (1 = modèle local, 0 = tous les cœurs)
+            chunking: "chars" (900 caractères, découpage par phrases) ou "tokens"
+                (fenêtres de tokens du modèle, jamais tronquées à l'encodage)
+            chunk_overlap_tokens: Chevauchement entre chunks en mode "tokens"
+            cross_page: Découper le texte de chaque PDF en continu, par-delà les
+                sauts de page (page_span indique les pages couvertes par chaque chunk)
+            dedup: Fusionner les chunks quasi identiques (MinHash/LSH) avant l'encodage
+            dedup_threshold: Similarité de Jaccard estimée à partir de laquelle
+                deux chunks sont fusionnés
+            vector_dtype: Type de la matrice binaire cfa_vectors.bin ("float32",
+                "float16") ou None pour ne pas l'écrire
+            quantize: Versions compressées à écrire aussi ("int8" : cfa_vectors_int8.bin,
+                "binary" : cfa_vectors_binary.bin), avec mesure du rappel@k de leur
+                recherche sur les requêtes FR de référence
+            pq_subspaces: Taille des codes PQ en octets (sous-espaces) : écrit
+                cfa_pq_m{m}.npz et mesure son rappel@k ; None = pas d'index PQ
+            hnsw_m: Voisins par vecteur du graphe HNSW : écrit cfa_hnsw.bin et mesure
+                son rappel@k par valeur de ef ; None = pas d'index HNSW
+            pca_dims: Dimensions cibles de la projection ACP : écrit cfa_pca.npz et
+                cfa_vectors_pca{d}.bin, avec variance conservée et rappel@k par dimension
+            shard_by: Écrire aussi les chunks en shards par ces champs ("source_file",
+                "topic_category"), dans cfa_data/shards/ avec le répertoire cfa_shards.json
+            text_store: Écrire aussi les textes compressés à accès direct (cfa_texts.bin)
+            versioned: Écrire la construction dans cfa_data_versions/<version>/ puis la
+                publier d'un coup (manifeste cfa_artifacts.json, pointeur cfa_data_current.json,
+                copie des fichiers modifiés dans cfa_data/)
+            keep_versions: Versions conservées dans cfa_data_versions/
+            build_report: Écrire le rapport cfa_data_build_report.json (tailles brutes,
+                gzip et brotli, temps de parsing du bundle après publication) et vérifier le budget
+            compressed_variants: Écrire aussi les variantes .gz / .br de chaque artefact
+                (leurs tailles sont mesurées dans tous les cas)
+            size_budget: Limites de taille / parsing (défaut : SizeBudget()) ; un
+                dépassement fait échouer la construction avant publication
+
+        Sans versions, la construction est écrite dans cfa_data_staging/ et
+        n'est déplacée dans cfa_data/ qu'une fois le budget vérifié.
         """
         base_dir = Path(__file__).resolve().parent.parent
         knowledge_dir = base_dir / "docs" / "knowledge"
@@ -90,19 +377,78 @@ class CFAEmbeddingGenerator:
             self.pdf_paths = [knowledge_dir / name for name in DEFAULT_COURSE_PDFS]
         else:
             self.pdf_paths = [Path(p) for p in pdf_paths]
-        self.output_dir = Path(output_dir) if output_dir else base_dir / "netlify" / "functions" / "cfa_data"
+        # publish_dir : cfa_data/ lu par Netlify ; output_dir : où cette construction écrit
+        self.publish_dir = Path(output_dir) if output_dir else base_dir / "netlify" / "functions" / "cfa_data"
+        self.output_dir = self.publish_dir
+        self.versioned = versioned
+        self.keep_versions = keep_versions
+        self.build_report = build_report
+        self.compressed_variants = compressed_variants
+        self.size_budget = size_budget or SizeBudget()
         self.model_name = model_name
+        self.extraction_workers = extraction_workers if extraction_workers > 0 else (os.cpu_count() or 1)
+        # Un seul pool d'extraction pour tous les PDFs de la construction (démarré au premier PDF)
+        self.extraction_pool = PDFExtractionPool(self.extraction_workers) if self.extraction_workers > 1 else None
+        self.incremental = incremental
+        self.batching = batching
+        self.tuned_batch_size: Optional[int] = None
+        self.encode_workers = encode_workers if encode_workers > 0 else (os.cpu_count() or 1)
+        self.parallel_encoder: Optional[ParallelEncoder] = None
+
+        # Découpage (900 caractères : bon compromis contexte RAG /
+        # taille des fichiers d'embeddings pour Netlify)
+        self.chunk_size = 900
+        self.chunk_overlap = 150
+        self.chunking = chunking
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.cross_page = cross_page
+        self.dedup = dedup
+        self.dedup_threshold = dedup_threshold
+        self.dedup_report: Optional[Dict[str, Any]] = None
+        self.vector_dtype = vector_dtype
+        self.quantize = tuple(quantize)
+        self.pq_subspaces = pq_subspaces
+        self.hnsw_m = hnsw_m
+        self.pca_dims = sorted(set(pca_dims))
+        self.shard_by = tuple(shard_by)
+        self.text_store = text_store
+
+        # Manifeste à côté de cfa_data/ : hors du bundle Netlify
+        self.manifest_path = self.publish_dir.parent / f"{self.publish_dir.name}_manifest.json"
         
-        # Créer le répertoire de sortie
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Charger le modèle d'embeddings
+        # Charger le modèle d'embeddings (import ici : les workers d'extraction
+        # spawn ré-importent ce module sans charger PyTorch)
+        from sentence_transformers import SentenceTransformer
         logger.info(f"Chargement du modèle d'embeddings: {model_name}")
         self.embedding_model = SentenceTransformer(model_name)
         self.embedding_dim = self.embedding_model.get_sentence_embedding_dimension()
+        self.token_chunker = (TokenChunker(self.embedding_model.tokenizer,
+                                           max_tokens=self.embedding_model.max_seq_length,
+                                           overlap_tokens=chunk_overlap_tokens)
+                              if chunking == "tokens" else None)
+        self.embedding_cache = (EmbeddingCache(self.publish_dir.parent / "embedding_cache.sqlite",
+                                               max_bytes=int(cache_max_mb * 1024 * 1024))
+                                if use_cache else None)
+
+        # Créer le répertoire de sortie (une fois le modèle chargé)
+        self.publish_dir.mkdir(parents=True, exist_ok=True)
+        self.published = False
+        if versioned:
+            self.output_dir = new_version_dir(self.publish_dir)
+            logger.info(f"Construction versionnée: {self.output_dir}")
+        else:
+            self.output_dir = new_staging_dir(self.publish_dir)
         
         self.chunks: List[CFAKnowledgeChunk] = []
         
+        # État de la construction incrémentale (voir prepare_incremental_build)
+        self.previous_manifest: Optional[BuildManifest] = None
+        self.previous_vectors: Dict[str, List[float]] = {}
+        # Chunks par (fichier, première page) : listes de (texte, dernière page)
+        self.previous_page_chunks: Dict[tuple, List[tuple]] = {}
+        self.reused_page_chunks: Dict[Path, Dict[int, List[tuple]]] = {}
+        self.pdf_hashes: Dict[Path, Dict[str, Any]] = {}
+        
         # Mots-clés pour catégoriser les sujets CFA
         self.topic_keywords = {
             "Asset Allocation": ["asset allocation", "portfolio", "diversification", "strategic allocation", "tactical allocation"],
@@ -114,59 +460,80 @@ class CFAEmbeddingGenerator:
             "Estate Planning": ["estate", "inheritance", "succession", "wealth transfer", "legacy"],
             "Alternative Investments": ["alternative", "hedge fund", "private equity", "real estate", "commodities"]
         }
+
+        # Mots-clés financiers importants
+        # (tuple ordonné : l'ordre des mots-clés et donc les fichiers générés
+        # restent identiques d'une exécution à l'autre)
+        self.financial_terms = (
+            "portfolio", "diversification", "allocation", "risk", "return", "volatility",
+            "equity", "bond", "asset", "investment", "strategy", "client", "advisor",
+            "wealth", "management", "planning", "tax", "estate", "performance",
+            "benchmark", "correlation", "sharpe", "alpha", "beta", "hedge"
+        )
+
+        # Un seul automate pour catégories et mots-clés : un parcours par chunk
+        self.term_matcher = TermMatcher(
+            [keyword for keywords in self.topic_keywords.values() for keyword in keywords]
+            + list(self.financial_terms))
     
-    def extract_text_from_pdf(self, pdf_path: Path) -> List[Dict[str, Any]]:
+    def extract_text_from_pdf(self, pdf_path: Path,
+                              page_numbers: Optional[List[int]] = None) -> List[Dict[str, Any]]:
         """Extrait le texte d'un PDF CFA avec optimisations pour le contenu académique."""
         text_chunks = []
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
-                logger.info(f"Traitement de {pdf_path.name}: {total_pages} pages")
-
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    text = page.extract_text()
-                    if text.strip():
-                        # Nettoyage spécialisé pour contenu académique
-                        text = self.clean_academic_text(text)
-                        if len(text) > 100:  # Filtrer les pages avec peu de contenu
-                            text_chunks.append({
-                                'text': text,
-                                'page_number': page_num
-                            })
-
+            if self.extraction_workers > 1:
+                selection = {pdf_path: page_numbers} if page_numbers is not None else None
+                text_chunks = extract_pdfs_parallel([pdf_path], page_selection=selection,
+                                                    pool=self.extraction_pool)[pdf_path]
+            else:
+                text_chunks = extract_pdf_sequential(pdf_path, page_numbers)
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction PDF {pdf_path}: {e}")
 
         logger.info(f"Extraction terminée ({pdf_path.name}): {len(text_chunks)} pages valides")
         return text_chunks
-    
-    def clean_academic_text(self, text: str) -> str:
+
+    def extract_all_pdfs(self, pdf_paths: List[Path],
+                         page_selection: Optional[Dict[Path, List[int]]] = None) -> Dict[Path, List[Dict[str, Any]]]:
+        """
+        Extrait tous les PDFs d'un coup.
+
+        En mode parallèle, les pages de tous les cours sont réparties sur un
+        seul pool de processus ; sinon les PDFs sont traités l'un après l'autre.
+
+        Args:
+            pdf_paths: PDFs à extraire
+            page_selection: Pages à extraire par PDF (défaut: toutes)
+        """
+        page_selection = page_selection or {}
+        if self.extraction_workers <= 1:
+            return {pdf_path: self.extract_text_from_pdf(pdf_path, page_selection.get(pdf_path))
+                    for pdf_path in pdf_paths}
+
+        pages_by_pdf = extract_pdfs_parallel(pdf_paths, page_selection=page_selection,
+                                             pool=self.extraction_pool)
+        for pdf_path, text_chunks in pages_by_pdf.items():
+            logger.info(f"Extraction terminée ({pdf_path.name}): {len(text_chunks)} pages valides")
+        return pages_by_pdf
+
+    @staticmethod
+    def clean_academic_text(text: str) -> str:
         """Nettoie le texte académique pour optimiser la qualité des embeddings."""
-        # Supprimer les caractères de mise en page
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Supprimer les numéros de page et headers/footers typiques
-        text = re.sub(r'Page \d+', '', text)
-        text = re.sub(r'Chapter \d+', '', text)
-        text = re.sub(r'CFA Institute', '', text)
-        
-        # Nettoyer les références de formules mathématiques isolées
-        text = re.sub(r'\b[A-Z]\s*=\s*[A-Z]\s*[+\-\*/]\s*[A-Z]\b', '', text)
-        
-        # Conserver la structure des phrases
-        text = re.sub(r'([.!?])\s*([A-Z])', r'\1 \2', text)
-        
-        return text.strip()
+        return clean_academic_text(text)
     
-    def categorize_chunk(self, text: str) -> Optional[str]:
+    def count_terms(self, text: str) -> Dict[str, int]:
+        """Occurrences des termes de catégories et mots-clés dans le chunk (un seul parcours)."""
+        return self.term_matcher.count_terms(text.lower())
+
+    def categorize_chunk(self, text: str, term_counts: Optional[Dict[str, int]] = None) -> Optional[str]:
         """Catégorise un chunk selon les sujets CFA principaux."""
-        text_lower = text.lower()
+        if term_counts is None:
+            term_counts = self.count_terms(text)
         
         # Compter les occurrences de mots-clés par catégorie
         category_scores = {}
         for category, keywords in self.topic_keywords.items():
-            score = sum(text_lower.count(keyword) for keyword in keywords)
+            score = sum(term_counts.get(keyword, 0) for keyword in keywords)
             if score > 0:
                 category_scores[category] = score
         
@@ -175,23 +542,11 @@ class CFAEmbeddingGenerator:
             return max(category_scores, key=category_scores.get)
         return None
     
-    def extract_keywords(self, text: str) -> List[str]:
+    def extract_keywords(self, text: str, term_counts: Optional[Dict[str, int]] = None) -> List[str]:
         """Extrait les mots-clés pertinents pour la recherche."""
-        # Mots-clés financiers importants
-        financial_terms = {
-            "portfolio", "diversification", "allocation", "risk", "return", "volatility",
-            "equity", "bond", "asset", "investment", "strategy", "client", "advisor",
-            "wealth", "management", "planning", "tax", "estate", "performance",
-            "benchmark", "correlation", "sharpe", "alpha", "beta", "hedge"
-        }
-        
-        text_lower = text.lower()
-        found_keywords = []
-        
-        for term in financial_terms:
-            if term in text_lower:
-                found_keywords.append(term)
-        
+        if term_counts is None:
+            term_counts = self.count_terms(text)
+        found_keywords = [term for term in self.financial_terms if term in term_counts]
         return found_keywords[:10]  # Limiter à 10 mots-clés par chunk
     
     def chunk_text_smart(self, text: str, chunk_size: int = 500, overlap: int = 100) -> List[str]:
@@ -201,70 +556,243 @@ class CFAEmbeddingGenerator:
         Args:
             text: Texte à diviser
             chunk_size: Taille cible d'un chunk
-            overlap: Chevauchement entre chunks
+            overlap: Chevauchement entre chunks (les deux dernières phrases du chunk précédent)
         """
         if len(text) <= chunk_size:
             return [text]
         
-        chunks = []
-        sentences = re.split(r'[.!?]+', text)
-        
-        current_chunk = ""
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-                
-            # Si ajouter cette phrase dépasse la taille, finaliser le chunk
-            if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-                chunks.append(current_chunk.strip())
-                # Garder un overlap en conservant les dernières phrases
-                overlap_text = '. '.join(current_chunk.split('. ')[-2:])
-                current_chunk = overlap_text + ". " + sentence
-            else:
-                current_chunk += ". " + sentence if current_chunk else sentence
-        
-        # Ajouter le dernier chunk
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-        
         # Filtrer les chunks trop courts
-        return [chunk for chunk in chunks if len(chunk) > 100]
+        return [chunk for chunk, _, _ in self.chunk_spans_smart(text, chunk_size) if len(chunk) > 100]
+
+    def sentence_spans(self, text: str, chunk_size: int) -> List[tuple]:
+        """
+        Positions (début, fin) des phrases de text : séparées par . ! ?, espaces
+        retirés. Une phrase plus longue que chunk_size est coupée au dernier
+        espace avant la limite (ou à la limite, faute d'espace).
+        """
+        spans = []
+        for match in re.finditer(r'[^.!?]+', text):
+            begin, end = match.span()
+            while True:
+                while begin < end and text[begin].isspace():
+                    begin += 1
+                while end > begin and text[end - 1].isspace():
+                    end -= 1
+                if end - begin <= chunk_size:
+                    break
+                cut = text.rfind(' ', begin + 1, begin + chunk_size + 1)
+                cut = cut if cut > begin else begin + chunk_size
+                spans.append((begin, len(text[begin:cut].rstrip()) + begin))
+                begin = cut
+            if begin < end:
+                spans.append((begin, end))
+        return spans
+
+    def chunk_spans_smart(self, text: str, chunk_size: int = 500, overlap_sentences: int = 2) -> List[tuple]:
+        """
+        Chunks de chunk_text_smart avec leurs positions : (texte, début, fin) dans text.
+
+        Les phrases sont jointes par ". " et regroupées tant que le chunk reste
+        sous chunk_size ; le chunk suivant reprend les overlap_sentences dernières
+        phrases. Le découpage par page et le découpage continu (cross_page)
+        produisent ainsi les mêmes chunks pour un même texte.
+        """
+        if len(text) <= chunk_size:
+            return [(text, 0, len(text))]
+        sentences = self.sentence_spans(text, chunk_size)
+        groups, current, current_length = [], [], 0
+        for i, (begin, end) in enumerate(sentences):
+            if current and current_length + (end - begin) > chunk_size:
+                groups.append(current)
+                current = current[-overlap_sentences:]
+                current_length = sum(sentences[j][1] - sentences[j][0] + 2 for j in current) - 2
+            current_length += (2 if current else 0) + end - begin
+            current.append(i)
+        if current:
+            groups.append(current)
+        return [(". ".join(text[sentences[j][0]:sentences[j][1]] for j in group),
+                 sentences[group[0]][0], sentences[group[-1]][1])
+                for group in groups]
+
+    def chunk_document(self, pages: List[Dict[str, Any]]) -> Dict[int, List[tuple]]:
+        """
+        Découpe en continu les pages d'un PDF (mode cross_page).
+
+        Les textes des pages sont mis bout à bout ; chaque chunk est rattaché à
+        sa première page et porte sa dernière page.
+
+        Returns:
+            {première page: [(texte, dernière page), ...]}
+        """
+        page_starts, page_numbers, parts = [], [], []
+        offset = 0
+        for page_data in pages:
+            page_starts.append(offset)
+            page_numbers.append(page_data['page_number'])
+            parts.append(page_data['text'])
+            offset += len(page_data['text']) + 1
+        document = " ".join(parts)
+
+        if self.token_chunker is not None:
+            spans = [(document[begin:end].strip(), begin, end)
+                     for begin, end in self.token_chunker.chunk_spans(document)]
+        else:
+            spans = self.chunk_spans_smart(document, chunk_size=self.chunk_size)
+
+        page_chunks: Dict[int, List[tuple]] = {}
+        for chunk_text, begin, end in spans:
+            if len(chunk_text) <= 100:
+                continue
+            first_page = page_numbers[bisect.bisect_right(page_starts, begin) - 1]
+            last_page = page_numbers[bisect.bisect_right(page_starts, end - 1) - 1]
+            page_chunks.setdefault(first_page, []).append((chunk_text, last_page))
+        return page_chunks
+
+    def chunk_pages(self, pages: List[Dict[str, Any]]) -> Dict[int, List[tuple]]:
+        """Chunks d'une liste de pages : {première page: [(texte, dernière page), ...]}."""
+        if self.cross_page:
+            return self.chunk_document(pages)
+        return {page_data['page_number']: [(text, page_data['page_number'])
+                                           for text in self.chunk_page_text(page_data['text'])]
+                for page_data in pages}
+
+    def chunk_page_text(self, text: str) -> List[str]:
+        """Découpe le texte d'une page selon le mode de découpage choisi."""
+        if self.token_chunker is not None:
+            return self.token_chunker.chunk_text(text)
+        return self.chunk_text_smart(text, chunk_size=self.chunk_size, overlap=self.chunk_overlap)
     
+    def pipeline_fingerprint(self) -> Dict[str, Any]:
+        """Paramètres dont dépendent les chunks et les vecteurs (invalident le manifeste)."""
+        fingerprint = {
+            "model_name": self.model_name,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "min_page_length": MIN_PAGE_LENGTH,
+        }
+        if self.cross_page:
+            fingerprint["cross_page"] = True
+        if self.token_chunker is not None:
+            fingerprint.update(chunking="tokens",
+                               max_tokens=self.embedding_model.max_seq_length,
+                               chunk_overlap_tokens=self.token_chunker.overlap_tokens)
+        return fingerprint
+
+    def prepare_incremental_build(self, pdf_paths: List[Path]) -> Dict[Path, List[int]]:
+        """
+        Compare les PDFs au manifeste précédent et prépare la réutilisation.
+
+        Remplit self.reused_page_chunks (chunks des pages inchangées) et
+        self.previous_vectors (embeddings existants par hash de texte).
+
+        Returns:
+            Pages à ré-extraire par PDF (les PDFs absents du dict sont repris en entier)
+        """
+        page_selection: Dict[Path, List[int]] = {}
+        previous = BuildManifest.load(self.manifest_path)
+        embeddings_file = self.publish_dir / "cfa_knowledge_embeddings.json"
+        if previous is None or not embeddings_file.exists():
+            logger.info("Pas de construction précédente exploitable: reconstruction complète")
+            return {pdf_path: None for pdf_path in pdf_paths}
+
+        with open(embeddings_file, 'r', encoding='utf-8') as f:
+            previous_chunks = json.load(f)
+        same_model = previous.pipeline.get("model_name") == self.model_name
+        same_chunking = previous.pipeline == self.pipeline_fingerprint()
+        for chunk in previous_chunks:
+            key = (chunk['source_file'], chunk['page_number'])
+            last_page = (chunk.get('page_span') or [chunk['page_number']] * 2)[1]
+            self.previous_page_chunks.setdefault(key, []).append((chunk['text'], last_page))
+            if same_model and chunk.get('embedding'):
+                self.previous_vectors[text_hash(chunk['text'])] = chunk['embedding']
+        self.previous_manifest = previous
+
+        for pdf_path in pdf_paths:
+            name = pdf_path.name
+            pdf_sha = self.pdf_hashes[pdf_path]["sha256"]
+            if not same_chunking or previous.file_sha256(name) is None:
+                page_selection[pdf_path] = None
+                continue
+
+            if pdf_sha == previous.file_sha256(name):
+                page_hashes = previous.page_hashes(name)
+            else:
+                page_hashes = page_content_hashes(pdf_path)
+            self.pdf_hashes[pdf_path]["pages"] = page_hashes
+
+            previous_pages = previous.page_hashes(name)
+            reused, changed = {}, []
+            for page_num, page_hash in page_hashes.items():
+                entries = self.previous_page_chunks.get((name, page_num), [])
+                if (previous_pages.get(page_num) == page_hash
+                        and [text_hash(t) for t, _ in entries] == previous.page_chunk_hashes(name, page_num)):
+                    reused[page_num] = entries
+                else:
+                    changed.append(page_num)
+            if changed and self.cross_page:
+                # Les chunks débordent d'une page à l'autre : tout le PDF est redécoupé
+                reused, changed = {}, list(page_hashes)
+                page_selection[pdf_path] = None
+            elif changed:
+                page_selection[pdf_path] = changed
+            self.reused_page_chunks[pdf_path] = reused
+            logger.info(f"{name}: {len(reused)} pages reprises, {len(changed)} pages à ré-extraire")
+
+        return page_selection
+
+    def make_chunk(self, chunk_text: str, source_file: str, page_num: int, chunk_index: int,
+                   last_page: Optional[int] = None) -> CFAKnowledgeChunk:
+        """Crée le chunk enrichi, en gardant la trace du cours source et des pages couvertes."""
+        term_counts = self.count_terms(chunk_text)
+        return CFAKnowledgeChunk(
+            text=chunk_text,
+            source_file=source_file,
+            page_number=page_num,
+            page_span=[page_num, last_page or page_num],
+            chunk_index=chunk_index,
+            topic_category=self.categorize_chunk(chunk_text, term_counts),
+            relevance_keywords=self.extract_keywords(chunk_text, term_counts)
+        )
+
+    def existing_pdf_paths(self) -> List[Path]:
+        """PDFs présents sur disque (les absents sont signalés puis ignorés)."""
+        existing_pdfs = []
+        for pdf_path in self.pdf_paths:
+            if pdf_path.exists():
+                existing_pdfs.append(pdf_path)
+                self.pdf_hashes[pdf_path] = {"sha256": file_sha256(pdf_path)}
+            else:
+                logger.warning(f"Fichier PDF CFA non trouvé (ignoré): {pdf_path}")
+        return existing_pdfs
+
     def process_cfa_document(self) -> int:
         """Traite les documents CFA (Courses 1 à 5) et crée les chunks enrichis."""
         chunk_counter = 0
+        existing_pdfs = self.existing_pdf_paths()
 
-        for pdf_path in self.pdf_paths:
-            if not pdf_path.exists():
-                logger.warning(f"Fichier PDF CFA non trouvé (ignoré): {pdf_path}")
-                continue
+        if self.incremental:
+            page_selection = self.prepare_incremental_build(existing_pdfs)
+            to_extract = [pdf_path for pdf_path in existing_pdfs if pdf_path in page_selection]
+            pages_by_pdf = self.extract_all_pdfs(to_extract, page_selection)
+        else:
+            pages_by_pdf = self.extract_all_pdfs(existing_pdfs)
+
+        for pdf_path in existing_pdfs:
+            # Chunks repris des pages inchangées + pages (ré-)extraites
+            page_chunks = dict(self.reused_page_chunks.get(pdf_path, {}))
+            page_chunks.update(self.chunk_pages(pages_by_pdf.get(pdf_path, [])))
+            self.pdf_hashes[pdf_path]["page_chunks"] = {
+                page_num: [text_hash(text) for text, _ in entries] for page_num, entries in page_chunks.items()}
 
-            text_data = self.extract_text_from_pdf(pdf_path)
-            if not text_data:
+            if not any(page_chunks.values()):
                 logger.warning(f"Aucun texte extrait de {pdf_path.name} (ignoré)")
                 continue
 
             # Traiter chaque page
-            for page_data in text_data:
-                text = page_data['text']
-                page_num = page_data['page_number']
-
-                # Diviser en chunks intelligents (900 caractères : bon compromis
-                # contexte RAG / taille des fichiers d'embeddings pour Netlify)
-                chunks = self.chunk_text_smart(text, chunk_size=900, overlap=150)
-
-                for chunk_text in chunks:
-                    # Créer le chunk enrichi, en gardant la trace du cours source
-                    chunk = CFAKnowledgeChunk(
-                        text=chunk_text,
-                        source_file=pdf_path.name,
-                        page_number=page_num,
-                        chunk_index=chunk_counter,
-                        topic_category=self.categorize_chunk(chunk_text),
-                        relevance_keywords=self.extract_keywords(chunk_text)
-                    )
-                    self.chunks.append(chunk)
+            for page_num in sorted(page_chunks):
+                for chunk_text, last_page in page_chunks[page_num]:
+                    self.chunks.append(self.make_chunk(chunk_text, pdf_path.name, page_num,
+                                                       chunk_counter, last_page))
                     chunk_counter += 1
 
             logger.info(f"{pdf_path.name}: cumul {len(self.chunks)} chunks")
@@ -272,6 +800,36 @@ class CFAEmbeddingGenerator:
         logger.info(f"Documents CFA traités: {len(self.chunks)} chunks créés au total")
         return len(self.chunks)
     
+    def deduplicate_chunks(self) -> Dict[str, Any]:
+        """
+        Fusionne les chunks quasi identiques (tous PDFs confondus).
+
+        Le premier chunk de chaque groupe est conservé ; son champ sources liste
+        toutes les occurrences (fichier, pages). Les chunk_index sont renumérotés.
+        """
+        canonical = near_duplicate_groups([chunk.text for chunk in self.chunks],
+                                          threshold=self.dedup_threshold)
+        for i, j in enumerate(canonical):
+            if i == j:
+                continue
+            kept = self.chunks[j]
+            if kept.sources is None:
+                kept.sources = [{"source_file": kept.source_file, "page_span": kept.page_span}]
+            duplicate = self.chunks[i]
+            kept.sources.append({"source_file": duplicate.source_file, "page_span": duplicate.page_span})
+
+        self.chunks = [chunk for i, chunk in enumerate(self.chunks) if canonical[i] == i]
+        for chunk_index, chunk in enumerate(self.chunks):
+            chunk.chunk_index = chunk_index
+
+        report = duplicate_report(canonical, self.embedding_dim)
+        logger.info(f"Déduplication: {report['chunks_before']} -> {report['chunks_after']} chunks "
+                    f"({report['duplicates_removed']} doublons dans {report['merged_groups']} groupes), "
+                    f"{report['vector_bytes_saved'] / 1e6:.2f} Mo de vecteurs et "
+                    f"{report['search_work_saved']:.1%} des produits scalaires par requête économisés")
+        self.dedup_report = report
+        return report
+
     def generate_embeddings(self):
         """Génère les embeddings pour tous les chunks CFA."""
         if not self.chunks:
@@ -279,17 +837,60 @@ class CFAEmbeddingGenerator:
             return
         
         logger.info("Génération des embeddings CFA...")
-        texts = [chunk.text for chunk in self.chunks]
-        
-        # Générer les embeddings par batch
+        encoded = self.embed_chunks(self.chunks)
+        logger.info(f"Embeddings CFA générés pour {encoded} chunks")
+
+    def embed_chunks(self, chunks: List[CFAKnowledgeChunk], log_batches: bool = True) -> int:
+        """
+        Renseigne l'embedding de chaque chunk, en reprenant ceux des chunks
+        inchangés (construction incrémentale).
+
+        Returns:
+            Nombre de chunks effectivement encodés
+        """
+        pending = []
+        for chunk in chunks:
+            previous_vector = self.previous_vectors.get(text_hash(chunk.text))
+            if previous_vector is not None:
+                chunk.embedding = previous_vector
+            else:
+                pending.append(chunk)
+        if self.previous_vectors and log_batches:
+            logger.info(f"Embeddings repris: {len(chunks) - len(pending)}, à encoder: {len(pending)}")
+        embeddings = self.encode_texts([chunk.text for chunk in pending], log_batches)
+        for chunk, embedding in zip(pending, embeddings):
+            chunk.embedding = self.round_embedding(embedding)
+        return len(pending)
+
+    def encode_texts(self, texts: List[str], log_batches: bool = True) -> List[np.ndarray]:
+        """Encode des textes (embeddings normalisés), via le cache persistant s'il est actif."""
+        if self.embedding_cache is None:
+            return self._encode_batches(texts, log_batches)
+        return self.embedding_cache.encode(
+            self.model_name, texts, lambda missing: self._encode_batches(missing, log_batches))
+
+    def _encode_batches(self, texts: List[str], log_batches: bool = True) -> List[np.ndarray]:
+        """Encode des textes par batch avec le modèle (sans cache)."""
+        if self.encode_workers > 1:
+            return self._encode_parallel(texts)
+        if self.batching == "bucketed":
+            # Taille calibrée au premier appel d'au moins CALIBRATION_MIN_TEXTS textes,
+            # réutilisée ensuite (le mode flux envoie des batchs de cette taille)
+            embeddings, stats = encode_length_bucketed(self.embedding_model, texts,
+                                                       batch_size=self.tuned_batch_size)
+            if stats.get("calibrated"):
+                self.tuned_batch_size = stats["batch_size"]
+            return embeddings
+
         batch_size = 8  # Plus petit pour éviter les timeouts
         embeddings = []
         
         for i in range(0, len(texts), batch_size):
             batch = texts[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (len(texts) - 1) // batch_size + 1
-            logger.info(f"Traitement batch {batch_num}/{total_batches}")
+            if log_batches:
+                batch_num = i // batch_size + 1
+                total_batches = (len(texts) - 1) // batch_size + 1
+                logger.info(f"Traitement batch {batch_num}/{total_batches}")
             
             batch_embeddings = self.embedding_model.encode(
                 batch, 
@@ -297,82 +898,467 @@ class CFAEmbeddingGenerator:
                 normalize_embeddings=True
             )
             embeddings.extend(batch_embeddings)
-        
-        # Assigner les embeddings aux chunks (arrondis à 5 décimales :
-        # réduit fortement la taille des JSON sans perte de pertinence)
-        for chunk, embedding in zip(self.chunks, embeddings):
-            chunk.embedding = [round(float(x), 5) for x in embedding]
-        
-        logger.info(f"Embeddings CFA générés pour {len(self.chunks)} chunks")
+        return embeddings
+
+    def _encode_parallel(self, texts: List[str]) -> List[np.ndarray]:
+        """Encode sur le pool de workers (triés par longueur en mode bucketed)."""
+        if self.parallel_encoder is None:
+            self.parallel_encoder = ParallelEncoder(self.model_name, workers=self.encode_workers)
+        if self.batching != "bucketed":
+            return self.parallel_encoder.encode(texts)
+
+        # Lots de longueurs voisines pour limiter le padding dans chaque worker
+        order = np.argsort(token_lengths(self.embedding_model, texts), kind='stable')
+        sorted_vectors = self.parallel_encoder.encode([texts[i] for i in order])
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        for position, vector in zip(order, sorted_vectors):
+            embeddings[position] = vector
+        return embeddings
+
+    def close_encoder(self):
+        """Arrête les pools d'encodage et d'extraction s'ils ont été démarrés."""
+        if self.parallel_encoder is not None:
+            self.parallel_encoder.close()
+            self.parallel_encoder = None
+        if self.extraction_pool is not None:
+            self.extraction_pool.close()
+
+    @staticmethod
+    def round_embedding(embedding) -> List[float]:
+        """Arrondit à 5 décimales : réduit fortement la taille des JSON sans perte de pertinence."""
+        return [round(float(x), 5) for x in embedding]
     
-    def save_cfa_data(self):
-        """Sauvegarde les données CFA pour Netlify Functions."""
-        logger.info("Sauvegarde des données CFA...")
-        
-        # 1. Fichier principal des embeddings
-        embeddings_data = []
-        for chunk in self.chunks:
-            chunk_dict = asdict(chunk)
-            embeddings_data.append(chunk_dict)
-        
-        embeddings_file = self.output_dir / "cfa_knowledge_embeddings.json"
-        with open(embeddings_file, 'w', encoding='utf-8') as f:
-            # JSON compact : indispensable pour rester sous les limites Netlify
-            json.dump(embeddings_data, f, ensure_ascii=False, separators=(',', ':'))
-        logger.info(f"Embeddings sauvegardés: {embeddings_file} ({len(embeddings_data)} chunks)")
-        
-        # 2. Configuration du modèle
-        config_data = {
+    def config_data(self) -> Dict[str, Any]:
+        """Contenu de cfa_embedding_config.json (total_chunks complété par CFADataWriter)."""
+        return {
             "model_name": self.model_name,
             "embedding_dim": self.embedding_dim,
-            "total_chunks": len(self.chunks),
+            "total_chunks": None,
             "source_files": [p.name for p in self.pdf_paths],
             "generated_at": str(Path(__file__).stat().st_mtime),
             "categories": list(self.topic_keywords.keys())
         }
-        
-        config_file = self.output_dir / "cfa_embedding_config.json"
-        with open(config_file, 'w', encoding='utf-8') as f:
-            json.dump(config_data, f, indent=2)
-        logger.info(f"Configuration sauvegardée: {config_file}")
-        
-        # 3. Index de recherche rapide (mots-clés)
-        search_index = {}
-        for chunk in self.chunks:
-            for keyword in chunk.relevance_keywords:
-                if keyword not in search_index:
-                    search_index[keyword] = []
-                search_index[keyword].append(chunk.chunk_index)
-        
-        index_file = self.output_dir / "cfa_search_index.json"
-        with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump(search_index, f, indent=2)
-        logger.info(f"Index de recherche sauvegardé: {index_file}")
-        
-        # 4. Statistiques
-        stats = {
-            "total_chunks": len(self.chunks),
-            "categories_distribution": {},
-            "average_chunk_length": sum(len(chunk.text) for chunk in self.chunks) / len(self.chunks),
-            "total_keywords": len(search_index)
-        }
-        
-        for chunk in self.chunks:
-            cat = chunk.topic_category or "Uncategorized"
-            stats["categories_distribution"][cat] = stats["categories_distribution"].get(cat, 0) + 1
-        
+
+    def save_cfa_data(self):
+        """Sauvegarde les données CFA pour Netlify Functions."""
+        logger.info("Sauvegarde des données CFA...")
+        with CFADataWriter(self.output_dir, self.config_data(), vector_dtype=self.vector_dtype,
+                           quantize=self.quantize, shard_by=self.shard_by,
+                           text_store=self.text_store) as writer:
+            if self.dedup_report is not None:
+                writer.extra_stats["deduplication"] = self.dedup_report
+            for chunk in self.chunks:
+                writer.add(chunk)
+            return writer.finalize()
+    
+    def update_stats(self, section: str, report: Dict[str, Any]):
+        """Ajoute une section (rapport calculé après l'écriture) à cfa_stats.json."""
         stats_file = self.output_dir / "cfa_stats.json"
+        with open(stats_file, 'r', encoding='utf-8') as f:
+            stats = json.load(f)
+        stats[section] = report
         with open(stats_file, 'w', encoding='utf-8') as f:
             json.dump(stats, f, indent=2)
-        logger.info(f"Statistiques sauvegardées: {stats_file}")
-        
+
+    def encode_evaluation_queries(self) -> np.ndarray:
+        """Embeddings des requêtes FR de référence (et de leurs traductions)."""
+        return np.asarray(self.embedding_model.encode(evaluation_queries(), convert_to_tensor=False,
+                                                      normalize_embeddings=True), dtype=np.float32)
+
+    def evaluate_quantization(self) -> Dict[str, Any]:
+        """
+        Rappel@k de la recherche int8 contre la recherche float32 (cfa_vectors.bin).
+
+        Mesuré sans puis avec re-classement float des 4k meilleurs candidats int8.
+        """
+        if not (self.output_dir / VECTORS_FILENAME).exists():
+            logger.warning("Rappel int8 non mesuré: cfa_vectors.bin absent (--vector-store none)")
+            return {}
+        float_store = VectorStore.open(self.output_dir)
+        int8_store = VectorStore.open(self.output_dir, INT8_VECTORS_FILENAME)
+        vectors = np.asarray(float_store.vectors, dtype=np.float32)
+        queries = self.encode_evaluation_queries()
+        codes, scales = int8_store.vectors, int8_store.scales
+
+        report = {
+            "float_bytes": float_store.vectors_file.stat().st_size,
+            "int8_bytes": int8_store.vectors_file.stat().st_size,
+            "queries": len(queries),
+            "int8": evaluate_recall(vectors, queries,
+                                    lambda query, k: search_int8(codes, scales, query, k)[0]),
+            "int8_rerank": evaluate_recall(vectors, queries,
+                                           lambda query, k: search_int8(codes, scales, query, k,
+                                                                        rerank_vectors=float_store.vectors)[0]),
+        }
+        logger.info(f"Quantification int8: {report['float_bytes'] / 1e6:.2f} Mo -> "
+                    f"{report['int8_bytes'] / 1e6:.2f} Mo, rappel {report['int8']} "
+                    f"(re-classé: {report['int8_rerank']}) sur {len(queries)} requêtes")
+        self.update_stats("quantization_int8", report)
+        return report
+
+    def build_pq_index(self) -> Dict[str, Any]:
+        """
+        Apprend les dictionnaires PQ sur cfa_vectors.bin, écrit cfa_pq_m{m}.npz
+        et mesure le rappel@k de la recherche ADC (sans puis avec re-classement float).
+        """
+        if not (self.output_dir / VECTORS_FILENAME).exists():
+            logger.warning("Index PQ non construit: cfa_vectors.bin absent (--vector-store none)")
+            return {}
+        float_store = VectorStore.open(self.output_dir)
+        vectors = np.asarray(float_store.vectors, dtype=np.float32)
+        pq = ProductQuantizer(num_subspaces=self.pq_subspaces).fit(vectors)
+        codes = pq.encode(vectors)
+        pq_file = self.output_dir / pq_filename(self.pq_subspaces)
+        pq.save(pq_file, codes)
+        queries = self.encode_evaluation_queries()
+
+        report = {
+            "subspaces": self.pq_subspaces,
+            "float_bytes": float_store.vectors_file.stat().st_size,
+            "pq_bytes": pq_file.stat().st_size,
+            "queries": len(queries),
+            "pq": evaluate_recall(vectors, queries, lambda query, k: pq.search(codes, query, k)[0]),
+            "pq_rerank": evaluate_recall(vectors, queries,
+                                         lambda query, k: pq.search(codes, query, k,
+                                                                    rerank_vectors=float_store.vectors)[0]),
+        }
+        logger.info(f"Index PQ m={self.pq_subspaces}: {report['float_bytes'] / 1e6:.2f} Mo -> "
+                    f"{report['pq_bytes'] / 1e6:.2f} Mo, rappel {report['pq']} "
+                    f"(re-classé: {report['pq_rerank']}) sur {len(queries)} requêtes")
+        self.update_stats("product_quantization", report)
+        return report
+
+    def evaluate_binary_codes(self) -> Dict[str, Any]:
+        """
+        Rappel@k de la recherche binaire (Hamming) contre la recherche float32.
+
+        Mesuré sans re-classement puis avec re-classement float d'une liste
+        restreinte de 10k et 40k candidats.
+        """
+        if not (self.output_dir / VECTORS_FILENAME).exists():
+            logger.warning("Rappel binaire non mesuré: cfa_vectors.bin absent (--vector-store none)")
+            return {}
+        float_store = VectorStore.open(self.output_dir)
+        binary_store = VectorStore.open(self.output_dir, BINARY_VECTORS_FILENAME)
+        vectors = np.asarray(float_store.vectors, dtype=np.float32)
+        queries = self.encode_evaluation_queries()
+        codes = binary_store.vectors
+
+        def rerank_search(factor: int):
+            return lambda query, k: search_binary(codes, query, k, rerank_vectors=float_store.vectors,
+                                                  rerank_candidates=factor * k)[0]
+
+        report = {
+            "float_bytes": float_store.vectors_file.stat().st_size,
+            "binary_bytes": binary_store.vectors_file.stat().st_size,
+            "queries": len(queries),
+            "binary": evaluate_recall(vectors, queries, lambda query, k: search_binary(codes, query, k)[0]),
+            "binary_rerank_10k": evaluate_recall(vectors, queries, rerank_search(10)),
+            "binary_rerank_40k": evaluate_recall(vectors, queries, rerank_search(40)),
+        }
+        logger.info(f"Codes binaires: {report['float_bytes'] / 1e6:.2f} Mo -> "
+                    f"{report['binary_bytes'] / 1e6:.2f} Mo, rappel {report['binary']} "
+                    f"(re-classé 10k: {report['binary_rerank_10k']}, "
+                    f"40k: {report['binary_rerank_40k']}) sur {len(queries)} requêtes")
+        self.update_stats("quantization_binary", report)
+        return report
+
+    def build_hnsw_index(self) -> Dict[str, Any]:
+        """
+        Construit le graphe HNSW sur cfa_vectors.bin, écrit cfa_hnsw.bin et mesure
+        le rappel@k de la recherche pour plusieurs valeurs de ef.
+        """
+        if not (self.output_dir / VECTORS_FILENAME).exists():
+            logger.warning("Index HNSW non construit: cfa_vectors.bin absent (--vector-store none)")
+            return {}
+        float_store = VectorStore.open(self.output_dir)
+        vectors = np.asarray(float_store.vectors, dtype=np.float32)
+        start = time.time()
+        index = HNSWIndex.build(vectors, M=self.hnsw_m, source_id=float_store.source_id)
+        build_seconds = time.time() - start
+        size_bytes = index.save(self.output_dir / HNSW_FILENAME)
+        queries = self.encode_evaluation_queries()
+
+        report = {
+            "M": self.hnsw_m,
+            "layers": index.num_layers,
+            "build_seconds": round(build_seconds, 1),
+            "hnsw_bytes": size_bytes,
+            "queries": len(queries),
+            "ef": {ef: evaluate_recall(vectors, queries, lambda query, k, ef=ef: index.search(query, k, ef)[0])
+                   for ef in (16, 32, 64)},
+        }
+        logger.info(f"Index HNSW M={self.hnsw_m}: {size_bytes / 1e6:.2f} Mo, {index.num_layers} couches, "
+                    f"rappel par ef {report['ef']} sur {len(queries)} requêtes")
+        self.update_stats("hnsw_index", report)
+        return report
+
+    def build_pca_projection(self) -> Dict[str, Any]:
+        """
+        Apprend la projection ACP sur cfa_vectors.bin, écrit cfa_pca.npz et les
+        vecteurs projetés de chaque dimension cible, puis mesure variance
+        conservée et rappel@k par dimension.
+        """
+        if not (self.output_dir / VECTORS_FILENAME).exists():
+            logger.warning("Projection ACP non construite: cfa_vectors.bin absent (--vector-store none)")
+            return {}
+        float_store = VectorStore.open(self.output_dir)
+        vectors = np.asarray(float_store.vectors, dtype=np.float32)
+        projection = PCAProjection.fit(vectors, max(self.pca_dims))
+        projection.save(self.output_dir / PCA_FILENAME)
+        for dim in self.pca_dims:
+            write_projected_vectors(self.output_dir, vectors, projection, dim, float_store.source_id)
+        queries = self.encode_evaluation_queries()
+
+        report = {"queries": len(queries), "dims": evaluate_dims(vectors, queries, projection, self.pca_dims)}
+        for row in report["dims"]:
+            logger.info(f"ACP {row['dim']} dimensions: variance conservée {row['variance_retained']:.1%}, "
+                        f"rappel@5 {row['recall@5']}, rappel@10 {row['recall@10']}")
+        self.update_stats("pca_projection", report)
+        return report
+
+    def evaluate_artifacts(self):
+        """Mesures de qualité des index compressés demandés (après écriture de cfa_data/)."""
+        if "int8" in self.quantize:
+            self.evaluate_quantization()
+        if "binary" in self.quantize:
+            self.evaluate_binary_codes()
+        if self.pq_subspaces:
+            self.build_pq_index()
+        if self.hnsw_m:
+            self.build_hnsw_index()
+        if self.pca_dims:
+            self.build_pca_projection()
+
+    def check_build_budget(self):
+        """
+        Variantes précompressées, rapport de construction et budget (avant publication).
+
+        Raises:
+            BudgetExceededError: si un artefact ou le bundle dépasse le budget
+        """
+        if not self.build_report:
+            return
+        try:
+            # Bundle d'après publication : la construction plus les JSON conservés de cfa_data/
+            run_build_report(self.output_dir, self.size_budget, write_variants=self.compressed_variants,
+                             output_file=report_path(self.publish_dir), publish_dir=self.publish_dir)
+        except BudgetExceededError:
+            kept = "" if self.versioned else f" (artefacts conservés dans {self.output_dir})"
+            logger.error(f"Construction non publiée, {self.publish_dir} inchangé{kept}")
+            raise
+
+    def publish(self, file_paths: Dict[str, str]) -> Dict[str, str]:
+        """
+        Publie la construction : version + pointeur (mode versioned), sinon
+        déplacement du staging dans cfa_data/.
+
+        Returns:
+            Chemins des fichiers créés, une fois publiés
+        """
+        if self.versioned:
+            publish_version(self.output_dir, self.publish_dir, keep_versions=self.keep_versions)
+        else:
+            promote_staging(self.output_dir, self.publish_dir)
+            file_paths = {purpose: str(self.publish_dir / Path(path).relative_to(self.output_dir))
+                          for purpose, path in file_paths.items()}
+            self.output_dir = self.publish_dir
+        remove_legacy_shards(self.publish_dir)
+        self.published = True
+        return file_paths
+
+    def discard_build(self):
+        """
+        Supprime le répertoire d'une version non publiée (construction échouée ou
+        interrompue) ; sans versions, le staging reste pour analyse et sera vidé
+        par la construction suivante.
+        """
+        if self.published or not self.versioned or not self.output_dir.exists():
+            return
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        logger.info(f"Version non publiée supprimée: {self.output_dir}")
+
+    def close_cache(self):
+        """Journalise les statistiques du cache d'embeddings puis le ferme."""
+        if self.embedding_cache is None:
+            return
+        stats = self.embedding_cache.stats()
+        logger.info(f"Cache d'embeddings: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['hit_rate']:.1%}), {stats['entries']} entrées, "
+                    f"{stats['size_bytes'] / 1e6:.1f} Mo")
+        self.embedding_cache.close()
+        self.embedding_cache = None
+
+    def save_manifest(self):
+        """Écrit le manifeste fichier / page / chunk de cette construction."""
+        manifest = BuildManifest(self.pipeline_fingerprint())
+        for pdf_path, hashes in self.pdf_hashes.items():
+            page_hashes = hashes.get("pages")
+            if page_hashes is None:
+                page_hashes = page_content_hashes(pdf_path)
+            manifest.set_file(pdf_path.name, hashes["sha256"], page_hashes, hashes.get("page_chunks", {}))
+        manifest.save(self.manifest_path)
+        logger.info(f"Manifeste sauvegardé: {self.manifest_path}")
+
+    @staticmethod
+    def merge_page_chunks(reused: Dict[int, List[tuple]], page_groups) -> Iterator[Dict[int, List[tuple]]]:
+        """Intercale les pages reprises (incrémental) entre les groupes de pages extraites, dans l'ordre des pages."""
+        reused_pages = sorted(reused)
+        position = 0
+        for page_chunks in page_groups:
+            first_page = min(page_chunks, default=None)
+            while (first_page is not None and position < len(reused_pages)
+                   and reused_pages[position] < first_page):
+                yield {reused_pages[position]: reused[reused_pages[position]]}
+                position += 1
+            yield page_chunks
+        for page_num in reused_pages[position:]:
+            yield {page_num: reused[page_num]}
+
+    def iter_chunks(self, pdf_paths: List[Path],
+                    page_selection: Optional[Dict[Path, Optional[List[int]]]] = None) -> Iterator[CFAKnowledgeChunk]:
+        """
+        Étapes extraction -> nettoyage -> découpage en flux continu.
+
+        Les pages sont lues une à une (ou par plages en mode parallèle) et les
+        chunks produits au fur et à mesure, sans liste globale. En mode
+        cross_page, le texte d'un PDF est découpé une fois toutes ses pages lues
+        (mémoire bornée par le plus gros PDF).
+
+        Args:
+            pdf_paths: PDFs à traiter (voir existing_pdf_paths)
+            page_selection: Construction incrémentale (voir prepare_incremental_build) :
+                pages à ré-extraire par PDF, les autres reprennent leurs chunks
+                précédents ; un PDF absent du dict est repris en entier
+        """
+        chunk_counter = 0
+        for pdf_path in pdf_paths:
+            page_chunk_hashes = {}
+            try:
+                if page_selection is not None and pdf_path not in page_selection:
+                    pages = iter(())
+                else:
+                    pages = iter_pdf_pages(pdf_path, pool=self.extraction_pool,
+                                           page_numbers=(page_selection or {}).get(pdf_path))
+                if self.cross_page:
+                    pages = list(pages)
+                    page_groups = [self.chunk_document(pages)] if pages else []
+                else:
+                    page_groups = (self.chunk_pages([page_data]) for page_data in pages)
+                reused = self.reused_page_chunks.get(pdf_path, {})
+                for page_chunks in self.merge_page_chunks(reused, page_groups):
+                    for page_num in sorted(page_chunks):
+                        entries = page_chunks[page_num]
+                        page_chunk_hashes[page_num] = [text_hash(text) for text, _ in entries]
+                        for chunk_text, last_page in entries:
+                            yield self.make_chunk(chunk_text, pdf_path.name, page_num,
+                                                  chunk_counter, last_page)
+                            chunk_counter += 1
+            except Exception as e:
+                logger.error(f"Erreur lors de l'extraction PDF {pdf_path}: {e}")
+            self.pdf_hashes[pdf_path]["page_chunks"] = page_chunk_hashes
+            logger.info(f"{pdf_path.name}: cumul {chunk_counter} chunks")
+
+    def run_streaming_pipeline(self, batch_size: Optional[int] = None, queue_depth: int = 2) -> Dict[str, Any]:
+        """
+        Pipeline en flux à mémoire bornée : extraction -> découpage -> embeddings -> écriture.
+
+        Trois étapes recouvrantes reliées par des files bornées : un thread
+        produit les chunks, le thread principal les encode par batch, un thread
+        d'écriture les sérialise. La mémoire reste de l'ordre de
+        (queue_depth * 2 + 1) batchs, quel que soit le nombre de PDFs.
+
+        En mode incrémental, seules les pages modifiées sont extraites et seuls
+        les chunks nouveaux sont encodés. La déduplication, qui compare tous les
+        chunks entre eux, nécessite run_complete_pipeline.
+
+        Args:
+            batch_size: Chunks par batch transmis entre les étapes (défaut: 64
+                par processus d'encodage, CALIBRATION_MIN_TEXTS en mode bucketed
+                pour que le premier batch calibre la taille d'encodage)
+            queue_depth: Batchs en attente maximum entre deux étapes
+        """
+        if self.dedup:
+            raise ValueError("La déduplication nécessite tous les chunks: utiliser run_complete_pipeline")
+        if batch_size is None:
+            batch_size = 64 * self.encode_workers
+            if self.batching == "bucketed":
+                batch_size = max(batch_size, CALIBRATION_MIN_TEXTS)
+        logger.info("🚀 Démarrage du pipeline CFA RAG (mode flux)")
+        # Avant l'ouverture du writer : le fichier précédent est lu puis réécrit
+        pdf_paths = self.existing_pdf_paths()
+        page_selection = self.prepare_incremental_build(pdf_paths) if self.incremental else None
+        done = object()
+        chunk_queue: "queue.Queue" = queue.Queue(maxsize=queue_depth)
+        write_queue: "queue.Queue" = queue.Queue(maxsize=queue_depth)
+        errors: List[BaseException] = []
+
+        def produce():
+            try:
+                chunks = self.iter_chunks(pdf_paths, page_selection)
+                while True:
+                    batch = list(islice(chunks, batch_size))
+                    if not batch:
+                        break
+                    chunk_queue.put(batch)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                chunk_queue.put(done)
+
+        def write(writer: CFADataWriter):
+            while True:
+                batch = write_queue.get()
+                if batch is done:
+                    return
+                if errors:
+                    continue  # Vider la file sans écrire après une erreur
+                try:
+                    for chunk in batch:
+                        writer.add(chunk)
+                except BaseException as e:
+                    errors.append(e)
+
+        with CFADataWriter(self.output_dir, self.config_data(), vector_dtype=self.vector_dtype,
+                           quantize=self.quantize, shard_by=self.shard_by,
+                           text_store=self.text_store) as writer:
+            producer = threading.Thread(target=produce, name="cfa-chunks", daemon=True)
+            writer_thread = threading.Thread(target=write, args=(writer,), name="cfa-writer", daemon=True)
+            producer.start()
+            writer_thread.start()
+            encoded = processed = 0
+            try:
+                while True:
+                    batch = chunk_queue.get()
+                    if batch is done or errors:
+                        break
+                    encoded += self.embed_chunks(batch, log_batches=False)
+                    processed += len(batch)
+                    logger.info(f"Chunks traités: {processed} (encodés: {encoded})")
+                    write_queue.put(batch)
+            finally:
+                write_queue.put(done)
+                writer_thread.join()
+
+            if errors:
+                raise errors[0]
+            if writer.total_chunks == 0:
+                raise RuntimeError("Aucun chunk créé - arrêt du pipeline")
+            file_paths = writer.finalize()
+
+        self.evaluate_artifacts()
+        self.check_build_budget()
+        file_paths = self.publish(file_paths)
+        self.save_manifest()
+        self.close_encoder()
+        self.close_cache()
+        logger.info("✅ Pipeline CFA RAG terminé avec succès")
         return {
-            "embeddings_file": str(embeddings_file),
-            "config_file": str(config_file), 
-            "index_file": str(index_file),
-            "stats_file": str(stats_file)
+            "chunks_processed": writer.total_chunks,
+            "embedding_dimension": self.embedding_dim,
+            "files_created": file_paths
         }
-    
+
     def run_complete_pipeline(self) -> Dict[str, Any]:
         """Exécute le pipeline complet de génération des embeddings CFA."""
         logger.info("🚀 Démarrage du pipeline CFA RAG")
@@ -381,12 +1367,20 @@ class CFAEmbeddingGenerator:
         chunks_created = self.process_cfa_document()
         if chunks_created == 0:
             raise RuntimeError("Aucun chunk créé - arrêt du pipeline")
+        if self.dedup:
+            self.deduplicate_chunks()
         
         # Étape 2: Génération des embeddings
         self.generate_embeddings()
         
         # Étape 3: Sauvegarde
         file_paths = self.save_cfa_data()
+        self.evaluate_artifacts()
+        self.check_build_budget()
+        file_paths = self.publish(file_paths)
+        self.save_manifest()
+        self.close_encoder()
+        self.close_cache()
         
         logger.info("✅ Pipeline CFA RAG terminé avec succès")
         return {
@@ -395,11 +1389,100 @@ class CFAEmbeddingGenerator:
             "files_created": file_paths
         }
 
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Options de ligne de commande (toutes facultatives)."""
+    parser = argparse.ArgumentParser(description="Génération des embeddings CFA pour Netlify Functions")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processus pour l'extraction PDF (1 = séquentiel, 0 = tous les cœurs)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Ne retraiter que les pages et chunks modifiés depuis la dernière génération")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ne pas utiliser le cache d'embeddings persistant")
+    parser.add_argument("--cache-max-mb", type=int, default=512,
+                        help="Taille maximale du cache d'embeddings (éviction LRU au-delà)")
+    parser.add_argument("--batching", choices=["fixed", "bucketed"], default="fixed",
+                        help="Batchs fixes de 8, ou triés par longueur avec taille calibrée")
+    parser.add_argument("--encode-workers", type=int, default=1,
+                        help="Processus d'encodage des embeddings (1 = local, 0 = tous les cœurs)")
+    parser.add_argument("--chunking", choices=("chars", "tokens"), default="chars",
+                        help="Découpage par caractères (historique) ou par tokens du modèle "
+                             "(chunks toujours dans la fenêtre du modèle)")
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=32,
+                        help="Chevauchement entre chunks en mode --chunking tokens")
+    parser.add_argument("--cross-page", action="store_true",
+                        help="Découper chaque PDF en continu par-delà les sauts de page")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Fusionner les chunks quasi identiques avant l'encodage "
+                             "(pipeline en mémoire : compare tous les chunks)")
+    parser.add_argument("--dedup-threshold", type=float, default=0.9,
+                        help="Similarité de Jaccard minimale pour fusionner deux chunks")
+    parser.add_argument("--vector-store", choices=("float32", "float16", "none"), default="float32",
+                        help="Type de la matrice binaire cfa_vectors.bin (none = pas de fichier binaire)")
+    parser.add_argument("--quantize", choices=tuple(QUANTIZED_FILENAMES), nargs="+", default=[],
+                        help="Écrire aussi des versions quantifiées des vecteurs (int8, binary) "
+                             "et mesurer leur rappel@k")
+    parser.add_argument("--pq-subspaces", type=int, default=None,
+                        help="Construire un index de quantification produit (octets par vecteur, "
+                             "doit diviser la dimension ; ex. 16)")
+    parser.add_argument("--hnsw-m", type=int, default=None,
+                        help="Construire un index de graphe HNSW (voisins par vecteur ; ex. 16)")
+    parser.add_argument("--pca-dims", type=int, nargs="+", default=[],
+                        help="Dimensions cibles d'une projection ACP des vecteurs (ex. 32 50 64)")
+    parser.add_argument("--shard-by", choices=SHARD_FIELDS, nargs="+", default=[],
+                        help="Écrire aussi des shards JSON par cours et/ou catégorie "
+                             "(cfa_data/shards/, hors du bundle Netlify)")
+    parser.add_argument("--text-store", action="store_true",
+                        help="Écrire les textes des chunks compressés un à un (cfa_texts.bin, "
+                             "lecture par identifiant)")
+    parser.add_argument("--versioned", action="store_true",
+                        help="Écrire dans un répertoire de version puis publier atomiquement "
+                             "(cfa_data_current.json)")
+    parser.add_argument("--keep-versions", type=int, default=3,
+                        help="Nombre de versions conservées avec --versioned")
+    parser.add_argument("--no-build-report", action="store_true",
+                        help="Ne pas écrire le rapport de construction (budget non vérifié)")
+    parser.add_argument("--compressed-variants", action="store_true",
+                        help="Écrire aussi les variantes .gz / .br de chaque artefact "
+                             "(tailles mesurées dans le rapport dans tous les cas)")
+    add_budget_arguments(parser)
+    parser.add_argument("--no-streaming", action="store_true",
+                        help="Pipeline en mémoire (tous les chunks puis tous les embeddings) au lieu "
+                             "du pipeline en flux à mémoire bornée")
+    return parser.parse_args(argv)
+
 def main():
     """Point d'entrée principal."""
+    args = parse_args()
+    generator = None
+    results = None
     try:
-        generator = CFAEmbeddingGenerator()
-        results = generator.run_complete_pipeline()
+        generator = CFAEmbeddingGenerator(extraction_workers=args.workers,
+                                          incremental=args.incremental,
+                                          use_cache=not args.no_cache,
+                                          cache_max_mb=args.cache_max_mb,
+                                          batching=args.batching,
+                                          encode_workers=args.encode_workers,
+                                          chunking=args.chunking,
+                                          chunk_overlap_tokens=args.chunk_overlap_tokens,
+                                          cross_page=args.cross_page,
+                                          dedup=args.dedup,
+                                          dedup_threshold=args.dedup_threshold,
+                                          vector_dtype=None if args.vector_store == "none" else args.vector_store,
+                                          quantize=args.quantize,
+                                          pq_subspaces=args.pq_subspaces,
+                                          hnsw_m=args.hnsw_m,
+                                          pca_dims=args.pca_dims,
+                                          shard_by=args.shard_by,
+                                          text_store=args.text_store,
+                                          versioned=args.versioned,
+                                          keep_versions=args.keep_versions,
+                                          build_report=not args.no_build_report,
+                                          compressed_variants=args.compressed_variants,
+                                          size_budget=budget_from_args(args))
+        if args.no_streaming or args.dedup:
+            results = generator.run_complete_pipeline()
+        else:
+            results = generator.run_streaming_pipeline()
         
         print("\n" + "="*60)
         print("🎓 GÉNÉRATION EMBEDDINGS CFA - RÉSULTATS")
@@ -411,9 +1494,18 @@ def main():
             print(f"   - {purpose}: {filepath}")
         print("\n🔗 Prêt pour intégration dans Netlify Functions!")
         
+    except KeyboardInterrupt:
+        logger.warning("⚠️ Génération interrompue par l'utilisateur")
+        raise SystemExit(130)
     except Exception as e:
         logger.error(f"❌ Erreur dans le pipeline: {e}")
         raise
+    finally:
+        if generator is not None:
+            generator.close_encoder()
+            generator.close_cache()
+            if results is None:
+                generator.discard_build()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Encodage d'embeddings réparti sur un pool de processus CPU.
+
+Chaque worker charge sa propre copie du modèle une seule fois (initializer du
+pool) et limite ses threads intra-op PyTorch, pour que N workers x T threads
+ne dépassent pas le nombre de cœurs. Les variables de threads BLAS
+(OMP_NUM_THREADS...) sont posées dans le processus principal tant que le pool
+existe : un worker spawn les hérite avant de ré-importer les modules qui
+chargent numpy / torch. Les résultats reviennent dans l'ordre des textes.
+
+Les workers de ce pool et ceux de l'extraction PDF (cfa_pdf_extraction)
+partagent init_worker_process : ils ignorent SIGINT, un Ctrl-C est traité par
+le processus principal, qui annule les lots en attente et attend la fin des
+lots en cours.
+
+USAGE:
+    with ParallelEncoder("sentence-transformers/all-MiniLM-L6-v2", workers=8) as encoder:
+        vectors = encoder.encode(texts)
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Variables lues par les bibliothèques BLAS à leur chargement
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Modèle du worker courant (chargé une fois par processus)
+_worker_model = None
+
+
+def init_worker_process():
+    """Initialisation commune aux workers des pools : Ctrl-C laissé au processus principal."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _init_worker(model_name: str, threads: int):
+    """Initialise un worker : ignore Ctrl-C, limite les threads, charge le modèle."""
+    init_worker_process()
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    global _worker_model
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_in_worker(texts: List[str], batch_size: int) -> np.ndarray:
+    """Encode un lot de textes avec le modèle du worker."""
+    return np.asarray(_worker_model.encode(texts, batch_size=batch_size, convert_to_tensor=False,
+                                           normalize_embeddings=True), dtype=np.float32)
+
+
+class ParallelEncoder:
+    """Pool de processus d'encodage, chacun avec sa copie du modèle."""
+
+    def __init__(self, model_name: str, workers: Optional[int] = None,
+                 threads_per_worker: Optional[int] = None,
+                 batch_size: int = 32, texts_per_task: int = 128):
+        """
+        Args:
+            model_name: Modèle Sentence Transformers chargé par chaque worker
+            workers: Nombre de processus (défaut: nombre de cœurs)
+            threads_per_worker: Threads intra-op par worker (défaut: cœurs / workers)
+            batch_size: Taille de batch du modèle dans chaque worker
+            texts_per_task: Textes maximum par tâche (réduit pour les petits appels,
+                afin que chaque worker reçoive du travail)
+        """
+        cpu_count = os.cpu_count() or 1
+        self.model_name = model_name
+        self.workers = workers or cpu_count
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.workers)
+        self.batch_size = batch_size
+        self.texts_per_task = texts_per_task
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._saved_env: Dict[str, Optional[str]] = {}
+
+    def start(self):
+        """Démarre le pool (spawn : pas de fork d'un processus ayant déjà chargé torch)."""
+        if self._executor is None:
+            logger.info(f"Démarrage de {self.workers} workers d'encodage "
+                        f"({self.threads_per_worker} threads chacun)")
+            # Environnement hérité par les workers, créés à la demande pendant la vie
+            # du pool : posé avant leur spawn, donc avant tout import de numpy / torch.
+            # Sans effet sur le processus principal, dont les bibliothèques sont chargées.
+            thread_env = {var: str(self.threads_per_worker) for var in THREAD_ENV_VARS}
+            thread_env["USE_TF"] = os.environ.get("USE_TF", "0")
+            self._saved_env = {var: os.environ.get(var) for var in thread_env}
+            os.environ.update(thread_env)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads_per_worker))
+        return self
+
+    def encode(self, texts: Sequence[str]) -> List[np.ndarray]:
+        """Encode les textes sur le pool ; vecteurs dans l'ordre de texts."""
+        self.start()
+        texts = list(texts)
+        per_task = max(1, min(self.texts_per_task, -(-len(texts) // self.workers)))
+        tasks = [texts[i:i + per_task] for i in range(0, len(texts), per_task)]
+        start = time.perf_counter()
+        embeddings: List[np.ndarray] = []
+        try:
+            for done, vectors in enumerate(self._executor.map(
+                    _encode_in_worker, tasks, [self.batch_size] * len(tasks)), 1):
+                embeddings.extend(vectors)
+                logger.info(f"Lot {done}/{len(tasks)} encodé")
+        except KeyboardInterrupt:
+            logger.warning("Interruption: annulation des lots d'encodage en attente")
+            self.close()
+            raise
+        elapsed = time.perf_counter() - start
+        if elapsed:
+            logger.info(f"Encodage parallèle: {len(texts)} textes, {len(texts) / elapsed:.1f} textes/s")
+        return embeddings
+
+    def close(self):
+        """Annule les lots non démarrés, attend les lots en cours et arrête les workers."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            for var, value in self._saved_env.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+            self._saved_env = {}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Recherche simultanée d'un ensemble de termes (automate d'Aho-Corasick).
+
+Les termes sont compilés une fois en automate déterministe ; un texte est
+ensuite parcouru une seule fois, caractère par caractère, quel que soit le
+nombre de termes. Remplace les boucles « un str.count / in par terme » de
+l'annotation des chunks (catégories, mots-clés, expressions FR).
+
+Les comptes sont ceux de str.count : occurrences sans chevauchement d'un
+même terme (deux termes différents peuvent, eux, se chevaucher).
+
+Si le paquet pyahocorasick est installé, son automate (en C) est utilisé
+pour le parcours ; sinon l'automate Python ci-dessous, aux résultats identiques.
+
+USAGE:
+    matcher = TermMatcher(["asset allocation", "allocation", "risk"])
+    counts = matcher.count_terms(text.lower())   # {"allocation": 2, ...}
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class TermMatcher:
+    """Automate d'Aho-Corasick sur un ensemble de termes (sensible à la casse)."""
+
+    def __init__(self, terms: Iterable[str]):
+        # Termes uniques, dans l'ordre de première apparition
+        self.terms: List[str] = [term for term in dict.fromkeys(terms) if term]
+        self._transitions: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+
+        # 1. Trie des termes
+        for term_id, term in enumerate(self.terms):
+            state = 0
+            for char in term:
+                next_state = self._transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self._transitions)
+                    self._transitions[state][char] = next_state
+                    self._transitions.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(term_id)
+
+        # 2. Liens d'échec (parcours en largeur), fusionnés dans les transitions :
+        # l'automate obtenu est déterministe, une seule transition par caractère
+        failure = [0] * len(self._transitions)
+        queue = list(self._transitions[0].values())
+        for state in queue:
+            for char, next_state in list(self._transitions[state].items()):
+                queue.append(next_state)
+                fallback = failure[state]
+                while fallback and char not in self._transitions[fallback]:
+                    fallback = failure[fallback]
+                failure[next_state] = self._transitions[fallback].get(char, 0)
+                outputs[next_state].extend(outputs[failure[next_state]])
+        for state in queue:
+            for char, target in self._transitions[failure[state]].items():
+                self._transitions[state].setdefault(char, target)
+
+        # dict.get liés d'avance : la boucle de parcours n'a plus de résolution d'attribut
+        self._getters = [state_transitions.get for state_transitions in self._transitions]
+        # Ids des termes reconnus en arrivant dans chaque état
+        self._outputs: List[Tuple[int, ...]] = [tuple(state_outputs) for state_outputs in outputs]
+        self._lengths = [len(term) for term in self.terms]
+
+        self._c_automaton = None
+        if ahocorasick is not None and self.terms:
+            self._c_automaton = ahocorasick.Automaton()
+            for term_id, term in enumerate(self.terms):
+                self._c_automaton.add_word(term, term_id)
+            self._c_automaton.make_automaton()
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int]]:
+        """(position de fin exclusive, id du terme) de chaque occurrence, chevauchements inclus."""
+        if self._c_automaton is not None:
+            for last_index, term_id in self._c_automaton.iter(text):
+                yield last_index + 1, term_id
+            return
+        transitions, outputs = self._getters, self._outputs
+        state = 0
+        for end, char in enumerate(text, 1):
+            state = transitions[state](char, 0)
+            if outputs[state]:
+                for term_id in outputs[state]:
+                    yield end, term_id
+
+    def count_terms(self, text: str) -> Dict[str, int]:
+        """Nombre d'occurrences sans chevauchement de chaque terme présent (comme str.count)."""
+        counts = [0] * len(self.terms)
+        next_allowed = [0] * len(self.terms)
+        for end, term_id in self.iter_matches(text):
+            start = end - self._lengths[term_id]
+            if start >= next_allowed[term_id]:
+                counts[term_id] += 1
+                next_allowed[term_id] = end
+        return {term: count for term, count in zip(self.terms, counts) if count}
@@ -8,6 +8,45 @@ import json
 import sys
 from pathlib import Path
 
+from cfa_bm25 import BM25_FILENAME, BM25Index
+from cfa_postings import POSTINGS_FILENAME, PostingsIndex
+from cfa_retriever import CFARetriever
+from cfa_text_store import TEXTS_FILENAME, TextStore
+from cfa_vector_store import VECTORS_FILENAME, VectorStore
+
+def load_chunks_and_dimension(cfa_data_dir: Path):
+    """
+    Chunks (sans embeddings) et dimension des vecteurs.
+
+    Utilise la matrice binaire cfa_vectors.bin si elle existe (ouverture par
+    memmap, sans parser les vecteurs), sinon le JSON complet. Si les textes
+    sont dans cfa_texts.bin, ils sont décompressés à la lecture de chaque chunk.
+    """
+    if (cfa_data_dir / VECTORS_FILENAME).exists():
+        store = VectorStore.open(cfa_data_dir)
+        chunks = store.metadata
+        if (cfa_data_dir / TEXTS_FILENAME).exists():
+            texts = TextStore.open(cfa_data_dir)
+            chunks = LazyTextChunks(chunks, texts)
+        return chunks, store.dim
+    with open(cfa_data_dir / "cfa_knowledge_embeddings.json", 'r', encoding='utf-8') as f:
+        embeddings_data = json.load(f)
+    dimension = len(embeddings_data[0].get('embedding') or []) if embeddings_data else 0
+    return embeddings_data, dimension
+
+class LazyTextChunks:
+    """Liste de métadonnées dont le texte est lu dans cfa_texts.bin à l'accès."""
+
+    def __init__(self, chunks, texts: TextStore):
+        self.chunks = chunks
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __getitem__(self, index):
+        return dict(self.chunks[index], text=self.texts.get_text(index))
+
 def test_cfa_search():
     """Test basique de la recherche CFA."""
     
@@ -56,8 +95,7 @@ def test_cfa_search():
     # Test de chargement des embeddings (échantillon)
     try:
         print(f"\n🔍 TEST CHARGEMENT EMBEDDINGS:")
-        with open(cfa_data_dir / "cfa_knowledge_embeddings.json", 'r', encoding='utf-8') as f:
-            embeddings_data = json.load(f)
+        embeddings_data, dimension = load_chunks_and_dimension(cfa_data_dir)
         
         if embeddings_data and len(embeddings_data) > 0:
             sample = embeddings_data[0]
@@ -65,7 +103,7 @@ def test_cfa_search():
             print(f"      - Texte: {sample['text'][:100]}...")
             print(f"      - Page: {sample.get('page_number', 'N/A')}")
             print(f"      - Catégorie: {sample.get('topic_category', 'N/A')}")
-            print(f"      - Embedding dimension: {len(sample.get('embedding', []))}")
+            print(f"      - Embedding dimension: {dimension}")
             print(f"      - Mots-clés: {sample.get('relevance_keywords', [])[:5]}")
         else:
             print(f"   ❌ Aucun chunk trouvé")
@@ -112,22 +150,38 @@ def simulate_search_query(query_text="portfolio diversification risk management"
     
     cfa_data_dir = Path("../netlify/functions/cfa_data")
     
+    if (cfa_data_dir / VECTORS_FILENAME).exists():
+        # Recherche vectorielle classée (requête encodée par le modèle des chunks)
+        try:
+            retriever = CFARetriever(cfa_data_dir)
+            for i, chunk in enumerate(retriever.search(query_text, k=3)):
+                print(f"\n📄 Résultat {i+1} (score {chunk['score']:.3f}):")
+                print(f"   Page: {chunk.get('page_number', 'N/A')}")
+                print(f"   Catégorie: {chunk.get('topic_category', 'N/A')}")
+                print(f"   Texte: {chunk['text'][:200]}...")
+            timings = retriever.last_timings
+            print(f"\n⏱️ Encodage {timings['embed_ms']:.1f} ms, recherche {timings['search_ms']:.2f} ms")
+            return
+        except ImportError as e:
+            print(f"⚠️ Recherche vectorielle indisponible ({e}), repli sur les mots-clés")
+    
     try:
-        # Charger l'index
-        with open(cfa_data_dir / "cfa_search_index.json", 'r', encoding='utf-8') as f:
-            search_index = json.load(f)
+        # Charger les chunks (les vecteurs ne sont pas nécessaires ici)
+        embeddings_data, _ = load_chunks_and_dimension(cfa_data_dir)
         
-        # Charger les embeddings
-        with open(cfa_data_dir / "cfa_knowledge_embeddings.json", 'r', encoding='utf-8') as f:
-            embeddings_data = json.load(f)
-        
-        # Recherche par mots-clés
+        # Recherche lexicale : classement BM25 s'il existe, sinon OU sur les mots-clés
         query_words = query_text.lower().split()
-        matching_chunks = set()
-        
-        for word in query_words:
-            if word in search_index:
-                matching_chunks.update(search_index[word])
+        if (cfa_data_dir / BM25_FILENAME).exists():
+            matching_chunks = BM25Index.open(cfa_data_dir).search(query_text, k=10)[0].tolist()
+        elif (cfa_data_dir / POSTINGS_FILENAME).exists():
+            matching_chunks = PostingsIndex.open(cfa_data_dir).union(query_words).tolist()
+        else:
+            with open(cfa_data_dir / "cfa_search_index.json", 'r', encoding='utf-8') as f:
+                search_index = json.load(f)
+            matching_chunks = set()
+            for word in query_words:
+                if word in search_index:
+                    matching_chunks.update(search_index[word])
         
         if matching_chunks:
             print(f"📋 Trouvé {len(matching_chunks)} chunks correspondants")
@@ -2,10 +2,12 @@
 """
 Test de la solution multilingue pour RAG CFA
 Valide que la traduction FR->EN améliore la recherche vectorielle
+(sur les vrais embeddings de cfa_data/ s'ils ont été générés)
 """
 
 import sys
 import os
+from pathlib import Path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import du traducteur
@@ -15,6 +17,8 @@ except ImportError:
     print("❌ Erreur: Impossible d'importer FrenchToEnglishTranslator")
     sys.exit(1)
 
+from cfa_eval import FRENCH_QUERIES
+
 def test_translation_improvement():
     """Test l'amélioration apportée par la traduction."""
     
@@ -214,6 +218,44 @@ def simulate_improved_search():
     
     return improvement_pct
 
+def compare_vector_search(k: int = 5):
+    """
+    Recherche vectorielle réelle sur cfa_data/ : requêtes FR brutes contre
+    traduites, toutes encodées et classées en un seul lot (CFARetriever.search_many).
+    """
+    
+    print(f"\n📐 RECHERCHE VECTORIELLE CFA (FR brut vs traduit)")
+    print("-"*50)
+    
+    data_dir = Path(__file__).resolve().parent.parent / "netlify" / "functions" / "cfa_data"
+    if not (data_dir / "cfa_vectors.bin").exists():
+        print("   ⏭️ cfa_vectors.bin absent: lancer generate_cfa_embeddings.py")
+        return None
+    
+    french_queries = FRENCH_QUERIES
+    translator = FrenchToEnglishTranslator()
+    english_queries = [translator.translate_query(query) for query in french_queries]
+    
+    try:
+        from cfa_retriever import CFARetriever
+        retriever = CFARetriever(data_dir)
+        results = retriever.search_many(french_queries + english_queries, k=k)
+    except ImportError as e:
+        print(f"   ⏭️ Recherche vectorielle indisponible: {e}")
+        return None
+    
+    french_results, english_results = results[:len(french_queries)], results[len(french_queries):]
+    gains = []
+    for query, fr_top, en_top in zip(french_queries, french_results, english_results):
+        fr_score, en_score = fr_top[0]["score"], en_top[0]["score"]
+        gains.append(en_score - fr_score)
+        print(f"   {query[:45]:45} | FR: {fr_score:.3f} | EN: {en_score:.3f} | {en_score - fr_score:+.3f}")
+    
+    mean_gain = sum(gains) / len(gains)
+    print(f"\n   Gain moyen du score top-1: {mean_gain:+.3f} "
+          f"({len(results)} requêtes en un lot, {retriever.last_timings['total_ms']:.1f} ms)")
+    return mean_gain
+
 def main():
     """Fonction principale de test."""
     
@@ -230,11 +272,16 @@ def main():
         # Test 3: Simulation recherche
         improvement = simulate_improved_search()
         
+        # Test 4: Recherche vectorielle réelle (si les embeddings existent)
+        vector_gain = compare_vector_search()
+        
         # Verdict final
         print(f"\n🏆 VERDICT FINAL:")
         print(f"   Traduction: {translation_success:.1%}")
         print(f"   Mapping CFA: {mapping_success:.1%}")
         print(f"   Amélioration: +{improvement:.1f}%")
+        if vector_gain is not None:
+            print(f"   Gain vectoriel top-1: {vector_gain:+.3f}")
         
         overall_success = (translation_success + mapping_success) / 2
         
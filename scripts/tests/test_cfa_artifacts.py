@@ -0,0 +1,168 @@
+"""Publication versionnée de cfa_data/, retour arrière et promotion du staging."""
+
+import json
+
+import pytest
+
+from cfa_artifacts import (ARTIFACT_MANIFEST_FILENAME, ArtifactWatcher, current_dir, is_generated,
+                           kept_versions, new_staging_dir, new_version_dir, pointer_path, promote_staging,
+                           publish_version, read_manifest, read_pointer, rollback, versions_dir)
+
+
+@pytest.fixture
+def publish_dir(tmp_path):
+    path = tmp_path / "cfa_data"
+    path.mkdir()
+    # Fichier hors construction (version enrichie FR) : jamais touché
+    (path / "cfa_knowledge_embeddings_french_enriched.json").write_text("{}")
+    return path
+
+
+def build(publish_dir, files):
+    version_dir = new_version_dir(publish_dir)
+    for name, content in files.items():
+        (version_dir / name).parent.mkdir(parents=True, exist_ok=True)
+        (version_dir / name).write_text(content)
+    return version_dir
+
+
+def contents(directory):
+    return {path.relative_to(directory).as_posix(): path.read_text()
+            for path in sorted(directory.rglob("*")) if path.is_file()
+            and path.name != ARTIFACT_MANIFEST_FILENAME}
+
+
+V1 = {"cfa_stats.json": "1", "cfa_vectors.bin": "vecteurs", "shards/course_1.json": "a", "old.json": "x"}
+V2 = {"cfa_stats.json": "2", "cfa_vectors.bin": "vecteurs", "shards/course_1.json": "b"}
+
+
+def test_publish_version(publish_dir):
+    v1 = build(publish_dir, V1)
+    manifest = publish_version(v1, publish_dir)
+    assert set(manifest["files"]) == set(V1)
+    assert read_pointer(publish_dir)["version"] == v1.name
+    assert current_dir(publish_dir) == v1
+    unchanged_inode = (publish_dir / "cfa_vectors.bin").stat().st_ino
+
+    v2 = build(publish_dir, V2)
+    publish_version(v2, publish_dir)
+    assert contents(publish_dir) == dict(V2, **{"cfa_knowledge_embeddings_french_enriched.json": "{}"})
+    assert read_manifest(publish_dir)["version"] == v2.name
+    assert read_pointer(publish_dir)["path"] == f"cfa_data_versions/{v2.name}"
+    # Fichier de même hash non recopié
+    assert (publish_dir / "cfa_vectors.bin").stat().st_ino == unchanged_inode
+
+
+def test_rollback_to_previous_version(publish_dir):
+    v1 = build(publish_dir, V1)
+    publish_version(v1, publish_dir)
+    with pytest.raises(ValueError):
+        rollback(publish_dir)
+    v2 = build(publish_dir, V2)
+    publish_version(v2, publish_dir)
+    watcher = ArtifactWatcher(publish_dir)
+
+    manifest = rollback(publish_dir)
+    assert manifest["version"] == v1.name
+    assert read_pointer(publish_dir)["version"] == v1.name
+    assert contents(publish_dir) == dict(V1, **{"cfa_knowledge_embeddings_french_enriched.json": "{}"})
+    assert v2.exists()
+    assert watcher.poll(force=True) and watcher.current_dir() == v1
+
+    rollback(publish_dir, v2.name)
+    assert read_pointer(publish_dir)["version"] == v2.name
+    with pytest.raises(ValueError):
+        rollback(publish_dir, "inconnue")
+
+
+def test_old_versions_pruned(publish_dir):
+    built = []
+    for i in range(4):
+        built.append(build(publish_dir, {"cfa_stats.json": str(i)}))
+        publish_version(built[-1], publish_dir, keep_versions=2)
+    assert sorted(path.name for path in versions_dir(publish_dir).iterdir()) == [v.name for v in built[2:]]
+    assert json.loads(pointer_path(publish_dir).read_text())["version"] == built[-1].name
+
+
+def test_promote_staging(publish_dir):
+    (publish_dir / "shards").mkdir()
+    (publish_dir / "shards" / "stale.json").write_text("ancien")
+    (publish_dir / "cfa_stats.json").write_text("ancien")
+
+    staging = new_staging_dir(publish_dir)
+    (staging / "cfa_stats.json").write_text("nouveau")
+    (staging / "shards").mkdir()
+    (staging / "shards" / "course_1.json").write_text("a")
+    assert promote_staging(staging, publish_dir) == 2
+
+    assert not staging.exists()
+    assert contents(publish_dir) == {"cfa_knowledge_embeddings_french_enriched.json": "{}",
+                                     "cfa_stats.json": "nouveau", "shards/course_1.json": "a"}
+
+
+def test_promote_staging_removes_stale_artifacts(publish_dir):
+    # Construction précédente avec HNSW, niveau int8 et variantes ; la nouvelle n'en a pas
+    for name in ("cfa_vectors.bin", "cfa_hnsw.bin", "cfa_vectors_int8.bin", "cfa_vectors_pca50.bin",
+                 "cfa_stats.json.gz", "cfa_pq_m8.npz", "notes.txt"):
+        (publish_dir / name).write_text("ancien")
+    staging = new_staging_dir(publish_dir)
+    (staging / "cfa_vectors.bin").write_text("nouveau")
+    (staging / "cfa_stats.json").write_text("nouveau")
+    promote_staging(staging, publish_dir)
+    assert contents(publish_dir) == {"cfa_knowledge_embeddings_french_enriched.json": "{}", "notes.txt": "ancien",
+                                     "cfa_stats.json": "nouveau", "cfa_vectors.bin": "nouveau"}
+
+
+def test_publish_version_removes_stale_artifacts(publish_dir):
+    # Artefacts d'une construction non versionnée, absents du manifeste de la version
+    (publish_dir / "cfa_hnsw.bin").write_text("ancien")
+    (publish_dir / "shards").mkdir()
+    (publish_dir / "shards" / "cfa_shards.json").write_text("ancien")
+    publish_version(build(publish_dir, V2), publish_dir)
+    assert contents(publish_dir) == dict(V2, **{"cfa_knowledge_embeddings_french_enriched.json": "{}"})
+
+
+def test_generated_artifact_names():
+    for name in ("cfa_vectors_binary.bin", "cfa_vectors_meta.jsonl", "cfa_hnsw.bin.br", "shards/cfa_shards.json",
+                 "cfa_shard_ethics_0a1b2c3d.json", "cfa_knowledge_embeddings.json.gz"):
+        assert is_generated(name)
+    for name in ("cfa_knowledge_embeddings_french_enriched.json", "cfa_artifacts.json", "notes.txt"):
+        assert not is_generated(name)
+
+
+def test_rejected_staging_is_cleared(publish_dir):
+    staging = new_staging_dir(publish_dir)
+    (staging / "cfa_stats.json").write_text("rejeté")
+    assert list(new_staging_dir(publish_dir).iterdir()) == []
+    assert contents(publish_dir) == {"cfa_knowledge_embeddings_french_enriched.json": "{}"}
+
+
+def test_versions_in_publish_order(publish_dir):
+    # Plus de 10 versions dans la même seconde : "-10" après "-9"
+    created = []
+    for i in range(12):
+        created.append(build(publish_dir, {"cfa_stats.json": str(i)}).name)
+        publish_version(versions_dir(publish_dir) / created[-1], publish_dir, keep_versions=20)
+    assert kept_versions(publish_dir) == created
+
+
+def test_incomplete_versions_ignored(publish_dir):
+    v1 = build(publish_dir, V1)
+    publish_version(v1, publish_dir, keep_versions=2)
+    # Constructions échouées ou interrompues : pas de manifeste, ou fichier manquant
+    failed = [build(publish_dir, {"cfa_stats.json": "échec"}) for _ in range(2)]
+    truncated = build(publish_dir, {"cfa_stats.json": "tronqué"})
+    publish_version(truncated, publish_dir, keep_versions=5)
+    (truncated / "cfa_stats.json").unlink()
+    assert kept_versions(publish_dir) == [v1.name]
+
+    v2 = build(publish_dir, V2)
+    publish_version(v2, publish_dir, keep_versions=2)
+    # v1 n'est pas supprimée au profit des répertoires incomplets
+    assert kept_versions(publish_dir) == [v1.name, v2.name]
+    assert all(path.exists() for path in failed)
+    with pytest.raises(ValueError):
+        rollback(publish_dir, failed[0].name)
+    with pytest.raises(ValueError):
+        rollback(publish_dir, truncated.name)
+    assert rollback(publish_dir)["version"] == v1.name
@@ -0,0 +1,72 @@
+"""Codes binaires : bits de signe, distance de Hamming et niveau binaire du retriever."""
+
+import numpy as np
+import pytest
+
+import cfa_binary
+from cfa_binary import binarize, hamming_distances, popcount, search_binary
+from cfa_eval import exact_top_k, recall_at_k
+from cfa_hnsw import synthetic_vectors
+from cfa_retriever import CFARetriever
+from cfa_vector_store import BINARY_VECTORS_FILENAME, VectorStoreWriter
+
+K = 10
+DIM = 100  # dernier mot incomplet
+
+
+@pytest.fixture(scope="module")
+def data():
+    return synthetic_vectors(2000, num_queries=40, dim=DIM, seed=1)
+
+
+def test_binarize_bits(data):
+    vectors, _ = data
+    codes = binarize(vectors)
+    assert codes.shape == (len(vectors), 2) and codes.dtype == np.dtype('<u8')
+    bits = np.unpackbits(codes.view(np.uint8), axis=1, bitorder='little')
+    np.testing.assert_array_equal(bits[:, :DIM], vectors > 0)
+    assert not bits[:, DIM:].any()
+
+
+def test_popcount_and_hamming(data, monkeypatch):
+    vectors, queries = data
+    codes = binarize(vectors)
+    query_code = binarize(queries[0])[0]
+    expected = ((vectors > 0) != (queries[0] > 0)).sum(axis=1)
+    np.testing.assert_array_equal(hamming_distances(codes, query_code, block_rows=333), expected)
+    # Table d'octets (numpy sans bitwise_count) : mêmes comptes
+    with_bitwise_count = popcount(codes)
+    monkeypatch.delattr(cfa_binary.np, "bitwise_count", raising=False)
+    np.testing.assert_array_equal(popcount(codes), with_bitwise_count)
+
+
+def test_search_binary(data):
+    vectors, queries = data
+    codes = binarize(vectors)
+    ids, scores = search_binary(codes, queries[0], K)
+    distances = hamming_distances(codes, binarize(queries[0])[0])
+    np.testing.assert_array_equal(scores, DIM - 2 * distances[ids])
+    assert np.all(np.diff(scores) <= 0)
+
+    reference = exact_top_k(vectors, queries, K)
+    reranked = [search_binary(codes, query, K, rerank_vectors=vectors, rerank_candidates=200)[0]
+                for query in queries]
+    assert recall_at_k(reference, reranked, K) >= 0.9
+
+
+def test_retriever_binary_tier(tmp_path, data):
+    vectors, queries = data
+    for dtype, filename in (("float32", "cfa_vectors.bin"), ("binary", BINARY_VECTORS_FILENAME)):
+        writer = VectorStoreWriter(tmp_path, DIM, dtype=dtype, filename=filename, write_metadata=dtype == "float32")
+        for i, vector in enumerate(vectors):
+            writer.add(vector, {"id": f"chunk_{i}", "text": f"chunk {i}"})
+        writer.finalize()
+    retriever = CFARetriever(tmp_path, tier="binary", rerank_candidates=200)
+    ids, scores = retriever.search_ids_many(queries, K)
+    for query, row_ids, row_scores in zip(queries, ids, scores):
+        expected_ids, expected_scores = search_binary(binarize(vectors), query, K, rerank_vectors=vectors,
+                                                      rerank_candidates=200)
+        assert row_ids.tolist() == expected_ids.tolist()
+        np.testing.assert_allclose(row_scores, expected_scores, rtol=1e-6)
+    results = retriever.search(queries[0], k=3)
+    assert [r["id"] for r in results] == [f"chunk_{i}" for i in ids[0][:3]]
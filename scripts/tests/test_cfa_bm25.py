@@ -0,0 +1,110 @@
+"""cfa_bm25.bin : relecture de l'index et top-k MaxScore identique à la recherche exhaustive."""
+
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from cfa_bm25 import BLOCK_SIZE, BM25Index, BM25IndexWriter, idf, tokenize
+
+NUM_DOCS = 700  # plusieurs blocs de BLOCK_SIZE postings pour les termes fréquents
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    # Vocabulaire de loi de Zipf : quelques termes présents partout, beaucoup de termes rares
+    rng = np.random.default_rng(0)
+    vocabulary = [f"w{i}" for i in range(400)]
+    weights = 1 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    return [" ".join(rng.choice(vocabulary, size=rng.integers(5, 80), p=weights)) for _ in range(NUM_DOCS)]
+
+
+@pytest.fixture(scope="module")
+def index(corpus, tmp_path_factory):
+    directory = tmp_path_factory.mktemp("bm25")
+    writer = BM25IndexWriter(directory)
+    for text in corpus:
+        writer.add(text)
+    writer.finalize()
+    return BM25Index.open(directory)
+
+
+def test_tokenize():
+    assert tokenize("L'Épargne et le Risk-Return de 2024, a b") == ["epargne", "risk", "return", "2024"]
+
+
+def test_round_trip(index, corpus):
+    counts = [Counter(tokenize(text)) for text in corpus]
+    assert index.num_docs == NUM_DOCS
+    assert index.doc_lengths.tolist() == [sum(c.values()) for c in counts]
+    assert index.avgdl == pytest.approx(np.mean([sum(c.values()) for c in counts]), rel=1e-6)
+    vocabulary = set().union(*counts)
+    assert len(index) == len(vocabulary)
+    assert max(index.doc_freq(term) for term in vocabulary) > 2 * BLOCK_SIZE
+    for term in vocabulary:
+        ids, tfs = index.postings(term)
+        expected = [doc for doc, c in enumerate(counts) if term in c]
+        assert ids.tolist() == expected
+        assert tfs.tolist() == [min(counts[doc][term], 255) for doc in expected]
+
+
+def test_scores_match_formula(index, corpus):
+    counts = [Counter(tokenize(text)) for text in corpus]
+    avgdl = np.mean([sum(c.values()) for c in counts])
+    query = "w0 w3 w50 w390"
+    expected = []
+    for c in counts:
+        length = sum(c.values())
+        score = 0.0
+        for term in dict.fromkeys(tokenize(query)):
+            df = sum(term in other for other in counts)
+            tf = c[term]
+            if tf:
+                score += idf(df, NUM_DOCS) * tf * (index.k1 + 1) / (
+                    tf + index.k1 * (1 - index.b + index.b * length / avgdl))
+        expected.append(score)
+    np.testing.assert_allclose(index.scores(query), expected, rtol=1e-4)
+    doc_ids = np.array([5, 3, 600, 5])
+    np.testing.assert_allclose(index.score_docs(query, doc_ids), index.scores(query)[doc_ids], rtol=1e-6)
+
+
+def test_max_score_is_an_upper_bound(index, corpus):
+    for term in ("w0", "w10", "w200"):
+        ids, tfs = index.postings(term)
+        weights = index._weights(term, ids, tfs)
+        assert index.max_score(term) == pytest.approx(float(weights.max()), rel=1e-5)
+
+
+@pytest.mark.parametrize("k", [1, 5, 10, 50])
+def test_maxscore_matches_exhaustive(index, k):
+    rng = np.random.default_rng(k)
+    for _ in range(100):
+        # Mélange de termes fréquents et rares, parfois absents de l'index
+        terms = [f"w{i}" for i in rng.integers(0, 450, size=rng.integers(1, 6))]
+        query = " ".join(terms)
+        ids, scores = index.search(query, k=k)
+        stats = index.last_stats
+        expected_ids, expected_scores = index.search(query, k=k, exhaustive=True)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-6, err_msg=query)
+        # Mêmes chunks, à l'ordre des ex aequo près (sommes float32 dans un ordre différent)
+        if len(expected_scores) == k and len(scores):
+            boundary = expected_scores[-1] * (1 + 1e-5)
+            assert set(ids[scores > boundary]) == set(expected_ids[expected_scores > boundary])
+        else:
+            assert set(ids) == set(expected_ids)
+        assert stats["decoded"] <= stats["postings"]
+
+
+def test_maxscore_skips_postings(index):
+    # Terme rare + termes très fréquents : les listes longues ne sont pas lues en entier
+    index.search("w399 w398 w0 w1", k=1)
+    assert index.last_stats["scored"] < index.last_stats["postings"]
+
+
+def test_empty_and_unknown_queries(index):
+    for query in ("", "le la de", "inconnu"):
+        ids, scores = index.search(query, k=5)
+        assert len(ids) == 0 and len(scores) == 0
+    assert not math.isnan(index.avgdl)
@@ -0,0 +1,65 @@
+"""Rapport de construction : bundle d'après publication, variantes et budget."""
+
+import gzip
+import json
+
+import pytest
+
+from cfa_build_report import (BudgetExceededError, SizeBudget, build_report, report_path, run_build_report,
+                              variant_formats)
+
+ENRICHED = "cfa_knowledge_embeddings_french_enriched.json"
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    publish_dir = tmp_path / "cfa_data"
+    publish_dir.mkdir()
+    (publish_dir / ENRICHED).write_text(json.dumps([{"content": "é" * 500}]))
+    (publish_dir / "cfa_stats.json").write_text('{"ancien": true}')
+    # Artefact généré que la nouvelle construction n'écrit plus : supprimé à la publication
+    (publish_dir / "cfa_search_index.json").write_text("[" + "1," * 1000 + "1]")
+    staging = tmp_path / "cfa_data_staging"
+    staging.mkdir()
+    (staging / "cfa_stats.json").write_text('{"chunks": 3}')
+    (staging / "cfa_vectors.bin").write_bytes(bytes(256))
+    return staging, publish_dir
+
+
+def test_bundle_after_publication(dirs):
+    staging, publish_dir = dirs
+    report = build_report(staging, publish_dir=publish_dir)
+    files = report["files"]
+    assert set(files) == {"cfa_stats.json", "cfa_vectors.bin", ENRICHED}
+    assert files[ENRICHED]["retained"] and files[ENRICHED]["bundled"]
+    assert not files["cfa_vectors.bin"]["bundled"]
+
+    totals = report["totals"]
+    assert totals["retained_files"] == 1 and totals["bundled_files"] == 2
+    assert totals["bundle_raw_bytes"] == ((staging / "cfa_stats.json").stat().st_size
+                                          + (publish_dir / ENRICHED).stat().st_size)
+    assert build_report(staging)["totals"]["bundle_raw_bytes"] < totals["bundle_raw_bytes"]
+
+
+def test_compressed_sizes_without_variants(dirs):
+    staging, publish_dir = dirs
+    report = build_report(staging, publish_dir=publish_dir)
+    assert report["formats"] == variant_formats()
+    data = (staging / "cfa_stats.json").read_bytes()
+    assert report["files"]["cfa_stats.json"]["gzip_bytes"] == len(gzip.compress(data, compresslevel=9, mtime=0))
+    for fmt in report["formats"]:
+        assert f"bundle_{fmt}_bytes" in report["totals"]
+    assert not list(staging.glob("*.gz"))
+
+    build_report(staging, write_variants=True)
+    assert gzip.decompress((staging / "cfa_stats.json.gz").read_bytes()) == data
+
+
+def test_retained_file_counts_toward_budget(dirs):
+    staging, publish_dir = dirs
+    enriched_bytes = (publish_dir / ENRICHED).stat().st_size
+    budget = SizeBudget(max_bundle_mb=(enriched_bytes - 1) / (1024 * 1024))
+    run_build_report(staging, budget, output_file=report_path(publish_dir))
+    with pytest.raises(BudgetExceededError):
+        run_build_report(staging, budget, output_file=report_path(publish_dir), publish_dir=publish_dir)
+    assert json.loads(report_path(publish_dir).read_text())["violations"]
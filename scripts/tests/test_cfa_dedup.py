@@ -0,0 +1,68 @@
+"""MinHash / LSH : regroupement des chunks quasi identiques."""
+
+import numpy as np
+import pytest
+
+from cfa_dedup import MinHasher, duplicate_report, estimated_jaccard, near_duplicate_groups, shingles
+
+
+def passage(seed, words=120):
+    rng = np.random.default_rng(seed)
+    return " ".join(f"mot{value}" for value in rng.integers(0, 5000, size=words))
+
+
+def edit(text, positions):
+    words = text.split()
+    for position in positions:
+        words[position] = "remplacé"
+    return " ".join(words)
+
+
+def test_shingles():
+    assert len(shingles("Un deux trois quatre cinq six", size=5)) == 2
+    # Casse et ponctuation ignorées
+    assert np.array_equal(shingles("Un, DEUX trois", size=5), shingles("un deux trois", size=5))
+
+
+def test_estimated_jaccard_tracks_exact_jaccard():
+    hasher = MinHasher(num_perm=256)
+    a = passage(0)
+    b = edit(a, range(0, 120, 15))
+    exact_a, exact_b = set(shingles(a).tolist()), set(shingles(b).tolist())
+    exact = len(exact_a & exact_b) / len(exact_a | exact_b)
+    assert estimated_jaccard(hasher.signature(a), hasher.signature(b)) == pytest.approx(exact, abs=0.08)
+    assert estimated_jaccard(hasher.signature(a), hasher.signature(a)) == 1.0
+
+
+def test_near_duplicate_groups():
+    base, other = passage(1), passage(2)
+    texts = [
+        base,
+        other,
+        base,                     # copie exacte
+        edit(base, [60]),         # un mot changé : Jaccard ~0,92
+        edit(other, range(0, 120, 6)),  # trop modifié pour être fusionné
+        passage(3),
+    ]
+    canonical = near_duplicate_groups(texts, threshold=0.85)
+    assert canonical == [0, 1, 0, 0, 4, 5]
+    assert near_duplicate_groups(texts, threshold=1.0) == [0, 1, 0, 3, 4, 5]
+
+
+def test_groups_only_join_canonical_texts():
+    # A ~ B et B ~ C, mais A et C trop éloignés : pas de chaîne A-B-C
+    a = passage(4)
+    b = edit(a, range(0, 120, 20))
+    c = edit(b, range(10, 120, 20))
+    sig_a, sig_b, sig_c = (MinHasher().signature(text) for text in (a, b, c))
+    assert estimated_jaccard(sig_a, sig_b) >= 0.6 and estimated_jaccard(sig_b, sig_c) >= 0.6
+    assert estimated_jaccard(sig_a, sig_c) < 0.6
+    canonical = near_duplicate_groups([a, b, c], threshold=0.6)
+    assert canonical[1] == 0 and canonical[2] == 2
+
+
+def test_duplicate_report():
+    report = duplicate_report([0, 1, 0, 0, 1, 5], embedding_dim=384)
+    assert report == {"chunks_before": 6, "chunks_after": 3, "duplicates_removed": 3, "merged_groups": 2,
+                      "vector_bytes_saved": 3 * 384 * 4, "search_work_saved": 0.5}
+    assert duplicate_report([], 384)["search_work_saved"] == 0.0
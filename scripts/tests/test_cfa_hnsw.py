@@ -0,0 +1,119 @@
+"""HNSWIndex : rappel contre la recherche exacte et relecture de cfa_hnsw.bin."""
+
+import numpy as np
+import pytest
+
+from cfa_hnsw import HNSW_FILENAME, HNSWIndex, _SortedKeySet, synthetic_vectors
+from cfa_quantization import top_k_rows
+from cfa_vector_store import VectorStoreWriter
+
+K = 10
+
+
+@pytest.fixture(scope="module")
+def data():
+    return synthetic_vectors(3000, num_queries=100, dim=32, seed=0)
+
+
+@pytest.fixture(scope="module")
+def index(data):
+    vectors, _ = data
+    return HNSWIndex.build(vectors, M=8, ef_construction=64, batch_size=128)
+
+
+def recall(vectors, queries, ids):
+    exact = top_k_rows(queries @ vectors.T, K)
+    return np.mean([len(set(found) & set(truth)) / K for found, truth in zip(ids.tolist(), exact.tolist())])
+
+
+def test_graph_structure(index, data):
+    vectors, _ = data
+    assert len(index) == len(vectors) and index.num_layers > 1
+    nodes, neighbors = index.layers[0]
+    assert nodes is None and neighbors.shape == (len(vectors), 2 * index.M)
+    for nodes, neighbors in index.layers[1:]:
+        assert np.all(np.diff(nodes) > 0) and neighbors.shape[1] == index.M
+    assert index.entry_point in index.layers[-1][0]
+
+
+def test_recall(index, data):
+    vectors, queries = data
+    single = np.array([index.search(query, k=K, ef=64)[0] for query in queries])
+    assert recall(vectors, queries, single) >= 0.9
+    batch_ids, batch_scores = index.search_many(queries, k=K, ef=64)
+    assert batch_ids.shape == (len(queries), K)
+    assert recall(vectors, queries, batch_ids) >= 0.9
+    np.testing.assert_allclose(batch_scores, np.take_along_axis(queries @ vectors.T, batch_ids, axis=1),
+                               rtol=1e-5, atol=1e-6)
+    # Plus de candidats explorés : rappel au moins aussi bon
+    wide = np.array([index.search(query, k=K, ef=256)[0] for query in queries])
+    assert recall(vectors, queries, wide) >= recall(vectors, queries, single) - 0.01
+
+
+def test_scores_sorted(index, data):
+    _, queries = data
+    ids, scores = index.search(queries[0], k=K)
+    assert len(set(ids.tolist())) == K
+    assert np.all(np.diff(scores) <= 0)
+
+
+def write_store(directory, vectors):
+    writer = VectorStoreWriter(directory, vectors.shape[1], write_metadata=False)
+    for vector in vectors:
+        writer.add(vector)
+    writer.finalize()
+    return writer.source_id
+
+
+def with_source(index, source_id):
+    return HNSWIndex(index.vectors, index.layers, index.entry_point, index.M, index.ef_construction,
+                     source_id=source_id)
+
+
+def test_save_open_round_trip(index, data, tmp_path):
+    vectors, queries = data
+    source_id = write_store(tmp_path, vectors)
+    size = with_source(index, source_id).save(tmp_path / HNSW_FILENAME)
+    assert size == (tmp_path / HNSW_FILENAME).stat().st_size
+
+    reopened = HNSWIndex.open(tmp_path)
+    assert (reopened.num_layers, reopened.entry_point, reopened.M) == (index.num_layers, index.entry_point, index.M)
+    assert reopened.source_id == source_id
+    for (nodes, neighbors), (saved_nodes, saved_neighbors) in zip(index.layers, reopened.layers):
+        assert isinstance(saved_neighbors, np.memmap)
+        np.testing.assert_array_equal(saved_neighbors, neighbors)
+        if nodes is None:
+            assert saved_nodes is None
+        else:
+            np.testing.assert_array_equal(saved_nodes, nodes)
+    for query in queries[:20]:
+        np.testing.assert_array_equal(reopened.search(query, k=K)[0], index.search(query, k=K)[0])
+
+
+def test_open_rejects_other_vectors(index, data, tmp_path):
+    vectors, _ = data
+    index.save(tmp_path / HNSW_FILENAME)
+    with pytest.raises(ValueError):
+        HNSWIndex.open(tmp_path, vectors=vectors[:-1])
+
+
+def test_open_rejects_stale_index(index, data, tmp_path):
+    # Index d'une construction précédente à côté d'un nouveau cfa_vectors.bin de même forme
+    vectors, _ = data
+    with_source(index, write_store(tmp_path, vectors)).save(tmp_path / HNSW_FILENAME)
+    new_source_id = write_store(tmp_path, vectors[::-1])
+    with pytest.raises(ValueError, match="périmé"):
+        HNSWIndex.open(tmp_path)
+    with pytest.raises(ValueError, match="périmé"):
+        HNSWIndex.open(tmp_path, vectors=vectors, source_id=new_source_id)
+
+
+def test_sparse_visited_set():
+    rng = np.random.default_rng(1)
+    visited = _SortedKeySet(np.array([5, 1]))
+    reference = {5, 1}
+    for _ in range(200):
+        keys = rng.choice(5000, size=int(rng.integers(1, 60)), replace=False)
+        expected = np.array([key not in reference for key in keys.tolist()])
+        np.testing.assert_array_equal(visited.add(keys), expected)
+        reference.update(keys.tolist())
@@ -0,0 +1,75 @@
+"""HybridRetriever : union des candidats, fusion RRF / linéaire et apprentissage du poids dense."""
+
+import numpy as np
+import pytest
+
+from cfa_bm25 import BM25IndexWriter
+from cfa_hybrid import HybridRetriever, min_max, reciprocal_ranks
+from test_cfa_retriever import DIM, HashingModel, build_data_dir, synthetic_texts
+
+NUM_CHUNKS = 200
+
+
+class BlindModel:
+    """Requêtes encodées au hasard : le signal dense n'apporte rien."""
+
+    def __init__(self):
+        self.rng = np.random.default_rng(1)
+
+    def encode(self, texts, convert_to_tensor=False, normalize_embeddings=True):
+        vectors = self.rng.standard_normal((len(texts), DIM)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    # Un terme propre à chaque chunk : seul BM25 le retrouve sûrement
+    texts = [f"{text} tag{i}" for i, text in enumerate(synthetic_texts(NUM_CHUNKS))]
+    build_data_dir(tmp_path, texts)
+    writer = BM25IndexWriter(tmp_path)
+    for text in texts:
+        writer.add(text)
+    writer.finalize()
+    return tmp_path
+
+
+def test_reciprocal_ranks_and_min_max():
+    scores = np.array([0.2, 0.9, 0.0, 0.5])
+    np.testing.assert_allclose(reciprocal_ranks(scores, rrf_k=10), 1 / (10 + np.array([3, 1, 4, 2])))
+    assert reciprocal_ranks(scores, rrf_k=10, positive_only=True)[2] == 0.0
+    np.testing.assert_allclose(min_max(scores), scores / 0.9)
+    assert not min_max(np.full(3, 0.7)).any()
+
+
+def test_search_evaluates_union(data_dir):
+    retriever = HybridRetriever(data_dir, candidates=10, translate=False, model=HashingModel())
+    query = "w3 w17 tag42"
+    union, dense_scores, lexical_scores = retriever.candidate_scores(query)
+    dense_ids, _ = retriever.dense.search_ids(retriever.dense.embed(query)[0], 10)
+    lexical_ids, _ = retriever.lexical.search(query, 10)
+    assert union.tolist() == sorted(set(dense_ids.tolist()) | set(lexical_ids.tolist()))
+    np.testing.assert_allclose(dense_scores, retriever.vectors[union] @ retriever.dense.embed(query)[0], atol=1e-5)
+    np.testing.assert_allclose(lexical_scores, retriever.lexical.score_docs(query, union))
+
+    results = retriever.search(query, k=5)
+    expected = retriever.fuse(dense_scores, lexical_scores)
+    assert [r["score"] for r in results] == pytest.approx(sorted(expected, reverse=True)[:5])
+    # Meilleur chunk BM25 (terme propre au chunk 42), absent des candidats denses
+    assert 42 in lexical_ids and 42 not in dense_ids
+    assert "chunk_42" in [r["id"] for r in results]
+    assert retriever.last_timings["union_size"] == len(union)
+
+    retriever.fusion = "linear"
+    linear = retriever.fuse(dense_scores, lexical_scores, weight=0.25)
+    np.testing.assert_allclose(linear, 0.25 * min_max(dense_scores) + 0.75 * min_max(lexical_scores))
+
+
+def test_learn_weight_prefers_lexical_when_dense_is_blind(data_dir):
+    retriever = HybridRetriever(data_dir, candidates=10, translate=False, model=BlindModel())
+    targets = [5, 60, 120, 199]
+    report = retriever.learn_weight([f"tag{i}" for i in targets], [[i] for i in targets], steps=11)
+    assert retriever.fusion == "linear" and retriever.dense_weight == report["weight"]
+    assert report["queries"] == len(targets)
+    assert report["bm25_only_mrr"] == 1.0 and report["dense_only_mrr"] < 1.0
+    assert report["mrr"] == 1.0 and report["weight"] < 1.0
+    assert report["mrr"] >= max(report["rrf_mrr"], report["dense_only_mrr"])
@@ -0,0 +1,97 @@
+"""Hash des pages (flux et ressources) et construction incrémentale identique à une reconstruction."""
+
+import sys
+import types
+import zlib
+from pathlib import Path
+
+import numpy as np
+import PyPDF2
+import pytest
+from PyPDF2 import PageObject
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from cfa_manifest import page_content_hashes
+
+PDF = Path(__file__).resolve().parents[2] / "docs" / "knowledge" / "course.pdf"
+DIM = 16
+
+
+def font(base_font):
+    return DictionaryObject({NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+                             NameObject("/BaseFont"): NameObject(base_font)})
+
+
+def write_font_pdf(path, base_fonts):
+    """Une page par police, toutes avec le même flux de contenu."""
+    writer = PyPDF2.PdfWriter()
+    for base_font in base_fonts:
+        page = PageObject.create_blank_page(width=200, height=200)
+        contents = DecodedStreamObject()
+        contents.set_data(b"BT /F1 12 Tf 20 100 Td (Allocation) Tj ET")
+        page[NameObject("/Contents")] = contents
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject(
+            {NameObject("/F1"): font(base_font)})})
+        writer.add_page(page)
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+def test_resources_change_page_hash(tmp_path):
+    write_font_pdf(tmp_path / "fonts.pdf", ["/Helvetica", "/Courier", "/Helvetica"])
+    hashes = page_content_hashes(tmp_path / "fonts.pdf")
+    assert hashes[1] != hashes[2] and hashes[1] == hashes[3]
+    assert page_content_hashes(tmp_path / "fonts.pdf") == hashes
+
+
+class HashingSentenceTransformer:
+    """Encodeur déterministe (hash du texte) : la construction ne dépend pas des poids du modèle."""
+
+    max_seq_length = 256
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def get_sentence_embedding_dimension(self):
+        return DIM
+
+    def encode(self, texts, convert_to_tensor=False, normalize_embeddings=True, **kwargs):
+        rows = [np.random.default_rng(zlib.crc32(text.encode())).standard_normal(DIM) for text in texts]
+        return np.asarray([row / np.linalg.norm(row) for row in rows], dtype=np.float32)
+
+
+@pytest.mark.skipif(not PDF.exists(), reason="PDF de cours absent")
+def test_incremental_build_matches_full_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "sentence_transformers",
+                        types.SimpleNamespace(SentenceTransformer=HashingSentenceTransformer))
+    from generate_cfa_embeddings import CFAEmbeddingGenerator
+
+    course = PyPDF2.PdfReader(str(PDF))
+    pdf_path = tmp_path / "course.pdf"
+
+    def write_pages(page_indexes):
+        writer = PyPDF2.PdfWriter()
+        for index in page_indexes:
+            writer.add_page(course.pages[index])
+        with open(pdf_path, 'wb') as f:
+            writer.write(f)
+
+    def build(publish_dir, incremental):
+        generator = CFAEmbeddingGenerator([str(pdf_path)], output_dir=str(publish_dir), incremental=incremental,
+                                          use_cache=False, build_report=False)
+        generator.run_complete_pipeline()
+        return generator
+
+    write_pages([2, 3, 4, 5, 6])
+    build(tmp_path / "incremental" / "cfa_data", incremental=False)
+    # La page 3 est remplacée, les autres pages restent identiques
+    write_pages([2, 3, 9, 5, 6])
+    generator = build(tmp_path / "incremental" / "cfa_data", incremental=True)
+    assert sorted(generator.reused_page_chunks[pdf_path]) == [1, 2, 4, 5]
+    build(tmp_path / "full" / "cfa_data", incremental=False)
+
+    incremental, full = tmp_path / "incremental", tmp_path / "full"
+    files = sorted(path.relative_to(full) for path in full.rglob("*") if path.is_file())
+    assert files == sorted(path.relative_to(incremental) for path in incremental.rglob("*") if path.is_file())
+    for name in files:
+        assert (incremental / name).read_bytes() == (full / name).read_bytes(), name
@@ -0,0 +1,76 @@
+"""Projection ACP : axes, relecture de cfa_pca.npz et niveau pca du retriever."""
+
+import numpy as np
+import pytest
+
+from cfa_hnsw import synthetic_vectors
+from cfa_pca import PCA_FILENAME, PCAProjection, evaluate_dims, write_projected_vectors
+from cfa_quantization import top_k
+from cfa_retriever import CFARetriever
+from cfa_vector_store import VectorStore, VectorStoreWriter, check_same_source
+
+K = 10
+DIM = 48
+
+
+@pytest.fixture(scope="module")
+def data():
+    return synthetic_vectors(1500, num_queries=30, dim=DIM, seed=2)
+
+
+def test_projection(data):
+    vectors, _ = data
+    projection = PCAProjection.fit(vectors, max_dim=DIM)
+    # Axes orthonormés, variance décroissante, totale sur toutes les dimensions
+    np.testing.assert_allclose(projection.components @ projection.components.T, np.eye(DIM), atol=1e-4)
+    assert np.all(np.diff(projection.explained_variance_ratio) <= 1e-12)
+    assert projection.variance_retained(DIM) == pytest.approx(1.0)
+    # Toutes les dimensions : simple rotation, les cosinus des vecteurs centrés sont conservés
+    centered = vectors[:50] - projection.mean
+    centered /= np.linalg.norm(centered, axis=1, keepdims=True)
+    full = projection.project(vectors[:50], DIM)
+    np.testing.assert_allclose(full @ full.T, centered @ centered.T, atol=1e-4)
+    assert np.allclose(np.linalg.norm(projection.project(vectors, 8), axis=1), 1.0, atol=1e-5)
+    with pytest.raises(ValueError):
+        PCAProjection.fit(vectors, max_dim=8).project(vectors, 16)
+
+
+def test_save_load_and_recall(tmp_path, data):
+    vectors, queries = data
+    projection = PCAProjection.fit(vectors, max_dim=32)
+    projection.save(tmp_path / PCA_FILENAME)
+    loaded = PCAProjection.load(tmp_path / PCA_FILENAME)
+    np.testing.assert_array_equal(loaded.components, projection.components)
+    np.testing.assert_array_equal(loaded.mean, projection.mean)
+
+    rows = evaluate_dims(vectors, queries, loaded, [4, 32])
+    assert [row["bytes_per_vector"] for row in rows] == [16, 128]
+    assert rows[0]["variance_retained"] < rows[1]["variance_retained"]
+    assert rows[0]["recall@10"] < rows[1]["recall@10"]
+
+
+def test_retriever_pca_tier(tmp_path, data):
+    vectors, queries = data
+    writer = VectorStoreWriter(tmp_path, DIM, write_metadata=True)
+    for i, vector in enumerate(vectors):
+        writer.add(vector, {"id": f"chunk_{i}", "text": f"chunk {i}"})
+    writer.finalize()
+    float_store = VectorStore.open(tmp_path)
+    projection = PCAProjection.fit(vectors, max_dim=16)
+    projection.save(tmp_path / PCA_FILENAME)
+    projected_file = write_projected_vectors(tmp_path, vectors, projection, 16, float_store.source_id)
+    check_same_source(projected_file, VectorStore.open(tmp_path, projected_file.name).source_id,
+                      float_store.source_id)
+
+    retriever = CFARetriever(tmp_path, tier="pca", pca_dim=16, rerank=False)
+    ids, _ = retriever.search_ids_many(queries, K)
+    reduced = projection.project(vectors, 16)
+    for query, row_ids in zip(queries, ids):
+        assert row_ids.tolist() == top_k(reduced @ projection.project(query, 16)[0], K).tolist()
+
+    reranking = CFARetriever(tmp_path, tier="pca", pca_dim=16)
+    ids, scores = reranking.search_ids_many(queries, K)
+    for query, row_ids, row_scores in zip(queries, ids, scores):
+        single_ids, _ = reranking.search_ids(query, K)
+        assert row_ids.tolist() == single_ids.tolist()
+        np.testing.assert_allclose(row_scores, vectors[row_ids] @ query, rtol=1e-5)
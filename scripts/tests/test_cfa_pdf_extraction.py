@@ -0,0 +1,66 @@
+"""iter_pdf_pages : pages dans l'ordre, plages soumises au fil de la lecture."""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from cfa_pdf_extraction import extract_pdf_sequential, iter_pdf_pages
+
+PDF = Path(__file__).resolve().parents[2] / "docs" / "knowledge" / "course.pdf"
+PAGES = list(range(1, 25))
+
+pytestmark = pytest.mark.skipif(not PDF.exists(), reason="PDF de cours absent")
+
+
+class ThreadPool:
+    """Pool d'extraction en threads (même interface que PDFExtractionPool) qui compte les plages en vol."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.submitted = 0
+        self._executor = ThreadPoolExecutor(workers)
+
+    def start(self):
+        return self
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._done())
+        return future
+
+    def _done(self):
+        self.in_flight -= 1
+
+    def close(self):
+        self._executor.shutdown()
+
+
+def test_pages_in_order_with_bounded_submission():
+    pool = ThreadPool(workers=2)
+    try:
+        pages = []
+        for page in iter_pdf_pages(PDF, pool=pool, page_numbers=PAGES, pages_per_task=2, max_pending=3):
+            # Plages soumises : au plus max_pending d'avance sur celles déjà restituées
+            pages.append(page)
+            assert pool.in_flight <= 3
+        assert pool.max_in_flight <= 3
+        assert pages == extract_pdf_sequential(PDF, PAGES)
+    finally:
+        pool.close()
+
+
+def test_stopped_consumer_does_not_submit_everything():
+    pool = ThreadPool(workers=1)
+    try:
+        pages = iter_pdf_pages(PDF, pool=pool, page_numbers=PAGES, pages_per_task=2, max_pending=2)
+        next(pages)
+        pages.close()
+        assert pool.submitted < len(PAGES) // 2
+    finally:
+        pool.close()
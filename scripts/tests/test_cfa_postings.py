@@ -0,0 +1,72 @@
+"""cfa_postings.bin : encodages varint / bitset, relecture et opérations ET / OU."""
+
+import numpy as np
+import pytest
+
+from cfa_postings import (POSTINGS_FILENAME, PostingsIndex, decode_varint_deltas, decode_varints,
+                          encode_varint_deltas, encode_varints, write_postings)
+
+NUM_DOCS = 1000
+
+
+@pytest.fixture
+def index_data():
+    rng = np.random.default_rng(0)
+    data = {}
+    # Fréquences de 0,2 % à 90 % des chunks : termes rares (varint) et fréquents (bitset)
+    for i, share in enumerate([0.002, 0.01, 0.05, 0.2, 0.5, 0.9]):
+        for j in range(3):
+            data[f"term{i}_{j}"] = rng.choice(NUM_DOCS, size=max(1, int(share * NUM_DOCS)), replace=False)
+    data["last"] = [NUM_DOCS - 1]
+    data["portefeuille é"] = [3, 3, 7]
+    return data
+
+
+@pytest.fixture
+def index(tmp_path, index_data):
+    counts = write_postings(tmp_path / POSTINGS_FILENAME, index_data)
+    assert counts["varint_terms"] and counts["bitset_terms"]
+    assert counts["size_bytes"] == (tmp_path / POSTINGS_FILENAME).stat().st_size
+    return PostingsIndex.open(tmp_path)
+
+
+def test_varints_round_trip():
+    values = [0, 1, 127, 128, 300, 16383, 16384, 2**31, 2**40]
+    decoded = decode_varints(np.frombuffer(encode_varints(values), dtype=np.uint8))
+    assert decoded.tolist() == values
+    ids = np.array([0, 5, 6, 1000, 1_000_000])
+    encoded = np.frombuffer(encode_varint_deltas(ids), dtype=np.uint8)
+    np.testing.assert_array_equal(decode_varint_deltas(encoded), ids)
+    assert len(decode_varints(np.empty(0, dtype=np.uint8))) == 0
+
+
+def test_postings_round_trip(index, index_data):
+    assert len(index) == len(index_data) and index.num_docs == NUM_DOCS
+    assert index.terms == list(index_data)
+    for term, ids in index_data.items():
+        expected = np.unique(ids)
+        np.testing.assert_array_equal(index.postings(term), expected)
+        assert index.doc_count(term) == len(expected)
+    assert "absent" not in index and len(index.postings("absent")) == 0
+
+
+def test_intersect_and_union_match_sets(index, index_data):
+    rng = np.random.default_rng(1)
+    terms = list(index_data)
+    for _ in range(200):
+        query = list(rng.choice(terms, size=rng.integers(1, 4)))
+        sets = [set(np.asarray(index_data[term]).tolist()) for term in query]
+        assert index.intersect(query).tolist() == sorted(set.intersection(*sets)), query
+        assert index.union(query).tolist() == sorted(set.union(*sets)), query
+
+
+def test_missing_terms(index):
+    assert len(index.intersect(["term4_0", "absent"])) == 0
+    assert len(index.intersect([])) == 0
+    np.testing.assert_array_equal(index.union(["term0_0", "absent"]), index.postings("term0_0"))
+
+
+def test_empty_index(tmp_path):
+    write_postings(tmp_path / POSTINGS_FILENAME, {})
+    index = PostingsIndex.open(tmp_path)
+    assert len(index) == 0 and len(index.union(["a"])) == 0
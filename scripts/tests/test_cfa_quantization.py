@@ -0,0 +1,83 @@
+"""Quantification int8 : scores approchés, re-classement et niveau int8 du retriever."""
+
+import numpy as np
+import pytest
+
+from cfa_eval import exact_top_k, recall_at_k
+from cfa_hnsw import synthetic_vectors
+from cfa_quantization import dequantize_int8, int8_scores, quantize_int8, search_int8, top_k, top_k_rows
+from cfa_retriever import CFARetriever
+from cfa_vector_store import INT8_VECTORS_FILENAME, VectorStore, VectorStoreWriter
+
+K = 10
+
+
+@pytest.fixture(scope="module")
+def data():
+    return synthetic_vectors(2000, num_queries=40, dim=48, seed=0)
+
+
+def write_store(directory, vectors, dtype, filename):
+    writer = VectorStoreWriter(directory, vectors.shape[1], dtype=dtype, filename=filename,
+                               write_metadata=dtype == "float32")
+    for i, vector in enumerate(vectors):
+        writer.add(vector, {"id": f"chunk_{i}", "text": f"chunk {i}"})
+    writer.finalize()
+
+
+def test_top_k():
+    scores = np.array([0.1, 0.9, 0.5, 0.9, -1.0])
+    assert top_k(scores, 3).tolist() == [1, 3, 2]
+    assert top_k(scores, 10).tolist() == [1, 3, 2, 0, 4]
+    assert top_k(scores, 0).tolist() == []
+    rows = top_k_rows(np.stack([scores, -scores]), 2)
+    assert rows.tolist() == [[1, 3], [4, 0]]
+
+
+def test_quantize_round_trip(data):
+    vectors, _ = data
+    codes, scales = quantize_int8(vectors)
+    assert codes.dtype == np.int8 and np.abs(codes).max() == 127
+    error = np.abs(dequantize_int8(codes, scales) - vectors).max(axis=1)
+    assert np.all(error <= scales / 2 + 1e-7)
+    zero_codes, zero_scales = quantize_int8(np.zeros((1, 4)))
+    assert not zero_codes.any() and zero_scales[0] == 1.0
+
+
+def test_int8_scores_blocks_and_batches(data):
+    vectors, queries = data
+    codes, scales = quantize_int8(vectors)
+    expected = dequantize_int8(codes, scales) @ queries.T
+    np.testing.assert_allclose(int8_scores(codes, scales, queries, block_rows=300), expected, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(int8_scores(codes, scales, queries[0], block_rows=7), expected[:, 0],
+                               rtol=1e-5, atol=1e-5)
+
+
+def test_search_int8_recall_and_rerank(data):
+    vectors, queries = data
+    codes, scales = quantize_int8(vectors)
+    reference = exact_top_k(vectors, queries, K)
+    approximate = [search_int8(codes, scales, query, K)[0] for query in queries]
+    assert recall_at_k(reference, approximate, K) >= 0.9
+    reranked = [search_int8(codes, scales, query, K, rerank_vectors=vectors) for query in queries]
+    assert recall_at_k(reference, [ids for ids, _ in reranked], K) >= 0.99
+    ids, scores = reranked[0]
+    np.testing.assert_allclose(scores, vectors[ids] @ queries[0], rtol=1e-6)
+
+
+def test_retriever_int8_tier(tmp_path, data):
+    vectors, queries = data
+    write_store(tmp_path, vectors, "float32", "cfa_vectors.bin")
+    write_store(tmp_path, vectors, "int8", INT8_VECTORS_FILENAME)
+    store = VectorStore.open(tmp_path, INT8_VECTORS_FILENAME)
+    retriever = CFARetriever(tmp_path, tier="int8", rerank=False)
+    many_ids, many_scores = retriever.search_ids_many(queries, K)
+    for query, ids, scores in zip(queries, many_ids, many_scores):
+        expected_ids, expected_scores = search_int8(store.vectors, store.scales, query, K)
+        assert ids.tolist() == expected_ids.tolist()
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    reranking = CFARetriever(tmp_path, tier="int8")
+    ids, _ = reranking.search_ids_many(queries, K)
+    assert ids.tolist() == [reranking.search_ids(query, K)[0].tolist() for query in queries]
+    assert recall_at_k(exact_top_k(vectors, queries, K), list(ids), K) >= 0.99
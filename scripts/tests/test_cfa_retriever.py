@@ -0,0 +1,95 @@
+"""CFARetriever : recherche par lot (search_many) et statistiques de latence."""
+
+import zlib
+
+import numpy as np
+import pytest
+
+from cfa_retriever import PROFILE_TERMS, CFARetriever, LatencyStats
+from cfa_vector_store import VectorStoreWriter
+
+DIM = 32
+WORDS = [f"w{i}" for i in range(60)]
+
+
+class HashingModel:
+    """Modèle d'encodage déterministe : somme de vecteurs aléatoires par mot, normalisée."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, convert_to_tensor=False, normalize_embeddings=True):
+        self.calls += 1
+        rows = []
+        for text in texts:
+            vector = np.zeros(DIM, dtype=np.float32)
+            for word in text.split():
+                vector += np.random.default_rng(zlib.crc32(word.encode())).standard_normal(DIM)
+            rows.append(vector / max(np.linalg.norm(vector), 1e-12))
+        return np.asarray(rows, dtype=np.float32)
+
+
+def synthetic_texts(num_chunks=200, seed=0):
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, size=rng.integers(3, 12))) for _ in range(num_chunks)]
+
+
+def build_data_dir(directory, texts):
+    """cfa_vectors.bin + métadonnées (texte compris) des textes, encodés par HashingModel."""
+    writer = VectorStoreWriter(directory, DIM, write_metadata=True)
+    for i, vector in enumerate(HashingModel().encode(texts)):
+        writer.add(vector, {"id": f"chunk_{i}", "text": texts[i]})
+    writer.finalize()
+
+
+@pytest.fixture
+def retriever(tmp_path):
+    build_data_dir(tmp_path, synthetic_texts())
+    return CFARetriever(tmp_path, model=HashingModel())
+
+
+def test_search_many_matches_search(retriever):
+    queries = ["w1 w2", "w10 w40 w41", "w59"]
+    batch = retriever.search_many(queries, k=5)
+    assert retriever.model.calls == 1  # un seul batch d'encodage
+    assert set(retriever.last_timings) == {"embed_ms", "search_ms", "fetch_ms", "total_ms"}
+    for query, results in zip(queries, batch):
+        single = retriever.search(query, k=5)
+        assert [r["id"] for r in results] == [r["id"] for r in single]
+        assert [r["score"] for r in results] == pytest.approx([r["score"] for r in single], abs=1e-5)
+        assert all(a["score"] >= b["score"] for a, b in zip(results, results[1:]))
+
+    vectors = retriever.embed(queries)
+    by_vector = retriever.search_many(vectors, k=5)
+    assert "embed_ms" not in retriever.last_timings
+    assert [[r["id"] for r in rows] for rows in by_vector] == [[r["id"] for r in rows] for rows in batch]
+
+
+def test_search_many_profiles(retriever):
+    vectors = retriever.embed(["w3 w4", "w5"])
+    oriented = retriever.orient(vectors, ["Prudent", None])
+    profile = retriever.embed(PROFILE_TERMS["Prudent"])[0]
+    expected = 0.8 * vectors[0] + 0.2 * profile
+    np.testing.assert_allclose(oriented[0], expected / np.linalg.norm(expected), atol=1e-6)
+    np.testing.assert_array_equal(oriented[1], vectors[1])
+
+    results = retriever.search_many(vectors, profiles="Prudent", k=3)
+    assert [r["id"] for r in results[1]] == [r["id"] for r in retriever.search(retriever.orient(
+        vectors[1:], ["Prudent"])[0], k=3)]
+    with pytest.raises(ValueError):
+        retriever.search_many(vectors, profiles=["Prudent"], k=3)
+    with pytest.raises(ValueError):
+        retriever.search_many(vectors, profiles="Téméraire", k=3)
+
+
+def test_latency_stats():
+    stats = LatencyStats(history=4)
+    for value in (100.0, 1.0, 2.0, 3.0, 4.0):
+        stats.record({"search_ms": value, "total_ms": 2 * value})
+    stats.record({"search_ms": 5.0})
+    summary = stats.summary()
+    # Historique borné : les deux premiers appels sont oubliés
+    assert summary["search_ms"] == {"calls": 4, "mean_ms": 3.5, "p50_ms": 3.5, "p95_ms": 4.85, "max_ms": 5.0}
+    assert summary["total_ms"]["calls"] == 3 and summary["total_ms"]["max_ms"] == 8.0
+    stats.reset()
+    assert stats.summary() == {}
@@ -0,0 +1,93 @@
+"""Shards par cours / catégorie : répertoire, lecture sélective et fusion des top-k par shard."""
+
+import json
+
+import numpy as np
+import pytest
+
+from cfa_quantization import top_k
+from cfa_shards import (SHARDS_DIRECTORY_FILENAME, ShardedCFALoader, ShardSetWriter, shard_filename,
+                        shards_dir)
+
+DIM = 16
+COURSES = ["Course1.pdf", "Course2.pdf", "Course3.pdf"]
+CATEGORIES = ["Tax Planning", "Risk Management", None]
+
+
+@pytest.fixture
+def chunks():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, DIM))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [{"chunk_index": i, "text": f"chunk {i}", "source_file": COURSES[i % 3],
+             "topic_category": CATEGORIES[(i // 3) % 3], "embedding": vector.tolist()}
+            for i, vector in enumerate(vectors)]
+
+
+@pytest.fixture
+def data_dir(tmp_path, chunks):
+    writer = ShardSetWriter(tmp_path, DIM)
+    for chunk in chunks:
+        writer.add(chunk)
+    writer.finalize()
+    return tmp_path
+
+
+def exact_top_k(chunks, query, k):
+    matrix = np.asarray([chunk["embedding"] for chunk in chunks], dtype=np.float32)
+    return [chunks[i]["chunk_index"] for i in top_k(matrix @ query, k)]
+
+
+def test_directory(data_dir, chunks):
+    directory = json.loads((shards_dir(data_dir) / SHARDS_DIRECTORY_FILENAME).read_text(encoding='utf-8'))
+    shards = directory["shards"]
+    assert len(shards) == 9 and sum(shard["count"] for shard in shards) == len(chunks)
+    assert {shard["topic_category"] for shard in shards} == {"Tax Planning", "Risk Management", "Uncategorized"}
+    for shard in shards:
+        stored = json.loads((shards_dir(data_dir) / shard["file"]).read_text(encoding='utf-8'))
+        assert [chunk["chunk_index"] for chunk in stored] == shard["chunk_indices"]
+        centroid = np.mean([chunk["embedding"] for chunk in stored], axis=0)
+        np.testing.assert_allclose(shard["centroid"], centroid / np.linalg.norm(centroid), atol=1e-5)
+    assert not list(data_dir.glob("cfa_shard_*.json"))
+
+
+def test_search_matches_single_index(data_dir, chunks):
+    loader = ShardedCFALoader(data_dir)
+    rng = np.random.default_rng(1)
+    for query in rng.standard_normal((10, DIM)).astype(np.float32):
+        results = loader.search(query, k=7)
+        assert [r["chunk_index"] for r in results] == exact_top_k(chunks, query, 7)
+        np.testing.assert_allclose([r["score"] for r in results],
+                                   [np.dot(chunks[r["chunk_index"]]["embedding"], query) for r in results],
+                                   rtol=1e-5)
+        # Tous les shards retenus par centroïde : même résultat que sans limite
+        assert loader.search(query, k=7, max_shards=len(loader.shards)) == results
+
+    query = rng.standard_normal(DIM).astype(np.float32)
+    wanted = [chunk for chunk in chunks if chunk["topic_category"] == "Tax Planning"
+              and chunk["source_file"] in COURSES[:2]]
+    filtered = loader.search(query, k=5, categories=["Tax Planning"], source_files=COURSES[:2])
+    assert [r["chunk_index"] for r in filtered] == exact_top_k(wanted, query, 5)
+
+
+def test_selective_loading(data_dir):
+    loader = ShardedCFALoader(data_dir)
+    query = np.asarray(loader.shards[4]["centroid"], dtype=np.float32)
+    nearest = loader.nearest(query, max_shards=2)
+    assert nearest[0]["file"] == loader.shards[4]["file"]
+    loader.search(query, k=3, max_shards=2)
+    assert sorted(loader.loaded_files) == sorted(shard["file"] for shard in nearest)
+    assert loader.search(query, k=3, categories=["Inconnue"]) == []
+
+
+def test_rebuild_removes_stale_shards(data_dir, chunks):
+    (data_dir / "cfa_shard_ancien.json").write_text("[]")
+    writer = ShardSetWriter(data_dir, DIM, fields=["source_file"])
+    for chunk in chunks:
+        writer.add(chunk)
+    writer.finalize()
+    files = sorted(path.name for path in shards_dir(data_dir).glob("cfa_shard_*.json"))
+    assert files == sorted(shard_filename((course,)) for course in COURSES)
+    assert not (data_dir / "cfa_shard_ancien.json").exists()
+    with pytest.raises(ValueError):
+        ShardedCFALoader(data_dir).select(categories=["Tax Planning"])
@@ -0,0 +1,61 @@
+"""cfa_texts.bin : chaque texte relu à l'identique, quel que soit le codec."""
+
+import random
+
+import pytest
+
+import cfa_text_store
+from cfa_text_store import TEXTS_FILENAME, TextStore, TextStoreWriter
+
+WORDS = ("portfolio asset allocation risk return client's investment strategy "
+         "retraite épargne équilibré bond equity duration 2024 % €").split()
+
+
+def corpus(count=300, seed=0):
+    rng = random.Random(seed)
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 150))) for _ in range(count)]
+    return texts + ["", "un seul mot"]
+
+
+def write(directory, texts, **options):
+    writer = TextStoreWriter(directory, **options)
+    for text in texts:
+        writer.add(text)
+    return writer.finalize()
+
+
+@pytest.mark.parametrize("codec", [
+    "none",
+    "zlib",
+    pytest.param("zstd", marks=pytest.mark.skipif(cfa_text_store.zstandard is None,
+                                                  reason="zstandard non installé")),
+])
+@pytest.mark.parametrize("train_bytes", [1 << 20, 2000])
+def test_round_trip(tmp_path, codec, train_bytes):
+    # train_bytes=2000 : dictionnaire appris sur les premiers textes, les suivants au fil de l'eau
+    texts = corpus()
+    write(tmp_path, texts, codec=codec, train_bytes=train_bytes)
+    store = TextStore.open(tmp_path)
+    assert len(store) == len(texts)
+    for chunk_id in random.Random(1).sample(range(len(texts)), len(texts)):
+        assert store.get_text(chunk_id) == texts[chunk_id]
+
+
+def test_dictionary_compresses(tmp_path):
+    texts = corpus()
+    write(tmp_path, texts, codec="zlib")
+    store = TextStore.open(tmp_path)
+    assert store.dictionary
+    compressed = int(store.offsets[-1] - store.offsets[0])
+    assert compressed < sum(len(text.encode('utf-8')) for text in texts) / 2
+
+
+def test_out_of_range_and_empty_store(tmp_path):
+    write(tmp_path, [], codec="zlib")
+    store = TextStore.open(tmp_path)
+    assert len(store) == 0
+    with pytest.raises(IndexError):
+        store.get_text(0)
+    (tmp_path / TEXTS_FILENAME).write_bytes(b"\x00" * 64)
+    with pytest.raises(ValueError):
+        TextStore.open(tmp_path)
@@ -0,0 +1,110 @@
+"""cfa_vectors.bin / cfa_vectors_meta.jsonl : écriture puis relecture par VectorStore."""
+
+import numpy as np
+import pytest
+
+from cfa_binary import binarize
+from cfa_quantization import dequantize_int8, quantize_int8
+from cfa_vector_store import (BINARY_VECTORS_FILENAME, INT8_VECTORS_FILENAME, METADATA_FILENAME,
+                              VectorStore, VectorStoreWriter, check_same_source)
+
+DIM = 70  # pas un multiple de 64 : dernier mot binaire incomplet
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((25, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def write(directory, vectors, dtype="float32", filename="cfa_vectors.bin", metadata=None):
+    writer = VectorStoreWriter(directory, DIM, dtype=dtype, filename=filename,
+                               write_metadata=metadata is not None)
+    for i, vector in enumerate(vectors):
+        writer.add(vector, metadata[i] if metadata is not None else None)
+    return writer.finalize()
+
+
+def test_float32_and_metadata_round_trip(tmp_path, vectors):
+    metadata = [{"id": f"chunk_{i}", "content": f"texte é {i}", "page_span": [i, i + 1]}
+                for i in range(len(vectors))]
+    files = write(tmp_path, vectors, metadata=metadata)
+    assert files["metadata_file"].endswith(METADATA_FILENAME)
+
+    store = VectorStore.open(tmp_path)
+    assert len(store) == len(vectors) and store.dim == DIM
+    assert isinstance(store.vectors, np.memmap)
+    np.testing.assert_array_equal(store.vectors, vectors)
+    assert store.metadata == metadata
+    lines = (tmp_path / METADATA_FILENAME).read_text(encoding='utf-8').splitlines()
+    assert len(lines) == len(vectors)
+
+
+def test_float16_round_trip(tmp_path, vectors):
+    write(tmp_path, vectors, dtype="float16")
+    store = VectorStore.open(tmp_path)
+    np.testing.assert_array_equal(store.vectors, vectors.astype(np.float16))
+
+
+def test_int8_round_trip(tmp_path, vectors):
+    write(tmp_path, vectors, dtype="int8", filename=INT8_VECTORS_FILENAME)
+    store = VectorStore.open(tmp_path, INT8_VECTORS_FILENAME)
+    codes, scales = quantize_int8(vectors)
+    assert store.is_int8
+    np.testing.assert_array_equal(store.vectors, codes)
+    np.testing.assert_allclose(store.scales, scales, rtol=1e-6)
+    np.testing.assert_allclose(dequantize_int8(store.vectors, store.scales), vectors, atol=0.02)
+
+
+def test_binary_round_trip(tmp_path, vectors):
+    write(tmp_path, vectors, dtype="binary", filename=BINARY_VECTORS_FILENAME)
+    store = VectorStore.open(tmp_path, BINARY_VECTORS_FILENAME)
+    assert store.is_binary and store.dim == DIM
+    assert store.vectors.shape == (len(vectors), 2)
+    np.testing.assert_array_equal(store.vectors, binarize(vectors))
+
+
+def test_empty_store(tmp_path):
+    for dtype in ("float32", "int8"):
+        write(tmp_path, [], dtype=dtype)
+        store = VectorStore.open(tmp_path)
+        assert len(store) == 0 and store.vectors.shape == (0, DIM)
+
+
+def test_unfinalized_and_truncated_files(tmp_path, vectors):
+    writer = VectorStoreWriter(tmp_path, DIM)
+    writer.add(vectors[0])
+    writer.close()
+    assert len(VectorStore.open(tmp_path)) == 0
+
+    write(tmp_path, vectors)
+    path = tmp_path / "cfa_vectors.bin"
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError, match="tronqué"):
+        VectorStore.open(tmp_path)
+    path.write_bytes(b"not a vector file".ljust(64, b"\x00"))
+    with pytest.raises(ValueError, match="pas un fichier"):
+        VectorStore.open(tmp_path)
+
+
+def test_wrong_dimension_rejected(tmp_path):
+    writer = VectorStoreWriter(tmp_path, DIM)
+    with pytest.raises(ValueError):
+        writer.add(np.zeros(DIM + 1))
+    writer.close()
+
+
+def test_source_id_shared_by_tiers(tmp_path, vectors):
+    write(tmp_path, vectors)
+    write(tmp_path, vectors, dtype="int8", filename=INT8_VECTORS_FILENAME)
+    write(tmp_path, vectors, dtype="binary", filename=BINARY_VECTORS_FILENAME)
+    source_ids = {VectorStore.open(tmp_path, name).source_id
+                  for name in ("cfa_vectors.bin", INT8_VECTORS_FILENAME, BINARY_VECTORS_FILENAME)}
+    assert len(source_ids) == 1 and source_ids != {0}
+
+    # Niveau resté d'une construction aux vecteurs différents
+    write(tmp_path, vectors[::-1], dtype="int8", filename=INT8_VECTORS_FILENAME)
+    stale = VectorStore.open(tmp_path, INT8_VECTORS_FILENAME)
+    with pytest.raises(ValueError, match="périmé"):
+        check_same_source(stale.vectors_file, stale.source_id, VectorStore.open(tmp_path).source_id)
@@ -0,0 +1,55 @@
+"""EmbeddingCache : lecture / écriture, taille suivie et éviction LRU."""
+
+import itertools
+
+import numpy as np
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+DIM = 4
+VECTOR_BYTES = DIM * 4
+
+
+def vectors(count, offset=0):
+    return [np.full(DIM, offset + i, dtype=np.float32) for i in range(count)]
+
+
+def test_encode_only_missing_texts(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite")
+    encoded = []
+
+    def encode(texts):
+        encoded.append(list(texts))
+        return vectors(len(texts))
+
+    cache.encode("m", ["a", "b"], encode)
+    result = cache.encode("m", ["b", "  a ", "c"], encode)
+    assert encoded == [["a", "b"], ["c"]]
+    np.testing.assert_array_equal(result[1], vectors(1)[0])
+    assert (cache.hits, cache.misses) == (2, 3)
+    cache.close()
+
+
+def test_tracked_size_and_eviction(tmp_path, monkeypatch):
+    # Horloge strictement croissante : ordre LRU sans égalités
+    clock = itertools.count(1)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(clock)))
+    path = tmp_path / "cache.sqlite"
+    cache = EmbeddingCache(path, max_bytes=10 * VECTOR_BYTES)
+    cache.put_many("m", [f"t{i}" for i in range(8)], vectors(8))
+    # Remplacement : taille inchangée
+    cache.put_many("m", ["t0", "t1"], vectors(2, 100))
+    assert cache.size_bytes() == 8 * VECTOR_BYTES
+    cache.get_many("m", ["t2"])
+
+    cache.put_many("m", [f"u{i}" for i in range(5)], vectors(5))
+    assert cache.size_bytes() == 10 * VECTOR_BYTES and cache.evicted == 3
+    # Les moins récemment utilisées partent en premier (t3, t4, t5)
+    assert [vector is None for vector in cache.get_many("m", ["t0", "t2", "t3", "t5", "t6"])] == \
+        [False, False, True, True, False]
+    cache.close()
+
+    reopened = EmbeddingCache(path, max_bytes=10 * VECTOR_BYTES)
+    assert reopened.size_bytes() == 10 * VECTOR_BYTES == reopened.stats()["entries"] * VECTOR_BYTES
+    reopened.close()
@@ -0,0 +1,67 @@
+"""Découpage en chunks (mode chars) : par page et en continu (cross_page) donnent les mêmes chunks."""
+
+import numpy as np
+import pytest
+
+from generate_cfa_embeddings import CFAEmbeddingGenerator
+
+CHUNK_SIZE = 200
+
+
+@pytest.fixture
+def generator():
+    # Seules les méthodes de découpage sont utilisées : pas de modèle à charger
+    generator = CFAEmbeddingGenerator.__new__(CFAEmbeddingGenerator)
+    generator.chunk_size, generator.chunk_overlap, generator.token_chunker = CHUNK_SIZE, 150, None
+    return generator
+
+
+def sentence(rng, words):
+    return " ".join(f"terme{value}" for value in rng.integers(0, 1000, size=words))
+
+
+def page_text(seed, long_sentence=False):
+    rng = np.random.default_rng(seed)
+    sentences = [sentence(rng, rng.integers(3, 12)) for _ in range(12)]
+    if long_sentence:
+        sentences[5] = sentence(rng, 80)  # ~700 caractères sans ponctuation
+    return "".join(text + rng.choice([". ", "! ", "? ", "... "]) for text in sentences)
+
+
+def test_sentences_joined_and_overlapped(generator):
+    text = "  ".join(f"Phrase numéro {i} sur la gestion de portefeuille et le risque?" for i in range(12))
+    chunks = generator.chunk_text_smart(text, CHUNK_SIZE)
+    first = [f"Phrase numéro {i} sur la gestion de portefeuille et le risque" for i in range(3)]
+    assert chunks[0] == ". ".join(first)
+    # Le chunk suivant reprend les deux dernières phrases
+    assert chunks[1].startswith(". ".join(first[1:]) + ". Phrase numéro 3")
+    assert generator.chunk_text_smart(text[:150], CHUNK_SIZE) == [text[:150]]
+
+
+def test_long_sentences_are_capped(generator):
+    text = page_text(0, long_sentence=True)
+    spans = generator.sentence_spans(text, CHUNK_SIZE)
+    assert max(end - begin for begin, end in spans) <= CHUNK_SIZE
+    assert all(text[begin:end] == text[begin:end].strip() for begin, end in spans)
+    # Les morceaux d'une phrase trop longue sont coupés entre deux mots
+    assert all(not text[end].isalnum() for _, end in spans if end < len(text))
+    assert max(len(chunk) for chunk in generator.chunk_text_smart(text, CHUNK_SIZE)) <= 3 * CHUNK_SIZE + 4
+
+
+@pytest.mark.parametrize("long_sentence", [False, True])
+def test_cross_page_matches_page_chunking(generator, long_sentence):
+    pages = [{"page_number": number, "text": page_text(number, long_sentence)} for number in (3, 4, 5)]
+    for page in pages:
+        assert generator.chunk_document([page]) == {
+            page["page_number"]: [(text, page["page_number"])
+                                  for text in generator.chunk_text_smart(page["text"], CHUNK_SIZE)]}
+
+    document_chunks = generator.chunk_document(pages)
+    texts = [text for first_page in sorted(document_chunks) for text, _ in document_chunks[first_page]]
+    assert texts == generator.chunk_text_smart(" ".join(page["text"] for page in pages), CHUNK_SIZE)
+    # Chaque chunk est rattaché à sa première page et porte sa dernière page
+    spans = [(first_page, last_page) for first_page in sorted(document_chunks)
+             for _, last_page in document_chunks[first_page]]
+    assert spans[0][0] == 3 and spans[-1][1] == 5
+    assert any(first != last for first, last in spans)
+    assert all(first <= last for first, last in spans)
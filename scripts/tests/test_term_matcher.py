@@ -0,0 +1,43 @@
+"""TermMatcher : mêmes comptes que str.count, automate Python et pyahocorasick."""
+
+import random
+
+import pytest
+
+import term_matcher
+from term_matcher import TermMatcher
+
+
+def expected_counts(terms, text):
+    return {term: text.count(term) for term in dict.fromkeys(terms) if term and text.count(term)}
+
+
+@pytest.fixture(params=["python", "c"])
+def backend(request, monkeypatch):
+    if request.param == "c":
+        if term_matcher.ahocorasick is None:
+            pytest.skip("pyahocorasick non installé")
+    else:
+        monkeypatch.setattr(term_matcher, "ahocorasick", None)
+    return request.param
+
+
+def test_overlapping_terms(backend):
+    terms = ["asset allocation", "allocation", "allocation allocation", "risk", "aa", "a"]
+    text = "asset allocation allocation allocation risk aaaa risky"
+    assert TermMatcher(terms).count_terms(text) == expected_counts(terms, text)
+
+
+def test_random_texts_match_str_count(backend):
+    rng = random.Random(0)
+    for _ in range(200):
+        terms = ["".join(rng.choice("abc ") for _ in range(rng.randint(1, 4))) for _ in range(8)]
+        text = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 200)))
+        assert TermMatcher(terms).count_terms(text) == expected_counts(terms, text), (terms, text)
+
+
+def test_duplicate_and_empty_terms(backend):
+    matcher = TermMatcher(["risk", "", "risk", "return"])
+    assert matcher.terms == ["risk", "return"]
+    assert matcher.count_terms("risk and return, risk") == {"risk": 2, "return": 1}
+    assert matcher.count_terms("") == {}
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Découpage en chunks sur les offsets de tokens du tokenizer du modèle.
+
+Le texte est tokenisé une seule fois ; les chunks sont des tranches
+[début, fin) de la liste de tokens, converties en texte par les offsets
+caractères. Garanties :
+    - chaque chunk tient dans la fenêtre du modèle (tokens spéciaux inclus),
+      donc rien n'est tronqué silencieusement à l'encodage ;
+    - les coupures tombent en début de mot (jamais au milieu d'un mot
+      découpé en sous-tokens), de préférence en début de phrase ;
+    - le chevauchement est exprimé en tokens ;
+    - temps linéaire : tables de positions précalculées, chaque chunk
+      est placé en O(1).
+
+USAGE:
+    chunker = TokenChunker(model.tokenizer, max_tokens=model.max_seq_length, overlap_tokens=32)
+    chunks = chunker.chunk_text(page_text)
+"""
+
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = {'.', '!', '?'}
+
+
+class TokenChunker:
+    """Découpeur de texte en fenêtres de tokens avec chevauchement."""
+
+    def __init__(self, tokenizer, max_tokens: int, overlap_tokens: int = 32,
+                 min_chunk_chars: int = 100):
+        """
+        Args:
+            tokenizer: Tokenizer Hugging Face (rapide, offsets requis) du modèle
+            max_tokens: Fenêtre du modèle (max_seq_length), tokens spéciaux inclus
+            overlap_tokens: Tokens repris du chunk précédent au début du suivant
+            min_chunk_chars: Les chunks plus courts sont ignorés (comme chunk_text_smart)
+        """
+        num_special = getattr(tokenizer, "num_special_tokens_to_add", None)
+        special_tokens = num_special(pair=False) if callable(num_special) else 2
+        self.tokenizer = tokenizer
+        self.budget = max_tokens - special_tokens
+        if self.budget <= 0:
+            raise ValueError(f"Fenêtre de {max_tokens} tokens trop petite")
+        self.overlap_tokens = min(overlap_tokens, self.budget // 2)
+        self.min_chunk_chars = min_chunk_chars
+
+    def token_offsets(self, text: str) -> List[Tuple[int, int]]:
+        """Offsets caractères (début, fin) de chaque token du texte, sans tokens spéciaux."""
+        encoded = self.tokenizer(text, add_special_tokens=False, truncation=False,
+                                 return_offsets_mapping=True, verbose=False)
+        return [tuple(offset) for offset in encoded['offset_mapping']]
+
+    def chunk_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Positions caractères (début, fin) des chunks du texte.
+
+        Un token est un point de coupure s'il commence un mot (espace avant
+        lui) ; un début de phrase s'il suit en plus une ponctuation finale.
+        """
+        offsets = self.token_offsets(text)
+        n = len(offsets)
+        if n == 0:
+            return []
+        if n <= self.budget:
+            return [(offsets[0][0], offsets[-1][1])]
+
+        # last_word[i] / last_sentence[i] : plus grand point de coupure <= i
+        # next_word[i] : plus petit début de mot >= i (n si aucun)
+        last_word = [0] * (n + 1)
+        last_sentence = [0] * (n + 1)
+        for i in range(1, n + 1):
+            word_start = i == n or offsets[i][0] > offsets[i - 1][1]
+            sentence_start = word_start and text[offsets[i - 1][0]:offsets[i - 1][1]] in SENTENCE_END
+            last_word[i] = i if word_start else last_word[i - 1]
+            last_sentence[i] = i if sentence_start else last_sentence[i - 1]
+        next_word = [n] * (n + 1)
+        for i in range(n - 1, 0, -1):
+            next_word[i] = i if last_word[i] == i else next_word[i + 1]
+        next_word[0] = 0
+
+        spans = []
+        start = 0
+        while start < n:
+            end = min(start + self.budget, n)
+            if end < n:
+                # Début de phrase si le chunk reste au moins à moitié plein, sinon début de mot
+                if last_sentence[end] > start + self.budget // 2:
+                    end = last_sentence[end]
+                elif last_word[end] > start:
+                    end = last_word[end]
+                # Sinon mot plus long que la fenêtre : coupure au token
+            spans.append((offsets[start][0], offsets[end - 1][1]))
+            if end == n:
+                break
+            next_start = next_word[max(end - self.overlap_tokens, start + 1)]
+            start = next_start if next_start < end else end
+        return spans
+
+    def chunk_text(self, text: str) -> List[str]:
+        """Chunks du texte, les trop courts exclus."""
+        chunks = [text[begin:end] for begin, end in self.chunk_spans(text)]
+        return [chunk for chunk in chunks if len(chunk) > self.min_chunk_chars]